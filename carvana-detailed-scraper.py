@@ -4,62 +4,47 @@
 Detailed Carvana scraper that waits for dynamic content
 """
 
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
-import shutil
 import os
+import sys
 import json
 
-def scrape_carvana_vehicles():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcp-servers', 'undetected-chrome-mcp', 'src'))
+
+def scrape_carvana_vehicles(record=None, replay=None, profile=None):
     print("🚗 Advanced Carvana Scraper")
     print("=" * 35)
     
     driver = None
+    archive_worker = None
     
     try:
         # Setup undetected Chrome
-        if not os.path.exists('/tmp/chromedriver'):
-            shutil.copy('/usr/bin/chromedriver', '/tmp/chromedriver')
-            os.chmod('/tmp/chromedriver', 0o755)
-        
-        options = uc.ChromeOptions()
-        options.binary_location = '/usr/bin/chromium'
-        
-        container_args = [
-            '--no-sandbox',
-            '--disable-setuid-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-gpu',
-            '--headless=new',
-            '--disable-web-security',
-            '--disable-features=VizDisplayCompositor',
-            '--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        ]
-        
-        for arg in container_args:
-            options.add_argument(arg)
-        
-        options.add_experimental_option("prefs", {
-            "profile.default_content_setting_values.notifications": 2,
-            "profile.default_content_settings.popups": 0,
-        })
-        
-        driver = uc.Chrome(
-            options=options,
-            version_main=None,
-            driver_executable_path='/tmp/chromedriver'
-        )
+        from launch_profiles import launch
+        driver = launch(profile)
         
         wait = WebDriverWait(driver, 20)
         
+        if record or replay:
+            # Record live traffic for later, or serve a recording with the network blocked
+            from cdp_session import CDPSession
+            from site_archive import ArchiveRecorder, ArchiveReplayer, SiteArchive
+            session = CDPSession.for_driver(driver)
+            if record:
+                archive_worker = ArchiveRecorder(session, SiteArchive(record, 'w'))
+                print(f"⏺️ Recording traffic into {record}")
+            else:
+                archive_worker = ArchiveReplayer(session, SiteArchive(replay))
+                print(f"▶️ Replaying traffic from {replay} (offline)")
+            archive_worker.start()
+        
         print("1️⃣ Navigating to Carvana...")
         driver.get('https://www.carvana.com/cars')
         
         print("2️⃣ Waiting for page to fully load...")
-        time.sleep(10)  # Give React app time to initialize
+        time.sleep(2 if replay else 10)  # Give React app time to initialize
         
         title = driver.title
         print(f"✅ Page title: {title}")
@@ -99,30 +84,31 @@ def scrape_carvana_vehicles():
         
         vehicles_data = []
         
+        # One DOMSnapshot round trip; every probe below is answered locally
+        from dom_snapshot import DomSnapshot
+        dom = DomSnapshot(driver.execute_cdp_cmd('DOMSnapshot.captureSnapshot', {'computedStyles': []}), url=driver.current_url)
+        print(f"📸 Indexed {dom.element_count} DOM elements")
+        
         for selector in possible_selectors:
             try:
-                elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                elements = dom.select(selector)
                 if elements:
                     print(f"🔍 Found {len(elements)} elements with '{selector}'")
                     
                     # Check first few elements for vehicle content
                     for i, element in enumerate(elements[:3]):
-                        try:
-                            text = element.text.strip()
-                            html = element.get_attribute('outerHTML')[:200]
-                            
-                            # Look for car-like content
-                            if any(word in text.lower() for word in ['20', 'honda', 'toyota', 'ford', 'chevrolet', 'bmw', 'mercedes', 'audi', 'nissan', 'hyundai', 'kia', 'jeep', 'subaru', 'mazda', 'volkswagen', 'tesla']):
-                                vehicles_data.append({
-                                    'selector': selector,
-                                    'text': text[:100],
-                                    'html_preview': html,
-                                    'index': i
-                                })
-                                print(f"  🚗 Vehicle-like content: {text[:50]}...")
-                                
-                        except Exception as e:
-                            continue
+                        text = dom.text(element)
+                        html = dom.outer_html(element, limit=200)
+                        
+                        # Look for car-like content
+                        if any(word in text.lower() for word in ['20', 'honda', 'toyota', 'ford', 'chevrolet', 'bmw', 'mercedes', 'audi', 'nissan', 'hyundai', 'kia', 'jeep', 'subaru', 'mazda', 'volkswagen', 'tesla']):
+                            vehicles_data.append({
+                                'selector': selector,
+                                'text': text[:100],
+                                'html_preview': html,
+                                'index': i
+                            })
+                            print(f"  🚗 Vehicle-like content: {text[:50]}...")
                             
                     if len(vehicles_data) >= 5:  # Stop after finding some good data
                         break
@@ -130,27 +116,36 @@ def scrape_carvana_vehicles():
             except Exception as e:
                 continue
         
+        # The listing lazy-loads on scroll; harvest it step by step, new cards only
+        print("📜 Harvesting lazy-loaded listings by scrolling...")
+        try:
+            from harvest import harvest
+            harvested, stats = harvest(driver, 'a[href*="/vehicle/"]', max_items=500, max_seconds=60)
+            print(f"🚗 Harvested {len(harvested)} unique vehicles in {stats['steps']} scroll steps (stopped: {stats['stop_reason']})")
+            with open('/tmp/carvana_harvest.json', 'w') as f:
+                json.dump(harvested, f, indent=2)
+            print("💾 Harvest saved to /tmp/carvana_harvest.json")
+        except Exception as e:
+            print(f"Harvest failed: {e}")
+
         if not vehicles_data:
             print("4️⃣ No obvious vehicle elements found, checking page structure...")
             
             # Look for any clickable elements or links
             try:
-                links = driver.find_elements(By.CSS_SELECTOR, 'a[href]')
+                links = dom.select('a[href]')
                 print(f"🔗 Found {len(links)} links")
                 
                 car_links = []
                 for link in links[:20]:  # Check first 20 links
-                    try:
-                        href = link.get_attribute('href')
-                        text = link.text.strip()
-                        
-                        if href and ('/car/' in href or '/vehicle/' in href or any(word in text.lower() for word in ['20', '$', 'honda', 'toyota', 'ford'])):
-                            car_links.append({
-                                'href': href,
-                                'text': text[:50]
-                            })
-                    except:
-                        continue
+                    href = dom.attr(link, 'href')
+                    text = dom.text(link)
+                    
+                    if href and ('/car/' in href or '/vehicle/' in href or any(word in text.lower() for word in ['20', '$', 'honda', 'toyota', 'ford'])):
+                        car_links.append({
+                            'href': href,
+                            'text': text[:50]
+                        })
                 
                 if car_links:
                     print(f"🚗 Found {len(car_links)} car-related links:")
@@ -190,12 +185,26 @@ def scrape_carvana_vehicles():
         # Save debug info
         print("6️⃣ Saving debug information...")
         
-        with open('/tmp/carvana_page_source.html', 'w') as f:
-            f.write(driver.page_source)
-        print("💾 Page source saved to /tmp/carvana_page_source.html")
+        # Streamed through a CDP IO handle into gzip; the DOM never lands in one Python string
+        from capture import capture
+        from cdp_session import CDPSession
+        capture_session = CDPSession.for_driver(driver)
+        try:
+            stats = capture(capture_session, '/tmp/carvana_page_source.html.gz', 'html')
+        finally:
+            capture_session.close()
+        print(f"💾 Page source saved to {stats['path']} ({stats['bytes'] / 1024:.0f} KB, {stats['written'] / 1024:.0f} KB gzipped)")
         
-        driver.save_screenshot('/tmp/carvana_debug_screenshot.png')
-        print("📸 Screenshot saved to /tmp/carvana_debug_screenshot.png")
+        try:
+            from artifact_store import ArtifactStore
+            entry = ArtifactStore().put('carvana_debug_screenshot', driver.get_screenshot_as_png())
+            if entry['written']:
+                print(f"📸 Screenshot saved to {entry['path']}")
+            else:
+                print(f"♻️ Screenshot unchanged since last run (distance {entry['distance']}): {entry['path']}")
+        except ImportError:
+            driver.save_screenshot('/tmp/carvana_debug_screenshot.png')
+            print("📸 Screenshot saved to /tmp/carvana_debug_screenshot.png")
         
         if vehicles_data:
             print(f"\n🎉 Successfully extracted {len(vehicles_data)} potential vehicle listings:")
@@ -218,6 +227,13 @@ def scrape_carvana_vehicles():
         return []
         
     finally:
+        if archive_worker:
+            try:
+                archive_worker.stop()
+                print(f"📼 Archive: {archive_worker.stats()}")
+            except Exception as e:
+                print(f"Archive stop failed: {e}")
+            archive_worker.session.close()
         if driver:
             try:
                 driver.quit()
@@ -225,7 +241,13 @@ def scrape_carvana_vehicles():
                 pass
 
 if __name__ == "__main__":
-    results = scrape_carvana_vehicles()
+    import argparse
+    parser = argparse.ArgumentParser(description="Detailed Carvana scraper")
+    parser.add_argument("--record", metavar="ARCHIVE", help="Record all site traffic into this archive")
+    parser.add_argument("--replay", metavar="ARCHIVE", help="Serve site traffic from this archive, offline")
+    parser.add_argument("--profile", default=None, help="Chromium launch profile (default: stealth-full)")
+    args = parser.parse_args()
+    results = scrape_carvana_vehicles(record=args.record, replay=args.replay, profile=args.profile)
     print(f"\n📊 Final result: {len(results)} vehicles found")
     
     if results:
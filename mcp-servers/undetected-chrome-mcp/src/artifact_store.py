@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+"""
+Content-addressed store for screenshots and other captured artifacts.
+
+Each artifact is stored once under objects/<sha256[:2]>/<sha256>.<ext>.
+Images also get a perceptual hash; a capture that is visually identical
+(within threshold bits) to one already stored for the same key is not
+written again, only recorded as a reference to the existing object. Every
+put is appended to index.ndjson, so history survives restarts and other
+processes can share the store; refresh() picks up their appends. Puts and
+evictions hold an flock on index.lock from the duplicate check to the index
+write, so one process's compaction never drops another's line or deletes
+an object another is about to reference.
+
+Objects are exposed as MCP resources under artifact://<sha256>.<ext> and
+can be read in ranges. Retention evicts objects not referenced for
+max_age seconds, then the least recently referenced ones while the store
+is over max_bytes.
+"""
+
+import fcntl
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import phash
+
+DEFAULT_ROOT = os.environ.get("UNDETECTED_ARTIFACT_DIR", "/tmp/undetected_artifacts")
+DEFAULT_MAX_AGE = float(os.environ.get("UNDETECTED_ARTIFACT_MAX_AGE", 7 * 24 * 3600))
+DEFAULT_MAX_BYTES = int(os.environ.get("UNDETECTED_ARTIFACT_MAX_BYTES", 2 * 1024 ** 3))
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg", "webp")
+URI_PREFIX = "artifact://"
+MIME_TYPES = {
+    "json": "application/json",
+    "json.gz": "application/gzip",
+    "html": "text/html",
+    "html.gz": "application/gzip",
+    "mhtml": "multipart/related",
+    "mhtml.gz": "application/gzip",
+    "pdf": "application/pdf",
+    "har": "application/json",
+    "folded": "text/plain",
+}
+TEXT_MIME_TYPES = ("text/", "application/json")
+
+
+def mime_type(extension):
+    return MIME_TYPES.get(extension) or mimetypes.guess_type(f"x.{extension}")[0] or "application/octet-stream"
+
+
+def parse_uri(uri):
+    """artifact://<sha256>.<ext> -> sha256, or None for other URIs"""
+    if not uri.startswith(URI_PREFIX):
+        return None
+    sha256 = uri[len(URI_PREFIX):].split("?", 1)[0].split(".", 1)[0]
+    return sha256 if len(sha256) == 64 else None
+
+
+_near_duplicates = None
+
+
+def near_duplicates_available():
+    """Whether images can be perceptually hashed; checked once, and said on stderr when they cannot"""
+    global _near_duplicates
+    if _near_duplicates is None:
+        reason = phash.missing()
+        if reason:
+            print(f"⚠️ Near-duplicate detection is off, only exact copies are deduplicated: {reason}",
+                  file=sys.stderr, flush=True)
+        _near_duplicates = reason is None
+    return _near_duplicates
+
+
+class ArtifactStore:
+    """Dedupe-on-write artifact store keyed by logical name (e.g. page URL)"""
+
+    def __init__(self, root=DEFAULT_ROOT, threshold=4, max_age=DEFAULT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.threshold = threshold
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.ndjson")
+        self.lock_path = os.path.join(root, "index.lock")
+        self.near_duplicates = near_duplicates_available()
+        self._reset()
+        self._lock = threading.RLock()
+        self._index_lock_depth = 0
+        self._last_evict = 0
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.refresh()
+        self.evict()
+
+    def _reset(self):
+        self.latest = {}
+        self.objects = {}
+        self.hashes = {}
+        # sha256 -> resource metadata, with the last time any put referenced it
+        self.meta = {}
+        self.total_bytes = 0
+        self._offset = 0
+        self._inode = None
+
+    def refresh(self):
+        """Read index lines appended since the last call, by this or another process"""
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return
+        with self._lock:
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # Compacted by someone else's eviction: start over
+                self._reset()
+                self._inode = stat.st_ino
+            with open(self.index_path, "rb") as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._offset += len(line)
+                    try:
+                        self._remember(json.loads(line))
+                    except ValueError:
+                        continue
+
+    def _remember(self, entry):
+        self.latest[entry["key"]] = entry
+        if entry.get("duplicate_of") is None:
+            self.objects[entry["sha256"]] = entry["path"]
+            if entry.get("phash") is not None:
+                self.hashes.setdefault(entry["key"], []).append((int(entry["phash"], 16), entry["sha256"]))
+            if entry["sha256"] not in self.meta:
+                self.total_bytes += entry["size"]
+            extension = entry["path"].rsplit("/", 1)[-1].split(".", 1)[-1]
+            self.meta[entry["sha256"]] = {
+                "sha256": entry["sha256"],
+                "uri": f"{URI_PREFIX}{entry['sha256']}.{extension}",
+                "key": entry["key"],
+                "kind": entry.get("kind") or "artifact",
+                "mime": mime_type(extension),
+                "size": entry["size"],
+                "path": entry["path"],
+                "created": entry["timestamp"],
+                "used": entry["timestamp"],
+            }
+        elif entry["duplicate_of"] in self.meta:
+            self.meta[entry["duplicate_of"]]["used"] = entry["timestamp"]
+
+    def object_path(self, sha256, extension):
+        return os.path.join(self.root, "objects", sha256[:2], f"{sha256}.{extension}")
+
+    def _entry(self, key, sha256, size, kind):
+        return {
+            "key": key,
+            "sha256": sha256,
+            "size": size,
+            "timestamp": time.time(),
+            "kind": kind,
+            "phash": None,
+            "distance": None,
+            "duplicate_of": None,
+            "written": False,
+        }
+
+    def put(self, key, data, extension="png", kind="screenshot", near_duplicates=True):
+        """Store data under key unless an identical or look-alike object exists
+
+        Returns the index entry; entry["written"] says whether bytes hit disk,
+        entry["path"] always points at the object to read and entry["uri"] is
+        its resource URI. near_duplicates=False only skips exact copies.
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        entry = self._entry(key, sha256, len(data), kind)
+
+        if near_duplicates and self.near_duplicates and extension in IMAGE_EXTENSIONS:
+            entry["phash"] = f"{phash.dhash(data):016x}"
+
+        with self._lock, self._index_lock():
+            self.refresh()
+            if sha256 in self.objects and os.path.exists(self.objects[sha256]):
+                entry.update(path=self.objects[sha256], duplicate_of=sha256, distance=0)
+            elif entry["phash"] is not None and self.hashes.get(key):
+                candidates = self.hashes[key]
+                index, distance = phash.nearest(int(entry["phash"], 16), [h for h, _ in candidates])
+                if distance <= self.threshold:
+                    match = candidates[index][1]
+                    entry.update(path=self.objects[match], duplicate_of=match, distance=distance)
+
+            if entry["duplicate_of"] is None:
+                entry["path"] = self.object_path(sha256, extension)
+                self._write(entry["path"], data)
+                entry["written"] = True
+
+            return self._commit(entry)
+
+    def put_file(self, key, source, extension, kind="capture"):
+        """Move an already written file into the store, hashing it in chunks
+
+        For large captures that were streamed to disk; the source is removed
+        either way.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        entry = self._entry(key, sha256, size, kind)
+
+        with self._lock, self._index_lock():
+            self.refresh()
+            if sha256 in self.objects and os.path.exists(self.objects[sha256]):
+                entry.update(path=self.objects[sha256], duplicate_of=sha256, distance=0)
+                os.unlink(source)
+            else:
+                entry["path"] = self.object_path(sha256, extension)
+                os.makedirs(os.path.dirname(entry["path"]), exist_ok=True)
+                shutil.move(source, entry["path"])
+                entry["written"] = True
+            return self._commit(entry)
+
+    def _commit(self, entry):
+        self._append(entry)
+        # Reading our own line back also picks up anything other processes appended
+        self.refresh()
+        entry["uri"] = self.meta[entry["duplicate_of"] or entry["sha256"]]["uri"]
+        if self.total_bytes > self.max_bytes or time.time() - self._last_evict > 3600:
+            self.evict()
+        return entry
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _index_lock(self):
+        """Exclusive across processes, to append to or rewrite the index; taken under self._lock"""
+        # Re-entered when a put evicts; a second flock on a new descriptor would wait on ourselves
+        if self._index_lock_depth:
+            self._index_lock_depth += 1
+            try:
+                yield
+            finally:
+                self._index_lock_depth -= 1
+            return
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._index_lock_depth = 1
+            try:
+                yield
+            finally:
+                self._index_lock_depth = 0
+
+    def _append(self, entry):
+        record = {k: v for k, v in entry.items() if k not in ("written", "uri")}
+        with self._index_lock(), open(self.index_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def evict(self, max_age=None, max_bytes=None):
+        """Delete objects past retention and compact the index; returns objects removed"""
+        max_age = self.max_age if max_age is None else max_age
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock, self._index_lock():
+            self.refresh()
+            self._last_evict = time.time()
+            cutoff = self._last_evict - max_age
+            total = self.total_bytes
+            doomed = set()
+            for meta in sorted(self.meta.values(), key=lambda m: m["used"]):
+                if meta["used"] < cutoff or total > max_bytes:
+                    doomed.add(meta["sha256"])
+                    total -= meta["size"]
+            if not doomed:
+                return 0
+
+            for sha256 in doomed:
+                try:
+                    os.unlink(self.meta[sha256]["path"])
+                except OSError:
+                    pass
+            kept = []
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if (entry.get("duplicate_of") or entry["sha256"]) not in doomed:
+                        kept.append(line if line.endswith("\n") else line + "\n")
+            self._write(self.index_path, "".join(kept).encode())
+            self._reset()
+            self.refresh()
+            return len(doomed)
+
+    def resources(self):
+        """Resource metadata for every stored object, newest reference first"""
+        with self._lock:
+            self.refresh()
+            return sorted((dict(m) for m in self.meta.values()), key=lambda m: -m["used"])
+
+    def resource(self, uri):
+        sha256 = parse_uri(uri)
+        with self._lock:
+            if sha256 not in self.meta:
+                self.refresh()
+            return dict(self.meta[sha256]) if sha256 in self.meta else None
+
+    def read(self, uri, offset=0, length=None):
+        """(bytes, metadata) for a byte range of the object behind uri"""
+        meta = self.resource(uri)
+        if meta is None:
+            raise KeyError(f"Unknown artifact: {uri}")
+        with open(meta["path"], "rb") as f:
+            f.seek(offset)
+            data = f.read(length if length is not None else -1)
+        return data, meta
+
+    def stats(self):
+        with self._lock:
+            stored = sum(os.path.getsize(p) for p in self.objects.values() if os.path.exists(p))
+            return {"keys": len(self.latest), "objects": len(self.objects), "bytes": stored}
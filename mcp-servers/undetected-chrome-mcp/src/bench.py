@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark suite for the MCP server and the scraping stack, run entirely
+against the local fixture site.
+
+For each listing size the server benchmarks drive a real server process
+over stdio and time navigate, extract, snapshot, get_content and
+screenshot. They also record cold start (process up to initialize, and
+the first navigate, which launches the browser) and the peak RSS of the
+server's process tree, Chromium included. Navigates pass delay=0, so
+their times include no human-like pre-navigation sleep. The parse
+benchmarks time the offline HTML parse and rule extraction used by the
+pipeline and scrapers, and need no browser. Results are written as JSON with the environment
+they ran in, and `compare` diffs two result files metric by metric.
+
+Usage:
+    python3 bench.py run --sizes 10,100,1000,10000 --repeat 5 --output results.json
+    python3 bench.py run --parse-only
+    python3 bench.py compare baseline.json results.json --threshold 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from dom_snapshot import from_html
+from fixtures import FixtureServer
+from fleet import process_tree_rss
+from loadgen import SERVER_PATH, ServerProcess, percentile
+from pipeline import apply_rules
+from traffic import response_error
+
+CARD_RULES = {
+    "item": "[data-qa=vehicle-card]",
+    "fields": {
+        "title": "[data-qa=make-model]",
+        "price": "[data-qa=price]",
+        "url": {"selector": "a", "attribute": "href"},
+    },
+}
+
+
+def summary(samples):
+    """Timing summary in seconds"""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "median": percentile(ordered, 50),
+        "mean": sum(ordered) / len(ordered),
+        "min": ordered[0],
+        "p90": percentile(ordered, 90),
+        "max": ordered[-1],
+    }
+
+
+class RssSampler:
+    """Background sampler of a process tree's resident memory; peak() resets the window"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.window_peak = 0
+        self.overall_peak = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            rss = process_tree_rss(self.pid)
+            self.window_peak = max(self.window_peak, rss)
+            self.overall_peak = max(self.overall_peak, rss)
+
+    def peak(self):
+        peak, self.window_peak = self.window_peak, 0
+        return peak
+
+    def stop(self):
+        self.stopped.set()
+
+
+def _timed_call(server, name, arguments):
+    started = time.perf_counter()
+    response = server.call(name, arguments)
+    elapsed = time.perf_counter() - started
+    error = response_error(response)
+    if error:
+        raise RuntimeError(f"{name} failed: {error}")
+    return elapsed, response["result"]["content"][0]["text"]
+
+
+def bench_parse(base_url, sizes, repeat):
+    """Offline parse + rule extraction of server-rendered listings"""
+    metrics = {}
+    for cards in sizes:
+        with urllib.request.urlopen(f"{base_url}/cars?cards={cards}&render=server") as response:
+            markup = response.read().decode()
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            items = apply_rules(from_html(markup), CARD_RULES)
+            samples.append(time.perf_counter() - started)
+        if len(items) != cards:
+            raise RuntimeError(f"parse extracted {len(items)} of {cards} cards")
+        stats = summary(samples)
+        metrics[f"parse[cards={cards}]"] = dict(stats, bytes=len(markup), items_per_second=cards / stats["median"])
+    return metrics
+
+
+def bench_server(command, base_url, sizes, repeat, latency=0, timeout=300):
+    """Server tool timings per listing size, plus cold start and peak RSS"""
+    metrics = {}
+    started = time.perf_counter()
+    server = ServerProcess(command, timeout)
+    metrics["cold_start.initialize"] = summary([time.perf_counter() - started])
+    sampler = RssSampler(server.process.pid)
+    try:
+        listing = f"{base_url}/cars?cards={sizes[0]}&latency={latency}"
+        elapsed, _ = _timed_call(server, "undetected_navigate", {"url": listing, "delay": 0, "wait_for": "[data-qa=vehicle-card]"})
+        metrics["cold_start.first_navigate"] = summary([elapsed])
+
+        for cards in sizes:
+            listing = f"{base_url}/cars?cards={cards}&latency={latency}"
+            sampler.peak()
+            samples = {name: [] for name in ("navigate", "extract", "snapshot", "get_content", "screenshot")}
+            for _ in range(repeat):
+                samples["navigate"].append(_timed_call(server, "undetected_navigate", {
+                    "url": listing, "delay": 0, "wait_for": "[data-qa=vehicle-card]"})[0])
+                samples["extract"].append(_timed_call(server, "undetected_extract", {
+                    "selector": "[data-qa=make-model]", "wait_time": 30})[0])
+                samples["snapshot"].append(_timed_call(server, "undetected_snapshot", {
+                    "action": "capture"})[0])
+                samples["get_content"].append(_timed_call(server, "undetected_get_content", {"max_chars": 20000})[0])
+                samples["screenshot"].append(_timed_call(server, "undetected_screenshot", {})[0])
+            for name, values in samples.items():
+                stats = summary(values)
+                if name in ("extract", "snapshot"):
+                    stats["items_per_second"] = cards / stats["median"]
+                metrics[f"{name}[cards={cards}]"] = stats
+            metrics[f"peak_rss[cards={cards}]"] = {"bytes": sampler.peak()}
+        metrics["peak_rss"] = {"bytes": sampler.overall_peak}
+    finally:
+        sampler.stop()
+        server.close()
+    return metrics
+
+
+def environment():
+    """Enough context to tell whether two runs are comparable"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.time(),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(baseline, current, threshold=10.0):
+    """Rows of (metric, old, new, change %, flag) for metrics present in both runs"""
+    rows = []
+    for name in sorted(set(baseline["metrics"]) & set(current["metrics"])):
+        old, new = baseline["metrics"][name], current["metrics"][name]
+        field = "median" if "median" in old else "bytes"
+        if not old.get(field) or new.get(field) is None:
+            continue
+        change = (new[field] - old[field]) / old[field] * 100
+        flag = "slower" if change > threshold else "faster" if change < -threshold else ""
+        if field == "bytes" and flag:
+            flag = "more memory" if change > 0 else "less memory"
+        rows.append((name, old[field], new[field], change, flag))
+    return rows
+
+
+def _format_value(name, value):
+    if name.startswith("peak_rss"):
+        return f"{value / 1024 / 1024:.0f} MB"
+    return f"{value * 1000:.1f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the MCP server against local fixtures")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="Run the benchmarks and write JSON results")
+    run_cmd.add_argument("--sizes", default="10,100,1000,10000", help="Comma-separated cards per listing page")
+    run_cmd.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement")
+    run_cmd.add_argument("--latency", type=float, default=0, help="Fixture response delay in ms")
+    run_cmd.add_argument("--parse-only", action="store_true", help="Only the offline parse benchmarks (no browser)")
+    run_cmd.add_argument("--server-command", default=None, help="stdio MCP command to benchmark (default: this server.py)")
+    run_cmd.add_argument("--output", default=None, help="Results file (default: bench-<timestamp>.json)")
+    compare_cmd = sub.add_parser("compare", help="Compare two result files")
+    compare_cmd.add_argument("baseline")
+    compare_cmd.add_argument("current")
+    compare_cmd.add_argument("--threshold", type=float, default=10.0, help="Percent change to flag")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.threshold)
+        print(f"{'metric':<34}{'baseline':>12}{'current':>12}{'change':>9}")
+        for name, old, new, change, flag in rows:
+            print(f"{name:<34}{_format_value(name, old):>12}{_format_value(name, new):>12}{change:>8.1f}%  {flag}")
+        # Non-zero exit lets CI fail on regressions
+        sys.exit(1 if any(flag in ("slower", "more memory") for *_, flag in rows) else 0)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    fixtures = FixtureServer().start()
+    results = {"environment": environment(), "parameters": vars(args), "metrics": {}}
+    try:
+        print(f"📐 Parse benchmarks, sizes {sizes}", file=sys.stderr, flush=True)
+        results["metrics"].update(bench_parse(fixtures.url, sizes, args.repeat))
+        if not args.parse_only:
+            print("🌐 Server benchmarks", file=sys.stderr, flush=True)
+            command = shlex.split(args.server_command) if args.server_command else [sys.executable, SERVER_PATH]
+            results["metrics"].update(bench_server(command, fixtures.url, sizes, args.repeat, args.latency))
+    finally:
+        fixtures.stop()
+
+    output = args.output or f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    for name, stats in results["metrics"].items():
+        value = stats.get("median", stats.get("bytes"))
+        rate = f"  ({stats['items_per_second']:,.0f} items/s)" if "items_per_second" in stats else ""
+        print(f"{name:<34}{_format_value(name, value):>12}{rate}")
+    print(f"💾 Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
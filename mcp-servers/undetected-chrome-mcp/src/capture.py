@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""
+Page captures streamed to disk through CDP IO streams.
+
+WebDriver's page_source returns the whole serialized DOM in one JSON
+response, which Python then holds as one string (plus copies) before it is
+written. Here the page serializes itself into a Blob, and the blob is read
+through IO.read in fixed-size chunks straight into a gzip file, so memory
+on the Python side stays at one chunk regardless of page size. PDFs use
+Page.printToPDF with transferMode=ReturnAsStream and are read the same way.
+
+Page.captureSnapshot (MHTML) has no stream mode: Chrome returns the archive
+in one message. It is still written out in chunks, so only that one copy is
+held.
+"""
+
+import gzip
+import os
+import time
+
+from cdp_session import CDPError
+
+CHUNK_SIZE = 1 << 20
+FORMATS = ("html", "mhtml", "pdf")
+
+HTML_BLOB_EXPRESSION = """(() => {
+    const doctype = document.doctype ? new XMLSerializer().serializeToString(document.doctype) + '\\n' : '';
+    return new Blob([doctype, document.documentElement.outerHTML], {type: 'text/html'});
+})()"""
+
+
+def stream_html(session, fh, chunk_size=CHUNK_SIZE):
+    """Serialize the document into a Blob in the page and stream it into fh"""
+    result = session.send("Runtime.evaluate", {"expression": HTML_BLOB_EXPRESSION, "returnByValue": False})
+    if result.get("exceptionDetails"):
+        raise CDPError(f"Serializing the document failed: {result['exceptionDetails'].get('text')}")
+    object_id = result["result"]["objectId"]
+    try:
+        uuid = session.send("IO.resolveBlob", {"objectId": object_id})["uuid"]
+        return session.read_stream(f"blob:{uuid}", fh, chunk_size)
+    finally:
+        try:
+            session.send("Runtime.releaseObject", {"objectId": object_id})
+        except CDPError:
+            pass
+
+
+def stream_pdf(session, fh, chunk_size=CHUNK_SIZE, **options):
+    """Print the page to PDF and stream it into fh; options are Page.printToPDF params"""
+    params = {"printBackground": True, "preferCSSPageSize": True}
+    params.update(options)
+    params["transferMode"] = "ReturnAsStream"
+    handle = session.send("Page.printToPDF", params, timeout=300)["stream"]
+    return session.read_stream(handle, fh, chunk_size)
+
+
+def write_mhtml(session, fh, chunk_size=CHUNK_SIZE):
+    """Capture an MHTML archive of the page into fh"""
+    data = session.send("Page.captureSnapshot", {"format": "mhtml"}, timeout=300)["data"]
+    written = 0
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size].encode("utf-8")
+        fh.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def capture(session, path, fmt="html", compress=True, chunk_size=CHUNK_SIZE, **pdf_options):
+    """Stream a capture of the session's page into path; returns stats
+
+    With compress, the file is gzip-compressed as it is written and path
+    should end in .gz.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown capture format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    with (gzip.open(path, "wb", compresslevel=6) if compress else open(path, "wb")) as fh:
+        if fmt == "html":
+            raw = stream_html(session, fh, chunk_size)
+        elif fmt == "pdf":
+            raw = stream_pdf(session, fh, chunk_size, **pdf_options)
+        else:
+            raw = write_mhtml(session, fh, chunk_size)
+    return {
+        "path": path,
+        "format": fmt,
+        "bytes": raw,
+        "written": os.path.getsize(path),
+        "seconds": time.perf_counter() - started,
+    }
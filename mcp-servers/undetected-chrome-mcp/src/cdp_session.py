@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+"""
+Minimal DevTools protocol client bound to a single page target.
+
+Selenium's execute_cdp_cmd only covers request/response commands. Anything
+that needs CDP events (tracing, screencast frames, request interception)
+goes through a direct websocket connection to the browser's debugger port,
+which undetected-chromedriver always opens.
+"""
+
+import itertools
+import json
+import threading
+import urllib.request
+
+
+class CDPError(Exception):
+    """Raised when a DevTools command returns an error"""
+
+
+class CDPSession:
+    """Synchronous CDP client with a background reader thread for events"""
+
+    def __init__(self, ws_url, timeout=30):
+        import websocket  # shipped with selenium (websocket-client)
+
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self._ws = websocket.create_connection(ws_url, timeout=timeout, suppress_origin=True)
+        self._ws.settimeout(None)
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._handlers = {}
+        self._waiters = {}
+        self._lock = threading.Lock()
+        # closed: no more commands or events; _close_called: close() has run (the reader may stop first)
+        self.closed = False
+        self._close_called = False
+        self._reader = threading.Thread(target=self._read_loop, name="cdp-reader", daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def for_driver(cls, driver, timeout=30):
+        """Open a session on the driver's current tab"""
+        address = driver.options.debugger_address
+        target_id = driver.current_window_handle
+        ws_url = f"ws://{address}/devtools/page/{target_id}"
+        try:
+            return cls(ws_url, timeout=timeout)
+        except Exception:
+            # Older chromedriver builds don't use target ids as window handles
+            with urllib.request.urlopen(f"http://{address}/json/list", timeout=timeout) as conn:
+                targets = json.loads(conn.read().decode())
+            current_url = driver.current_url
+            pages = [t for t in targets if t.get("type") == "page"]
+            match = next((t for t in pages if t.get("url") == current_url), pages[0] if pages else None)
+            if not match:
+                raise CDPError(f"No page target found on {address}")
+            return cls(match["webSocketDebuggerUrl"], timeout=timeout)
+
+    def send(self, method, params=None, timeout=None):
+        """Send a command and block until its result arrives"""
+        if self.closed:
+            raise CDPError("CDP session is closed")
+        message_id = next(self._ids)
+        done = threading.Event()
+        slot = {"event": done}
+        with self._lock:
+            self._pending[message_id] = slot
+        payload = json.dumps({"id": message_id, "method": method, "params": params or {}})
+        with self._send_lock:
+            self._ws.send(payload)
+        if not done.wait(timeout or self.timeout):
+            with self._lock:
+                self._pending.pop(message_id, None)
+            raise CDPError(f"Timed out waiting for {method}")
+        message = slot.get("message")
+        if message is None:
+            raise CDPError(f"Connection closed while waiting for {method}")
+        if "error" in message:
+            error = message["error"]
+            raise CDPError(f"{method}: {error.get('message')} ({error.get('code')})")
+        return message.get("result", {})
+
+    def send_nowait(self, method, params=None):
+        """Fire a command without waiting for its result (e.g. frame acks)"""
+        payload = json.dumps({"id": next(self._ids), "method": method, "params": params or {}})
+        with self._send_lock:
+            self._ws.send(payload)
+
+    def on(self, event, callback):
+        """Register a callback for a CDP event
+
+        Callbacks run on the reader thread, so they must use send_nowait()
+        rather than send() to talk back to the browser.
+        """
+        with self._lock:
+            self._handlers.setdefault(event, []).append(callback)
+
+    def off(self, event, callback=None):
+        """Remove one callback, or all callbacks, for an event"""
+        with self._lock:
+            if callback is None:
+                self._handlers.pop(event, None)
+            elif callback in self._handlers.get(event, []):
+                self._handlers[event].remove(callback)
+
+    def wait_for(self, event, timeout=None, trigger=None):
+        """Block until the next occurrence of an event and return its params
+
+        trigger, if given, is called after the waiter is registered so an
+        event fired in response to a command can't be missed.
+        """
+        if self.closed:
+            raise CDPError("CDP session is closed")
+        done = threading.Event()
+        slot = {"event": done}
+        with self._lock:
+            self._waiters.setdefault(event, []).append(slot)
+        if trigger:
+            trigger()
+        if not done.wait(timeout or self.timeout):
+            with self._lock:
+                if slot in self._waiters.get(event, []):
+                    self._waiters[event].remove(slot)
+            raise CDPError(f"Timed out waiting for event {event}")
+        if "params" not in slot:
+            raise CDPError(f"Connection closed while waiting for event {event}")
+        return slot["params"]
+
+    def read_stream(self, handle, fh, chunk_size=1 << 20):
+        """Copy an IO stream handle into a binary file object, chunk by chunk"""
+        import base64
+
+        written = 0
+        try:
+            while True:
+                chunk = self.send("IO.read", {"handle": handle, "size": chunk_size})
+                data = chunk.get("data", "")
+                if data:
+                    raw = base64.b64decode(data) if chunk.get("base64Encoded") else data.encode("utf-8")
+                    fh.write(raw)
+                    written += len(raw)
+                if chunk.get("eof"):
+                    break
+        finally:
+            try:
+                self.send("IO.close", {"handle": handle})
+            except CDPError:
+                pass
+        return written
+
+    def _read_loop(self):
+        while not self.closed:
+            try:
+                raw = self._ws.recv()
+            except Exception:
+                break
+            if not raw:
+                break
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+
+            if "id" in message:
+                with self._lock:
+                    slot = self._pending.pop(message["id"], None)
+                if slot:
+                    slot["message"] = message
+                    slot["event"].set()
+                continue
+
+            method = message.get("method")
+            params = message.get("params", {})
+            with self._lock:
+                handlers = list(self._handlers.get(method, []))
+                waiters = self._waiters.pop(method, [])
+            for slot in waiters:
+                slot["params"] = params
+                slot["event"].set()
+            for handler in handlers:
+                try:
+                    handler(params)
+                except Exception:
+                    pass
+
+        self.closed = True
+        self._release()
+
+    def _release(self):
+        """Wake every caller still waiting on a command result or an event"""
+        with self._lock:
+            slots = list(self._pending.values())
+            self._pending.clear()
+            for waiters in self._waiters.values():
+                slots.extend(waiters)
+            self._waiters.clear()
+        for slot in slots:
+            slot["event"].set()
+
+    def close(self):
+        """Close the websocket and release any blocked callers"""
+        # The reader stopping on its own marks the session closed but leaves the socket to us
+        if self._close_called:
+            return
+        self._close_called = True
+        self.closed = True
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+        self._release()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""
+Adaptive concurrency: an AIMD controller for concurrent navigations.
+
+Every interval the controller looks at host CPU (/proc/stat), available
+memory (/proc/meminfo), recent call latency and error rate. Under
+pressure it cuts the limit multiplicatively; when the host is healthy and
+callers are waiting for a slot, it adds one. Latency pressure is judged
+against the best recent median, so no per-site target is needed. Each
+decision is recorded with the readings behind it.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def read_cpu_times():
+    """(busy, total) jiffies summed over all CPUs, or None off Linux"""
+    try:
+        with open("/proc/stat") as f:
+            fields = [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    total = sum(fields[:8])
+    return total - idle, total
+
+
+def read_meminfo():
+    """(available, total) bytes from /proc/meminfo, or None"""
+    values = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("MemTotal", "MemAvailable"):
+                    values[key] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError):
+        return None
+    if "MemTotal" not in values or "MemAvailable" not in values:
+        return None
+    return values["MemAvailable"], values["MemTotal"]
+
+
+class AIMDController:
+    """Dynamic concurrency limit with a blocking slot gate"""
+
+    def __init__(self, minimum=1, maximum=8, initial=None, interval=5.0, increase=1.0, decrease=0.5,
+                 cpu_high=0.85, memory_low=0.10, error_high=0.2, latency_factor=2.0, window=50, on_decision=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial or minimum)
+        self.interval = interval
+        self.increase = increase
+        self.decrease = decrease
+        self.cpu_high = cpu_high
+        self.memory_low = memory_low
+        self.error_high = error_high
+        self.latency_factor = latency_factor
+        self.on_decision = on_decision
+        self.in_flight = 0
+        self.waiting = 0
+        self.samples = deque(maxlen=window)
+        self.baseline = None
+        self.decisions = deque(maxlen=100)
+        self.completed = 0
+        self.errors = 0
+        self.cond = threading.Condition()
+        self._cpu = read_cpu_times()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="aimd-controller", daemon=True)
+        self.thread.start()
+
+    @property
+    def slots(self):
+        return max(self.minimum, int(self.limit))
+
+    @contextmanager
+    def slot(self):
+        """Hold one concurrency slot; yields a dict whose 'ok' the caller may clear"""
+        with self.cond:
+            self.waiting += 1
+            while self.in_flight >= self.slots:
+                self.cond.wait()
+            self.waiting -= 1
+            self.in_flight += 1
+        outcome = {"ok": True}
+        started = time.perf_counter()
+        try:
+            yield outcome
+        except Exception:
+            outcome["ok"] = False
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            with self.cond:
+                self.in_flight -= 1
+                self.samples.append((latency, outcome["ok"]))
+                self.completed += 1
+                self.errors += not outcome["ok"]
+                self.cond.notify_all()
+
+    def readings(self):
+        readings = {"cpu": None, "memory_available": None, "latency_p50": None, "error_rate": None}
+        cpu = read_cpu_times()
+        if cpu and self._cpu and cpu[1] > self._cpu[1]:
+            readings["cpu"] = (cpu[0] - self._cpu[0]) / (cpu[1] - self._cpu[1])
+        self._cpu = cpu
+        memory = read_meminfo()
+        if memory:
+            readings["memory_available"] = memory[0] / memory[1]
+        with self.cond:
+            samples = list(self.samples)
+            self.samples.clear()
+        if samples:
+            latencies = sorted(latency for latency, _ in samples)
+            readings["latency_p50"] = latencies[len(latencies) // 2]
+            readings["error_rate"] = sum(1 for _, ok in samples if not ok) / len(samples)
+            readings["samples"] = len(samples)
+        return readings
+
+    def adjust(self):
+        """Take one AIMD step and return the recorded decision"""
+        r = self.readings()
+        pressure = latency_pressure = None
+        if r["cpu"] is not None and r["cpu"] > self.cpu_high:
+            pressure = f"CPU {r['cpu'] * 100:.0f}% > {self.cpu_high * 100:.0f}%"
+        elif r["memory_available"] is not None and r["memory_available"] < self.memory_low:
+            pressure = f"memory available {r['memory_available'] * 100:.0f}% < {self.memory_low * 100:.0f}%"
+        elif r["error_rate"] is not None and r["error_rate"] > self.error_high:
+            pressure = f"error rate {r['error_rate'] * 100:.0f}% > {self.error_high * 100:.0f}%"
+        elif r["latency_p50"] is not None and self.baseline and r["latency_p50"] > self.baseline * self.latency_factor:
+            pressure = latency_pressure = f"p50 latency {r['latency_p50']:.2f}s > {self.latency_factor:g}x baseline {self.baseline:.2f}s"
+
+        if latency_pressure and self.limit <= self.minimum:
+            # Slow even at minimum concurrency: the site got slower, not the host
+            self.baseline = r["latency_p50"]
+        elif r["latency_p50"] is not None:
+            # Best recent median, drifting up slowly so one lucky window doesn't pin it forever
+            self.baseline = r["latency_p50"] if self.baseline is None else min(r["latency_p50"], self.baseline * 1.05)
+
+        previous = self.limit
+        with self.cond:
+            saturated = self.waiting > 0 or self.in_flight >= self.slots
+            if pressure and self.limit > self.minimum:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                action, reason = "decrease", pressure
+            elif pressure:
+                action, reason = "hold", pressure + " (at minimum)"
+            elif saturated and self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + self.increase)
+                action, reason = "increase", f"{self.waiting} waiting, {self.in_flight} in flight"
+            else:
+                action, reason = "hold", "saturated at maximum" if saturated else "demand below limit"
+            self.cond.notify_all()
+
+        decision = dict(r, time=time.time(), action=action, reason=reason, previous=previous, limit=self.limit, slots=self.slots)
+        self.decisions.append(decision)
+        if self.on_decision and action != "hold":
+            self.on_decision(decision)
+        return decision
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.adjust()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self.cond:
+            return {
+                "limit": self.limit,
+                "slots": self.slots,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "completed": self.completed,
+                "errors": self.errors,
+                "baseline_latency": self.baseline,
+            }
+
+    def format(self, decisions=5):
+        """Status lines for MCP status tools"""
+        s = self.stats()
+        baseline = f", baseline p50 {s['baseline_latency']:.2f}s" if s["baseline_latency"] else ""
+        lines = [
+            f"🎚️ Concurrency {s['slots']} (AIMD limit {s['limit']:.2f}, range {self.minimum}-{self.maximum}): "
+            f"{s['in_flight']} in flight, {s['waiting']} waiting, {s['completed']} done, {s['errors']} errors{baseline}"
+        ]
+        for d in [d for d in self.decisions if d["action"] != "hold"][-decisions:]:
+            stamp = time.strftime("%H:%M:%S", time.localtime(d["time"]))
+            lines.append(f"   {stamp} {d['action']} {d['previous']:.2f} -> {d['limit']:.2f}: {d['reason']}")
+        return lines
+
+    def stop(self):
+        self.stopped.set()
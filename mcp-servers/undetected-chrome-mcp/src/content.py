@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+"""
+Readable-content extraction: one in-page script finds the main content,
+drops boilerplate and converts it to compact markdown (headings, lists,
+tables, links, code). Only textContent is read, so no layout is forced,
+and only the requested chunk crosses the wire.
+"""
+
+CONTENT_SCRIPT = r"""
+const opts = arguments[0] || {};
+const DROP = new Set(['SCRIPT','STYLE','NOSCRIPT','TEMPLATE','SVG','CANVAS','IFRAME','OBJECT','EMBED',
+                      'NAV','FOOTER','ASIDE','FORM','BUTTON','SELECT','INPUT','TEXTAREA','DIALOG']);
+const BOILERPLATE = /(^|[\s_-])(nav|menu|footer|header|sidebar|cookie|consent|banner|modal|popup|promo|advert|ads?|social|share|breadcrumb|newsletter|subscribe)([\s_-]|$)/i;
+const BLOCK = new Set(['P','DIV','SECTION','ARTICLE','MAIN','HEADER','FIGURE','FIGCAPTION','DL','DT','DD','ADDRESS','DETAILS','SUMMARY']);
+const squash = s => s.replace(/\s+/g, ' ');
+
+function skip(el) {
+    if (DROP.has(el.tagName)) return true;
+    if (el.hidden || el.getAttribute('aria-hidden') === 'true') return true;
+    const role = el.getAttribute('role');
+    if (role === 'navigation' || role === 'banner' || role === 'contentinfo' || role === 'dialog') return true;
+    const marker = (el.id || '') + ' ' + (typeof el.className === 'string' ? el.className : '');
+    return el.tagName !== 'BODY' && el.tagName !== 'MAIN' && el.tagName !== 'ARTICLE' && BOILERPLATE.test(marker);
+}
+
+function pickRoot() {
+    if (opts.selector) return document.querySelector(opts.selector);
+    const articles = document.getElementsByTagName('article');
+    const explicit = document.querySelector('main, [role=main]') || (articles.length === 1 ? articles[0] : null);
+    if (explicit && explicit.textContent.trim().length > 200) return explicit;
+    // Readability-style scoring in one pass: each text block credits its
+    // parent, and with decaying weight the two ancestors above it
+    const scores = new Map();
+    document.body.querySelectorAll('p, li, td, pre, blockquote, h2, h3, h4').forEach(block => {
+        const length = block.textContent.trim().length;
+        if (length < 25) return;
+        const score = 1 + Math.min(length / 100, 3);
+        let el = block.parentElement, weight = 1;
+        for (let depth = 0; el && el !== document.documentElement && depth < 3; depth++) {
+            scores.set(el, (scores.get(el) || 0) + score * weight);
+            el = el.parentElement;
+            weight /= 2;
+        }
+    });
+    let best = document.body, bestScore = 0;
+    scores.forEach((score, el) => {
+        if (score > bestScore && !skip(el)) { best = el; bestScore = score; }
+    });
+    return best;
+}
+
+function inline(node) {
+    let out = '';
+    node.childNodes.forEach(child => {
+        if (child.nodeType === 3) { out += squash(child.nodeValue); return; }
+        if (child.nodeType !== 1 || skip(child)) return;
+        const tag = child.tagName;
+        if (tag === 'BR') { out += '\n'; return; }
+        if (tag === 'IMG') {
+            if (opts.images && child.getAttribute('src')) out += `![${child.alt || ''}](${child.src})`;
+            return;
+        }
+        const inner = inline(child);
+        if (!inner.trim()) return;
+        if (tag === 'A' && opts.links !== false && child.getAttribute('href') && !child.getAttribute('href').startsWith('javascript:'))
+            out += `[${inner.trim()}](${child.href})`;
+        else if (tag === 'STRONG' || tag === 'B') out += `**${inner.trim()}**`;
+        else if (tag === 'EM' || tag === 'I') out += `_${inner.trim()}_`;
+        else if (tag === 'CODE') out += '`' + inner.trim() + '`';
+        else if (BLOCK.has(tag) || tag === 'LI' || tag === 'TABLE' || tag === 'UL' || tag === 'OL') out += ' ' + inner + ' ';
+        else out += inner;
+    });
+    return out;
+}
+
+function table(el) {
+    const rows = [];
+    el.querySelectorAll('tr').forEach(tr => {
+        const cells = [];
+        tr.querySelectorAll('th, td').forEach(cell => cells.push(squash(inline(cell)).trim().replace(/\|/g, '\\|')));
+        if (cells.some(c => c)) rows.push(cells);
+    });
+    if (!rows.length) return '';
+    const width = Math.max(...rows.map(r => r.length));
+    const line = r => '| ' + Array.from({length: width}, (_, i) => r[i] || '').join(' | ') + ' |';
+    return [line(rows[0]), '|' + ' --- |'.repeat(width), ...rows.slice(1).map(line)].join('\n');
+}
+
+function list(el, depth) {
+    const lines = [];
+    let n = 1;
+    el.querySelectorAll(':scope > li').forEach(li => {
+        const bullet = el.tagName === 'OL' ? `${n++}.` : '-';
+        let own = '';
+        const nested = [];
+        li.childNodes.forEach(child => {
+            if (child.nodeType === 1 && (child.tagName === 'UL' || child.tagName === 'OL')) nested.push(list(child, depth + 1));
+            else if (child.nodeType === 3) own += squash(child.nodeValue);
+            else if (child.nodeType === 1 && !skip(child)) own += squash(inline({childNodes: [child]}));
+        });
+        if (own.trim()) lines.push('  '.repeat(depth) + bullet + ' ' + own.trim());
+        lines.push(...nested.filter(Boolean));
+    });
+    return lines.join('\n');
+}
+
+function blocks(node, out) {
+    let buffer = '';
+    const flush = () => { const t = squash(buffer).trim(); if (t) out.push(t); buffer = ''; };
+    node.childNodes.forEach(child => {
+        if (child.nodeType === 3) { buffer += child.nodeValue; return; }
+        if (child.nodeType !== 1 || skip(child)) return;
+        const tag = child.tagName;
+        if (/^H[1-6]$/.test(tag)) {
+            flush();
+            const text = squash(inline(child)).trim();
+            if (text) out.push('#'.repeat(+tag[1]) + ' ' + text);
+        } else if (tag === 'UL' || tag === 'OL') {
+            flush(); const l = list(child, 0); if (l) out.push(l);
+        } else if (tag === 'TABLE') {
+            flush(); const t = table(child); if (t) out.push(t);
+        } else if (tag === 'PRE') {
+            flush(); out.push('```\n' + child.textContent.replace(/\n+$/, '') + '\n```');
+        } else if (tag === 'BLOCKQUOTE') {
+            flush(); const q = squash(inline(child)).trim(); if (q) out.push('> ' + q);
+        } else if (tag === 'HR') {
+            flush();
+        } else if (BLOCK.has(tag) || tag === 'LI') {
+            flush(); blocks(child, out);
+        } else {
+            buffer += inline({childNodes: [child]});
+        }
+    });
+    flush();
+    return out;
+}
+
+const root = pickRoot();
+if (!root) return {error: 'Content root not found: ' + opts.selector};
+let markdown = blocks(root, []).join('\n\n').replace(/\n{3,}/g, '\n\n');
+const totalChars = markdown.length;
+const budget = opts.maxChars || 0;
+let truncated = false;
+if (budget && markdown.length > budget) { markdown = markdown.slice(0, budget); truncated = true; }
+
+// Chunk on paragraph boundaries where possible
+const size = opts.chunkSize || markdown.length || 1;
+const chunks = [];
+let rest = markdown;
+while (rest.length > size) {
+    let cut = rest.lastIndexOf('\n\n', size);
+    if (cut < size * 0.5) cut = size;
+    chunks.push(rest.slice(0, cut));
+    rest = rest.slice(cut).replace(/^\n+/, '');
+}
+chunks.push(rest);
+const index = Math.min(Math.max(opts.chunk || 0, 0), chunks.length - 1);
+
+return {
+    title: document.title,
+    url: location.href,
+    elements: document.getElementsByTagName('*').length,
+    totalChars: totalChars,
+    truncated: truncated,
+    chunks: chunks.length,
+    chunk: index,
+    text: chunks[index]
+};
+"""
+
+
+def get_content(driver, selector=None, max_chars=20000, chunk=0, chunk_size=None, links=True, images=False):
+    """Run the extraction script once and return its result dict"""
+    return driver.execute_script(CONTENT_SCRIPT, {
+        "selector": selector,
+        "maxChars": max_chars,
+        "chunk": chunk,
+        "chunkSize": chunk_size or max_chars,
+        "links": links,
+        "images": images,
+    })
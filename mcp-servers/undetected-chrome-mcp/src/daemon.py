@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+
+"""
+Daemon mode: one long-lived server that many MCP clients share.
+
+The daemon (server.py --daemon) serves MCP over a Unix socket and,
+optionally, a loopback TCP socket. Every connection is one client with its
+own tab in a shared pool of browsers, so clients share Chromium processes,
+HTTP cache and warm state instead of launching a browser each. Calls on a
+browser are scheduled round-robin across its clients, so one client
+pipelining a batch cannot starve the others. An AIMD controller bounds
+concurrent calls and how many browsers new clients are spread over, and
+quits surplus idle browsers when the host is under pressure. Refresh jobs
+belong to the daemon, not to a client: one scheduler, shared by every
+client, queues them on the first browser and keeps running after the
+client that added them disconnects.
+
+Existing stdio MCP configs keep working through the shim, which starts the
+daemon on first use:
+    server.py --connect [SOCKET_PATH | HOST:PORT]
+
+As in fleet mode, the MCP side comes from the server module that started
+the daemon, passed in as api.
+"""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+from concurrency import AIMDController
+from fleet import parse_address, process_tree_rss
+from jobs import JobScheduler
+from progress import Progress
+from stealth import bootstrap_tab
+import traffic
+
+DEFAULT_SOCKET = os.environ.get("UNDETECTED_MCP_SOCKET", os.path.join(tempfile.gettempdir(), "undetected-chrome-mcp.sock"))
+
+
+class Client:
+    """One connected MCP client: its tab, per-client tool state and counters"""
+
+    def __init__(self, client_id, send, mcp):
+        self.id = client_id
+        self.send = send
+        self.mcp = mcp
+        self.browser = None
+        self.tab = None
+        self.connected = time.time()
+        self.calls = 0
+        self.wait_seconds = 0.0
+        self.busy_seconds = 0.0
+
+
+class Browser:
+    """One shared Chromium; a single thread runs its calls, round-robin across clients"""
+
+    def __init__(self, index):
+        self.index = index
+        self.driver = None
+        self.active_tab = None
+        self.free_tabs = []
+        self.clients = []
+        self.pending = {}
+        self.order = deque()
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=f"browser-{index}", daemon=True)
+        self.thread.start()
+
+    def submit(self, client, job):
+        """Queue job() to run on this browser's thread on behalf of client (None for housekeeping)"""
+        with self.cond:
+            queue = self.pending.setdefault(client, deque())
+            if not queue:
+                self.order.append(client)
+            queue.append((job, time.time()))
+            self.cond.notify()
+
+    def drop(self, client):
+        """Forget a client's queued calls; returns how many were dropped"""
+        with self.cond:
+            queue = self.pending.pop(client, ())
+            if client in self.order:
+                self.order.remove(client)
+            return len(queue)
+
+    def queued(self):
+        with self.cond:
+            return sum(len(q) for q in self.pending.values())
+
+    def _next(self):
+        with self.cond:
+            while not self.order:
+                self.cond.wait()
+            client = self.order.popleft()
+            queue = self.pending[client]
+            job, enqueued = queue.popleft()
+            if queue:
+                # Back of the line: other clients with work go first
+                self.order.append(client)
+            else:
+                del self.pending[client]
+            return client, job, enqueued
+
+    def _run(self):
+        while True:
+            client, job, enqueued = self._next()
+            started = time.time()
+            try:
+                job()
+            except Exception as e:
+                print(f"Browser {self.index}: job failed: {e}", file=sys.stderr, flush=True)
+            if client is not None:
+                client.wait_seconds += started - enqueued
+                client.busy_seconds += time.time() - started
+
+    def attach(self, client):
+        """Point the client's tools at its tab, opening one on first use"""
+        if self.driver is None:
+            return
+        if client.tab is None:
+            if self.free_tabs:
+                client.tab = self.free_tabs.pop()
+            else:
+                self.driver.switch_to.new_window("tab")
+                client.tab = self.active_tab = self.driver.current_window_handle
+                bootstrap_tab(self.driver)
+            from selenium.webdriver.support.ui import WebDriverWait
+            client.mcp.driver = self.driver
+            client.mcp.wait = WebDriverWait(self.driver, 10)
+        self._switch(client.tab)
+
+    def adopt(self, client):
+        """The first client to launch Chromium hands it over to the pool"""
+        if self.driver is None and client.mcp.driver is not None:
+            self.driver = client.mcp.driver
+            client.tab = self.active_tab = self.driver.current_window_handle
+
+    def detach(self, client):
+        """Give up the client's tab; the last tab is blanked and kept for reuse"""
+        # The shared driver must survive the client's own cleanup
+        client.mcp.driver = None
+        client.mcp.close_browser()
+        if self.driver is None or client.tab is None:
+            return
+        try:
+            if len(self.driver.window_handles) > 1:
+                self.driver.switch_to.window(client.tab)
+                self.driver.close()
+                self.active_tab = None
+            else:
+                self._switch(client.tab)
+                self.driver.get("about:blank")
+                self.free_tabs.append(client.tab)
+        except Exception as e:
+            print(f"Browser {self.index}: dropping broken driver ({e})", file=sys.stderr, flush=True)
+            self.quit()
+        client.tab = None
+
+    def _switch(self, tab):
+        if self.active_tab != tab:
+            self.driver.switch_to.window(tab)
+            self.active_tab = tab
+
+    def quit(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+        self.active_tab = None
+        self.free_tabs = []
+        for client in self.clients:
+            client.tab = None
+            client.mcp.driver = None
+
+
+class Daemon:
+    """Client registry, browser pool and the tools/call scheduler"""
+
+    def __init__(self, api, browsers=1):
+        self.api = api
+        self.browsers = [Browser(i) for i in range(browsers)]
+        self.controller = AIMDController(maximum=browsers, initial=browsers, on_decision=self._rebalance)
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.served = 0
+        self._ids = 0
+        # Launches the first browser when a job is due before any client call
+        self.jobs_mcp = api.UndetectedChromeMCP()
+        self.jobs = JobScheduler(self.jobs_mcp, runner=self._run_job)
+
+    def connect(self, send):
+        with self.lock:
+            self._ids += 1
+            client = Client(self._ids, send, self.api.UndetectedChromeMCP())
+            # New clients only go to browsers within the current concurrency limit
+            active = self.browsers[:self.controller.slots]
+            client.browser = min(active, key=lambda b: (len(b.clients), b.index))
+            client.browser.clients.append(client)
+            self.clients[client.id] = client
+        client.mcp.shared_jobs = self.jobs
+        return client
+
+    def _run_job(self, job):
+        """Queue a job refresh on the first browser, taking its turn with the clients' calls"""
+        browser = self.browsers[0]
+
+        def run():
+            job(browser.driver)
+            if browser.driver is None and self.jobs_mcp.driver is not None:
+                # The job launched the browser; hand it to the pool, its first tab to the next client
+                browser.driver, self.jobs_mcp.driver = self.jobs_mcp.driver, None
+                browser.active_tab = browser.driver.current_window_handle
+                browser.free_tabs.append(browser.active_tab)
+
+        browser.submit(None, run)
+
+    def disconnect(self, client, drop=False):
+        """Release the client's tab after its queued calls, or at once with drop"""
+        browser = client.browser
+        if drop:
+            browser.drop(client)
+        with self.lock:
+            self.clients.pop(client.id, None)
+            browser.clients.remove(client)
+        done = threading.Event()
+
+        def release():
+            try:
+                browser.detach(client)
+            finally:
+                done.set()
+
+        browser.submit(client, release)
+        done.wait(30)
+
+    def _rebalance(self, decision):
+        """After a decrease, quit browsers beyond the limit that no client uses"""
+        if decision["action"] != "decrease":
+            return
+        with self.lock:
+            surplus = [b for b in self.browsers[self.controller.slots:] if not b.clients and b.driver]
+        for browser in surplus:
+            browser.submit(None, lambda browser=browser: not browser.clients and browser.quit())
+
+    def call(self, client, request):
+        """Schedule a tools/call; the response is sent from the browser thread"""
+        params = request.get("params", {})
+        name = params.get("name")
+
+        def run():
+            browser = client.browser
+            try:
+                if name == "undetected_close":
+                    browser.detach(client)
+                    result = {"content": [{"type": "text", "text": "✅ Tab closed (the shared browser keeps running)"}]}
+                else:
+                    with self.controller.slot() as slot:
+                        browser.attach(client)
+                        progress = Progress.for_request(params, client.send)
+                        result = self.api.call_tool(client.mcp, name, params.get("arguments", {}), progress)
+                        browser.adopt(client)
+                        slot["ok"] = not result["content"][0].get("text", "").startswith("❌")
+                response = {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+            except Exception as e:
+                response = self.api.error_response(request, e)
+            client.calls += 1
+            self.served += 1
+            client.send(response)
+
+        client.browser.submit(client, run)
+
+    def status(self):
+        uptime = time.time() - self.started
+        lines = [
+            f"🔌 Daemon pid {os.getpid()}: {len(self.clients)} clients, {len(self.browsers)} browsers, "
+            f"{self.served} calls served in {uptime:.0f}s, RSS {process_tree_rss() / 1048576:.0f} MB"
+        ]
+        lines.extend(self.controller.format())
+        for browser in self.browsers:
+            state = "running" if browser.driver else "not started"
+            lines.append(f"   🌐 Browser {browser.index} ({state}): {len(browser.clients)} clients, {browser.queued()} queued calls")
+            for client in list(browser.clients):
+                average_wait = client.wait_seconds / client.calls * 1000 if client.calls else 0
+                lines.append(
+                    f"      client {client.id}: {client.calls} calls, avg queue wait {average_wait:.0f} ms, "
+                    f"busy {client.busy_seconds:.1f}s{', tab open' if client.tab else ''}"
+                )
+        return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+
+    def tools(self):
+        return self.api.TOOLS + [{
+            "name": "undetected_daemon_status",
+            "description": "Show daemon clients, shared browsers, queue depth and per-client scheduling stats",
+            "inputSchema": {"type": "object", "properties": {}},
+        }]
+
+    def shutdown(self):
+        self.jobs.stop()
+        self.controller.stop()
+        for browser in self.browsers:
+            browser.quit()
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """One MCP client connection; responses may arrive out of request order"""
+
+    def handle(self):
+        daemon = self.server.daemon
+        write_lock = threading.Lock()
+
+        def send(message):
+            if traffic.recorder:
+                traffic.recorder.record("out", message, client=client.id)
+            try:
+                with write_lock:
+                    self.wfile.write((json.dumps(message) + "\n").encode())
+                    self.wfile.flush()
+            except OSError:
+                pass
+
+        client = daemon.connect(send)
+        reset = False
+        try:
+            for line in self.rfile:
+                line = line.strip()
+                if not line:
+                    continue
+                if traffic.recorder:
+                    traffic.recorder.record("in", line, client=client.id)
+                request = None
+                try:
+                    request = json.loads(line)
+                    if request.get("method") == "tools/call":
+                        if request.get("params", {}).get("name") == "undetected_daemon_status":
+                            send({"jsonrpc": "2.0", "id": request.get("id"), "result": daemon.status()})
+                        else:
+                            daemon.call(client, request)
+                        continue
+                    response = daemon.api.handle_request(None, request, tools=daemon.tools())
+                except json.JSONDecodeError:
+                    continue
+                except Exception as e:
+                    response = daemon.api.error_response(request, e)
+                if response is not None:
+                    send(response)
+        except OSError:
+            reset = True
+        finally:
+            # On a clean EOF the client still gets answers to calls it already sent
+            daemon.disconnect(client, drop=reset)
+
+
+class UnixDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TCPDaemonServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _socket_in_use(path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(api, socket_path=DEFAULT_SOCKET, tcp=None, browsers=1):
+    """Run the daemon until interrupted; api is the server module"""
+    if os.path.exists(socket_path):
+        if _socket_in_use(socket_path):
+            print(f"A daemon is already listening on {socket_path}", file=sys.stderr)
+            sys.exit(1)
+        os.unlink(socket_path)
+
+    daemon = Daemon(api, browsers)
+    servers = [UnixDaemonServer(socket_path, DaemonHandler)]
+    os.chmod(socket_path, 0o600)
+    if tcp:
+        host, port = parse_address(tcp)
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            print(f"Refusing to listen on non-loopback address {host}", file=sys.stderr)
+            sys.exit(1)
+        servers.append(TCPDaemonServer((host, port), DaemonHandler))
+    for server in servers:
+        server.daemon = daemon
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, name="daemon-tcp", daemon=True).start()
+
+    # SIGTERM takes the same path as Ctrl-C so browsers are quit and the socket removed
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _interrupt)
+    print(f"Daemon listening on {socket_path}{f' and {tcp}' if tcp else ''} with {browsers} browsers", file=sys.stderr, flush=True)
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.server_close()
+        daemon.shutdown()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def _open(address):
+    if ":" in address and os.path.sep not in address:
+        return socket.create_connection(parse_address(address))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def connect_stdio(address=DEFAULT_SOCKET, spawn=True, browsers=1):
+    """stdio shim: relay MCP between stdin/stdout and the daemon, starting it if needed"""
+    try:
+        sock = _open(address)
+    except OSError:
+        if not spawn or ":" in address:
+            raise
+        server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+        # Detached, logging next to the socket, so it outlives this client
+        with open(address + ".log", "ab") as log:
+            subprocess.Popen(
+                [sys.executable, server_path, "--daemon", "--socket", address, "--browsers", str(browsers)],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True,
+            )
+        deadline = time.time() + 15
+        while True:
+            try:
+                sock = _open(address)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    def pump_responses():
+        for line in sock.makefile("rb"):
+            sys.stdout.write(line.decode())
+            sys.stdout.flush()
+        os._exit(0)
+
+    reader = threading.Thread(target=pump_responses, name="shim-reader", daemon=True)
+    reader.start()
+    try:
+        for line in sys.stdin:
+            if line.strip():
+                sock.sendall(line.encode() if line.endswith("\n") else (line + "\n").encode())
+        # Half-close so the daemon answers what is in flight, then ends the stream
+        sock.shutdown(socket.SHUT_WR)
+        reader.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+
+def main(args, api):
+    """Run the daemon or the stdio shim from parsed server.py arguments; api is the server module"""
+    if args.daemon:
+        serve(api, args.socket, args.tcp, args.browsers)
+    else:
+        connect_stdio(args.connect or args.socket, browsers=args.browsers)
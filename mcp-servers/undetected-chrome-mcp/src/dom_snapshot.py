@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+
+"""
+Local DOM index built from one CDP DOMSnapshot.captureSnapshot call.
+
+After a single capture, CSS-subset queries, text and attribute reads and
+outerHTML previews are answered in-process without browser round trips.
+
+Supported selectors: tag, *, #id, .class, [attr], [attr=v], [attr~=v],
+[attr|=v], [attr^=v], [attr$=v], [attr*=v] (with optional " i" flag),
+compound forms of those, descendant (" ") and child (">") combinators,
+and comma-separated selector lists.
+"""
+
+import bisect
+import functools
+import html
+import re
+
+ELEMENT_NODE = 1
+TEXT_NODE = 3
+
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+SKIP_TEXT = {"script", "style", "noscript", "template"}
+# Tags whose start implicitly closes an open sibling of the same kind
+IMPLIED_END = {"li", "p", "option", "tr", "td", "th", "dt", "dd"}
+
+_TOKEN = re.compile(r"""
+    (?P<ws>\s*>\s*|\s+)
+  | (?P<tag>\*|[a-zA-Z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?P<value>"[^"]*"|'[^']*'|[^\]\s]+)\s*(?P<flag>[iI])?\s*)?\]
+""", re.VERBOSE)
+
+
+class SelectorError(ValueError):
+    """Raised for selectors outside the supported CSS subset"""
+
+
+@functools.lru_cache(maxsize=256)
+def parse_selector(selector):
+    """Parse a selector list into [[(combinator, compound), ...], ...]
+
+    Each compound is {"tag", "id", "classes", "attrs"}; the combinator links
+    a compound to the one before it (None for the first).
+    """
+    groups = []
+    for part in selector.split(","):
+        part = part.strip()
+        if not part:
+            raise SelectorError(f"Empty selector in {selector!r}")
+        steps, compound, combinator, pos = [], None, None, 0
+        while pos < len(part):
+            match = _TOKEN.match(part, pos)
+            if not match:
+                raise SelectorError(f"Unsupported selector syntax at {part[pos:]!r}")
+            pos = match.end()
+            if match.group("ws") is not None:
+                if compound is not None:
+                    steps.append((combinator, compound))
+                    compound = None
+                combinator = ">" if ">" in match.group("ws") else " "
+                continue
+            if compound is None:
+                compound = {"tag": None, "id": None, "classes": [], "attrs": []}
+            if match.group("tag"):
+                compound["tag"] = None if match.group("tag") == "*" else match.group("tag").lower()
+            elif match.group("id"):
+                compound["id"] = match.group("id")
+            elif match.group("cls"):
+                compound["classes"].append(match.group("cls"))
+            else:
+                value = match.group("value")
+                if value and value[0] in "\"'":
+                    value = value[1:-1]
+                compound["attrs"].append((match.group("attr").lower(), match.group("op"), value, bool(match.group("flag"))))
+        if compound is None:
+            raise SelectorError(f"Selector ends with a combinator: {part!r}")
+        steps.append((combinator, compound))
+        steps[0] = (None, steps[0][1])
+        groups.append(steps)
+    return groups
+
+
+def _attr_matches(actual, op, expected, ignore_case):
+    if actual is None:
+        return False
+    if op is None:
+        return True
+    if ignore_case:
+        actual, expected = actual.lower(), expected.lower()
+    if op == "=":
+        return actual == expected
+    if op == "~=":
+        return expected in actual.split()
+    if op == "|=":
+        return actual == expected or actual.startswith(expected + "-")
+    if op == "^=":
+        return bool(expected) and actual.startswith(expected)
+    if op == "$=":
+        return bool(expected) and actual.endswith(expected)
+    if op == "*=":
+        return bool(expected) and expected in actual
+    return False
+
+
+class DomSnapshot:
+    """Element index over a captured DOMSnapshot"""
+
+    def __init__(self, snapshot, url=None):
+        strings = snapshot.get("strings", [])
+        self.url = url
+        self.tags = []
+        self.attrs = []
+        self.parents = []
+        self.node_types = []
+        self.values = []
+        self.by_tag = {}
+        self.by_id = {}
+        self.by_class = {}
+        self.by_attr = {}
+        self._text_cache = {}
+        self._subtree_end = []
+
+        def s(index):
+            return strings[index] if 0 <= index < len(strings) else None
+
+        for document in snapshot.get("documents", []):
+            nodes = document.get("nodes", {})
+            offset = len(self.tags)
+            parent_index = nodes.get("parentIndex", [])
+            node_types = nodes.get("nodeType", [])
+            node_names = nodes.get("nodeName", [])
+            node_values = nodes.get("nodeValue", [])
+            attributes = nodes.get("attributes", [])
+            for i in range(len(node_types)):
+                node_id = offset + i
+                parent = parent_index[i] if i < len(parent_index) else -1
+                self.parents.append(parent + offset if parent >= 0 else -1)
+                self.node_types.append(node_types[i])
+                name = (s(node_names[i]) or "").lower()
+                self.tags.append(name)
+                self.values.append(s(node_values[i]) if i < len(node_values) else None)
+                pairs = attributes[i] if i < len(attributes) else []
+                attrs = {s(pairs[j]).lower(): s(pairs[j + 1]) for j in range(0, len(pairs) - 1, 2)}
+                self.attrs.append(attrs)
+                if node_types[i] != ELEMENT_NODE:
+                    continue
+                self.by_tag.setdefault(name, []).append(node_id)
+                for attr_name in attrs:
+                    self.by_attr.setdefault(attr_name, []).append(node_id)
+                if attrs.get("id"):
+                    self.by_id.setdefault(attrs["id"], []).append(node_id)
+                for cls in (attrs.get("class") or "").split():
+                    self.by_class.setdefault(cls, []).append(node_id)
+
+        # Nodes arrive in document (pre-)order, so each subtree is a contiguous range
+        self._subtree_end = list(range(1, len(self.tags) + 1))
+        for node_id in range(len(self.tags) - 1, -1, -1):
+            parent = self.parents[node_id]
+            if parent >= 0 and self._subtree_end[node_id] > self._subtree_end[parent]:
+                self._subtree_end[parent] = self._subtree_end[node_id]
+
+    def __len__(self):
+        return len(self.tags)
+
+    @property
+    def element_count(self):
+        return sum(len(ids) for ids in self.by_tag.values())
+
+    def _candidates(self, compound):
+        """Smallest index bucket that can satisfy a compound selector"""
+        if compound["id"]:
+            return self.by_id.get(compound["id"], [])
+        buckets = [self.by_class.get(cls, []) for cls in compound["classes"]]
+        buckets += [self.by_attr.get(name, []) for name, _, _, _ in compound["attrs"]]
+        if compound["tag"]:
+            buckets.append(self.by_tag.get(compound["tag"], []))
+        if buckets:
+            return min(buckets, key=len)
+        return sorted(n for ids in self.by_tag.values() for n in ids)
+
+    def _matches(self, node_id, compound):
+        if self.node_types[node_id] != ELEMENT_NODE:
+            return False
+        if compound["tag"] and self.tags[node_id] != compound["tag"]:
+            return False
+        attrs = self.attrs[node_id]
+        if compound["id"] and attrs.get("id") != compound["id"]:
+            return False
+        if compound["classes"]:
+            classes = (attrs.get("class") or "").split()
+            if any(cls not in classes for cls in compound["classes"]):
+                return False
+        for name, op, value, ignore_case in compound["attrs"]:
+            if not _attr_matches(attrs.get(name), op, value, ignore_case):
+                return False
+        return True
+
+    def _matches_steps(self, node_id, steps, index):
+        combinator, compound = steps[index]
+        if not self._matches(node_id, compound):
+            return False
+        if index == 0:
+            return True
+        parent = self.parents[node_id]
+        if combinator == ">":
+            return parent >= 0 and self._matches_steps(parent, steps, index - 1)
+        while parent >= 0:
+            if self._matches_steps(parent, steps, index - 1):
+                return True
+            parent = self.parents[parent]
+        return False
+
+    def select(self, selector, limit=None, within=None):
+        """Element ids matching a selector, in document order
+
+        within restricts matches to descendants of that element, like
+        element.querySelectorAll().
+        """
+        found = set()
+        for steps in parse_selector(selector):
+            last = len(steps) - 1
+            candidates = self._candidates(steps[last][1])
+            if within is not None:
+                lo = bisect.bisect_right(candidates, within)
+                hi = bisect.bisect_left(candidates, self._subtree_end[within])
+                candidates = candidates[lo:hi]
+            for node_id in candidates:
+                if node_id not in found and self._matches_steps(node_id, steps, last):
+                    found.add(node_id)
+        result = sorted(found)
+        return result[:limit] if limit else result
+
+    def attr(self, node_id, name):
+        return self.attrs[node_id].get(name.lower())
+
+    def text(self, node_id):
+        """Whitespace-normalized text content of an element"""
+        cached = self._text_cache.get(node_id)
+        if cached is not None:
+            return cached
+        parts = []
+        skip_until = -1
+        for i in range(node_id, self._subtree_end[node_id]):
+            if i < skip_until:
+                continue
+            if self.tags[i] in SKIP_TEXT and i != node_id:
+                skip_until = self._subtree_end[i]
+                continue
+            if self.node_types[i] == TEXT_NODE and self.values[i]:
+                parts.append(self.values[i])
+        text = " ".join(" ".join(parts).split())
+        self._text_cache[node_id] = text
+        return text
+
+    def contains(self, node_ids, needle):
+        """Filter elements whose text contains a substring (case-insensitive)"""
+        needle = needle.lower()
+        return [n for n in node_ids if needle in self.text(n).lower()]
+
+    def outer_html(self, node_id, limit=None):
+        """Reconstruct an element's outerHTML, stopping early once limit chars are produced"""
+        out = []
+        size = [0]
+
+        def emit(chunk):
+            out.append(chunk)
+            size[0] += len(chunk)
+            return limit is not None and size[0] >= limit
+
+        def walk(n):
+            node_type = self.node_types[n]
+            if node_type == TEXT_NODE:
+                return emit(html.escape(self.values[n] or "", quote=False))
+            if node_type != ELEMENT_NODE:
+                return False
+            tag = self.tags[n]
+            attrs = "".join(f' {k}="{html.escape(v or "")}"' for k, v in self.attrs[n].items())
+            if emit(f"<{tag}{attrs}>"):
+                return True
+            if tag in VOID_ELEMENTS:
+                return False
+            child = n + 1
+            while child < self._subtree_end[n]:
+                if walk(child):
+                    return True
+                child = self._subtree_end[child]
+            return emit(f"</{tag}>")
+
+        walk(node_id)
+        result = "".join(out)
+        return result[:limit] if limit else result
+
+    def read(self, node_id, attribute=None):
+        """Same semantics as undetected_extract: an attribute value or the element text"""
+        if attribute == "outerHTML":
+            return self.outer_html(node_id)
+        if attribute in ("textContent", "innerText"):
+            return self.text(node_id)
+        if attribute:
+            return self.attr(node_id, attribute)
+        return self.text(node_id)
+
+
+class _SnapshotBuilder:
+    """Accumulates nodes in DOMSnapshot's columnar layout"""
+
+    def __init__(self):
+        self.strings = []
+        self.string_ids = {}
+        self.nodes = {"parentIndex": [], "nodeType": [], "nodeName": [], "nodeValue": [], "attributes": []}
+
+    def _s(self, value):
+        if value is None:
+            return -1
+        index = self.string_ids.get(value)
+        if index is None:
+            index = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def add(self, parent, node_type, name, value=None, attrs=()):
+        nodes = self.nodes
+        nodes["parentIndex"].append(parent)
+        nodes["nodeType"].append(node_type)
+        nodes["nodeName"].append(self._s(name))
+        nodes["nodeValue"].append(self._s(value))
+        nodes["attributes"].append([self._s(x) for pair in attrs for x in pair])
+        return len(nodes["nodeType"]) - 1
+
+    def result(self):
+        return {"documents": [{"nodes": self.nodes}], "strings": self.strings}
+
+
+def _snapshot_from_lxml(markup):
+    import lxml.html
+
+    builder = _SnapshotBuilder()
+    document = builder.add(-1, 9, "#document")
+    root = lxml.html.document_fromstring(markup)
+    stack = [(root, document)]
+    while stack:
+        item, parent = stack.pop()
+        if isinstance(item, str):
+            builder.add(parent, TEXT_NODE, "#text", item)
+            continue
+        if not isinstance(item.tag, str):
+            # Comments and processing instructions only contribute their tail
+            continue
+        node = builder.add(parent, ELEMENT_NODE, item.tag.upper(), None, [(k, v or "") for k, v in item.attrib.items()])
+        pending = []
+        if item.text:
+            pending.append((item.text, node))
+        for child in item:
+            pending.append((child, node))
+            if child.tail:
+                pending.append((child.tail, node))
+        stack.extend(reversed(pending))
+    return builder.result()
+
+
+def _snapshot_from_html_parser(markup):
+    from html.parser import HTMLParser
+
+    builder = _SnapshotBuilder()
+    stack = [(builder.add(-1, 9, "#document"), None)]
+
+    class Parser(HTMLParser):
+        def handle_starttag(self, tag, attrs):
+            if tag in IMPLIED_END and stack[-1][1] == tag:
+                stack.pop()
+            node = builder.add(stack[-1][0], ELEMENT_NODE, tag.upper(), None, [(k, v or "") for k, v in attrs])
+            if tag not in VOID_ELEMENTS:
+                stack.append((node, tag))
+
+        def handle_startendtag(self, tag, attrs):
+            builder.add(stack[-1][0], ELEMENT_NODE, tag.upper(), None, [(k, v or "") for k, v in attrs])
+
+        def handle_endtag(self, tag):
+            # Close up to the matching open tag; stray end tags are ignored
+            for depth in range(len(stack) - 1, 0, -1):
+                if stack[depth][1] == tag:
+                    del stack[depth:]
+                    break
+
+        def handle_data(self, data):
+            builder.add(stack[-1][0], TEXT_NODE, "#text", data)
+
+    parser = Parser(convert_charrefs=True)
+    parser.feed(markup)
+    parser.close()
+    return builder.result()
+
+
+def from_html(markup, url=None):
+    """Build a DomSnapshot from serialized HTML, using lxml when it is installed"""
+    try:
+        snapshot = _snapshot_from_lxml(markup)
+    except ImportError:
+        snapshot = _snapshot_from_html_parser(markup)
+    return DomSnapshot(snapshot, url=url)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+"""
+DOM change feed: a MutationObserver buffers structural, text and attribute
+changes under configured roots, and polls return only what changed since
+the caller's cursor. With an item selector (e.g. one listing card),
+changes are reported per item: added, removed, or changed with its new
+text, so polling cost follows the size of the change, not of the page.
+"""
+
+WATCH_SCRIPT = r"""
+const opts = arguments[0] || {};
+if (window.__ucWatch) window.__ucWatch.observer.disconnect();
+const maxText = opts.maxText || 200;
+const maxBuffer = opts.maxBuffer || 5000;
+const item = opts.item || null;
+const keyAttr = opts.keyAttribute || null;
+const state = window.__ucWatch = {
+    id: Math.random().toString(36).slice(2),
+    seq: 0,
+    changes: [],
+    overflow: 0,
+    delivered: 0,
+    pending: new WeakMap(),
+    observer: null
+};
+
+const text = el => (el.textContent || '').replace(/\s+/g, ' ').trim().slice(0, maxText);
+const describe = el => {
+    let d = el.tagName.toLowerCase();
+    if (el.id) d += '#' + el.id;
+    if (typeof el.className === 'string' && el.className.trim()) d += '.' + el.className.trim().split(/\s+/).slice(0, 3).join('.');
+    return d;
+};
+const keyOf = el => {
+    if (keyAttr) {
+        const holder = el.hasAttribute(keyAttr) ? el : el.querySelector('[' + keyAttr + ']');
+        if (holder) return holder.getAttribute(keyAttr);
+    }
+    return el.id || null;
+};
+const push = change => {
+    change.seq = ++state.seq;
+    state.changes.push(change);
+    if (state.changes.length > maxBuffer) {
+        state.changes.shift();
+        state.overflow++;
+    }
+    return change;
+};
+const itemsIn = node => {
+    if (node.nodeType !== 1) return [];
+    if (node.matches(item)) return [node];
+    return Array.from(node.querySelectorAll(item));
+};
+const owner = node => {
+    const el = node.nodeType === 1 ? node : node.parentElement;
+    return el ? (item ? el.closest(item) : el) : null;
+};
+const changed = el => {
+    // Coalesce repeated edits of the same element until they are delivered
+    const existing = state.pending.get(el);
+    if (existing && existing.seq > state.delivered) {
+        existing.text = text(el);
+        return;
+    }
+    state.pending.set(el, push({type: 'changed', target: describe(el), key: keyOf(el), text: text(el)}));
+};
+
+state.observer = new MutationObserver(records => {
+    for (const record of records) {
+        if (record.type === 'childList') {
+            for (const node of record.addedNodes) {
+                if (item) {
+                    const added = itemsIn(node);
+                    added.forEach(el => push({type: 'added', target: describe(el), key: keyOf(el), text: text(el)}));
+                    if (!added.length) { const o = owner(record.target); if (o) changed(o); }
+                } else if (node.nodeType === 1) {
+                    push({type: 'added', target: describe(node), parent: describe(record.target), key: keyOf(node), text: text(node)});
+                } else if (node.nodeType === 3 && node.nodeValue.trim()) {
+                    changed(record.target);
+                }
+            }
+            for (const node of record.removedNodes) {
+                if (item) {
+                    const removed = itemsIn(node);
+                    removed.forEach(el => push({type: 'removed', target: describe(el), key: keyOf(el), text: text(el)}));
+                    if (!removed.length && record.target.isConnected) { const o = owner(record.target); if (o) changed(o); }
+                } else if (node.nodeType === 1) {
+                    push({type: 'removed', target: describe(node), parent: describe(record.target), key: keyOf(node), text: text(node)});
+                }
+            }
+        } else if (record.type === 'characterData') {
+            const o = owner(record.target);
+            if (o) changed(o);
+        } else if (record.type === 'attributes') {
+            const el = item ? record.target.closest(item) : record.target;
+            if (!el) continue;
+            push({type: 'attribute', target: describe(record.target), key: keyOf(el), name: record.attributeName,
+                  value: record.target.getAttribute(record.attributeName)});
+        }
+    }
+});
+
+const roots = opts.roots && opts.roots.length
+    ? opts.roots.flatMap(sel => Array.from(document.querySelectorAll(sel)))
+    : [document.body];
+const config = {childList: true, subtree: true, characterData: true};
+if (opts.attributes && opts.attributes.length) {
+    config.attributes = true;
+    config.attributeFilter = opts.attributes;
+}
+roots.forEach(root => state.observer.observe(root, config));
+return {id: state.id, roots: roots.length, items: item ? roots.reduce((n, r) => n + itemsIn(r).length, 0) : null};
+"""
+
+POLL_SCRIPT = r"""
+const cursor = arguments[0] || 0;
+const limit = arguments[1] || 500;
+const state = window.__ucWatch;
+if (!state) return {lost: true};
+// Everything at or below the cursor has been delivered and can be dropped
+state.changes = state.changes.filter(c => c.seq > cursor);
+const batch = state.changes.slice(0, limit);
+const next = batch.length ? batch[batch.length - 1].seq : Math.max(cursor, state.seq);
+state.delivered = next;
+const overflow = state.overflow;
+state.overflow = 0;
+return {id: state.id, cursor: next, changes: batch, more: state.changes.length > batch.length, overflow: overflow};
+"""
+
+STOP_SCRIPT = r"""
+if (window.__ucWatch) { window.__ucWatch.observer.disconnect(); delete window.__ucWatch; return true; }
+return false;
+"""
+
+
+def start_watch(driver, roots=None, item=None, key_attribute=None, attributes=None, max_text=200, max_buffer=5000):
+    return driver.execute_script(WATCH_SCRIPT, {
+        "roots": roots or [],
+        "item": item,
+        "keyAttribute": key_attribute,
+        "attributes": attributes or [],
+        "maxText": max_text,
+        "maxBuffer": max_buffer,
+    })
+
+
+def poll_watch(driver, cursor=0, limit=500):
+    return driver.execute_script(POLL_SCRIPT, cursor, limit)
+
+
+def stop_watch(driver):
+    return driver.execute_script(STOP_SCRIPT)
+
+
+def format_change(change):
+    """One line per change, e.g. '+ article.card [/vehicle/123] 2020 Toyota Camry $25,000'"""
+    symbol = {"added": "+", "removed": "-", "changed": "~", "attribute": "@"}.get(change.get("type"), "?")
+    key = f" [{change['key']}]" if change.get("key") else ""
+    if change.get("type") == "attribute":
+        return f"{symbol} {change['target']}{key} {change.get('name')}={change.get('value')!r}"
+    return f"{symbol} {change.get('target')}{key} {change.get('text', '')}".rstrip()
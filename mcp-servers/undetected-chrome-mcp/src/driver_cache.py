@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+"""
+Shared cache of patched chromedriver binaries.
+
+undetected_chromedriver patches chromedriver by reading the whole binary,
+regex-scanning it, building a second copy with the injected cdc_ block
+replaced and writing that back; checking whether a binary is patched reads
+it whole again. Each script also kept its own copy at /tmp/chromedriver.
+
+Here a source driver is copied into the cache once per build and patched in
+place through mmap: the block is searched for directly in the mapping, its
+end only within MAX_BLOCK bytes, and only those bytes are rewritten.
+Entries live under <root>/<sha256 of the source>/ next to a meta.json with
+the patched file's size, digest and patch offsets. Any process asking for
+the same source gets the same entry; the source digest is remembered per
+inode, size and mtime so it is not rehashed either. An entry is checked
+against its metadata before each use (size, mode and the patched bytes,
+or the full digest with verify --full) and rebuilt if it does not match.
+
+Which driver to patch is resolved offline by driver_mirror: the system
+chromedriver, or a matching one streamed out of a zip in the local mirror.
+The same resolution backs CachedPatcher, so undetected_chromedriver never
+reaches for the network while it is installed (UNDETECTED_DRIVER_DOWNLOAD=1
+lets it fall back to downloading when nothing local matches).
+
+Usage:
+    python3 driver_cache.py prepare
+    python3 driver_cache.py prepare /usr/bin/chromedriver
+    python3 driver_cache.py verify --full
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import driver_mirror
+
+try:
+    from undetected_chromedriver.patcher import LooseVersion, Patcher
+except ImportError:
+    # The cache itself only needs the standard library
+    Patcher = object
+
+DEFAULT_ROOT = driver_mirror.CACHE_ROOT
+ALLOW_DOWNLOAD = os.environ.get("UNDETECTED_DRIVER_DOWNLOAD") == "1"
+# Same replacement as undetected_chromedriver, so either side recognises the other's patch
+MARKER = b"undetected chromedriver"
+REPLACEMENT = b'{console.log("undetected chromedriver 1337!")}'
+BLOCK_START = b"{window.cdc"
+BLOCK_END = b";}"
+MAX_BLOCK = 4096
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+    return digest.hexdigest()
+
+
+def patch_in_place(path):
+    """Blank every injected cdc_ block of the binary at path; returns the patched offsets"""
+    offsets = []
+    with open(path, "r+b") as f, mmap.mmap(f.fileno(), 0) as mm:
+        position = mm.find(BLOCK_START)
+        while position != -1:
+            end = mm.find(BLOCK_END, position, position + MAX_BLOCK)
+            if end == -1:
+                break
+            length = end + len(BLOCK_END) - position
+            if length >= len(REPLACEMENT):
+                mm[position:position + length] = REPLACEMENT.ljust(length, b" ")
+                offsets.append(position)
+            position = mm.find(BLOCK_START, position + length)
+        mm.flush()
+    return offsets
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_patched(path):
+    """Whether the binary at path has the patch, from its cache metadata when it has any"""
+    meta = _read_meta(os.path.dirname(os.path.abspath(path)))
+    if meta is not None:
+        return verify_entry(path, meta)
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(MARKER) != -1
+    except (OSError, ValueError):
+        return False
+
+
+def verify_entry(path, meta, full=False):
+    """Cheap integrity check of a cached driver against its metadata; full rehashes it"""
+    try:
+        stat = os.stat(path)
+        if stat.st_size != meta["size"] or not stat.st_mode & 0o100:
+            return False
+        with open(path, "rb") as f:
+            for offset in meta["offsets"]:
+                if os.pread(f.fileno(), len(REPLACEMENT), offset) != REPLACEMENT:
+                    return False
+    except (OSError, KeyError):
+        return False
+    return not full or file_digest(path) == meta["sha256"]
+
+
+class DriverCache:
+    """Patched chromedriver binaries keyed by the content hash of their source"""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self.sources_path = os.path.join(root, "sources.json")
+        os.makedirs(root, exist_ok=True)
+
+    def _lock(self):
+        fd = os.open(os.path.join(self.root, ".lock"), os.O_RDWR | os.O_CREAT, 0o666)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def _write_json(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+
+    def _sources(self):
+        try:
+            with open(self.sources_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _source_key(self, source, member=None):
+        stat = os.stat(source)
+        key = f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+        return f"{key}:{member}" if member else key
+
+    def _remember_source(self, key, digest):
+        sources = self._sources()
+        if sources.get(key) != digest:
+            sources[key] = digest
+            self._write_json(self.sources_path, sources)
+
+    def source_digest(self, source):
+        """sha256 of a source driver, hashed once per inode, size and mtime"""
+        key = self._source_key(source)
+        digest = self._sources().get(key)
+        if digest is None:
+            digest = file_digest(source)
+            self._remember_source(key, digest)
+        return digest
+
+    def entry_dir(self, digest):
+        return os.path.join(self.root, digest)
+
+    def patched(self, source=driver_mirror.SYSTEM_CHROMEDRIVER):
+        """Path to the patched copy of source, building it on first use"""
+        source = os.path.realpath(source)
+        digest = self.source_digest(source)
+        directory = self.entry_dir(digest)
+        path = os.path.join(directory, "chromedriver")
+        meta = _read_meta(directory)
+        if meta is not None and verify_entry(path, meta):
+            return path
+
+        fd = self._lock()
+        try:
+            # Another process may have built it while we waited
+            meta = _read_meta(directory)
+            if meta is not None and verify_entry(path, meta):
+                return path
+            return self._build(lambda tmp: shutil.copyfile(source, tmp), source, digest, path)
+        finally:
+            os.close(fd)
+
+    def patched_from_zip(self, archive, member):
+        """Path to the patched copy of a driver inside a zip, streamed out on first use"""
+        archive = os.path.realpath(archive)
+        key = self._source_key(archive, member)
+        digest = self._sources().get(key)
+        if digest is not None:
+            path = os.path.join(self.entry_dir(digest), "chromedriver")
+            meta = _read_meta(self.entry_dir(digest))
+            if meta is not None and verify_entry(path, meta):
+                return path
+
+        fd = self._lock()
+        try:
+            # The archive's digest says nothing about the driver inside, so hash what comes out
+            with zipfile.ZipFile(archive) as zf, zf.open(member) as src:
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: src.read(1 << 20), b""):
+                    digest.update(chunk)
+            digest = digest.hexdigest()
+            self._remember_source(key, digest)
+            path = os.path.join(self.entry_dir(digest), "chromedriver")
+            meta = _read_meta(self.entry_dir(digest))
+            if meta is not None and verify_entry(path, meta):
+                return path
+            return self._build(lambda tmp: driver_mirror.stream_member(archive, member, tmp),
+                               f"{archive}!{member}", digest, path)
+        finally:
+            os.close(fd)
+
+    def _build(self, fill, source, digest, path):
+        """Write a fresh copy with fill(tmp), patch it and move it into place as path"""
+        started = time.perf_counter()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            fill(tmp)
+            offsets = patch_in_place(tmp)
+            os.chmod(tmp, 0o755)
+            meta = {
+                "source": source,
+                "source_sha256": digest,
+                "sha256": file_digest(tmp),
+                "size": os.path.getsize(tmp),
+                "offsets": offsets,
+                "created": time.time(),
+                "seconds": time.perf_counter() - started,
+            }
+            # A driver already running from path keeps its old inode
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self._write_json(os.path.join(os.path.dirname(path), "meta.json"), meta)
+        return path
+
+    def resolve(self, mirror=driver_mirror.DEFAULT_MIRROR):
+        """Resolve a driver for the installed browser offline and patch it
+
+        Returns driver_mirror.resolve()'s result with the patched path under
+        "executable".
+        """
+        resolved = driver_mirror.resolve(mirror=mirror)
+        if resolved["member"]:
+            resolved["executable"] = self.patched_from_zip(resolved["path"], resolved["member"])
+        else:
+            resolved["executable"] = self.patched(resolved["path"])
+        return resolved
+
+    def entries(self):
+        """(path, meta) for every cached driver"""
+        found = []
+        for name in sorted(os.listdir(self.root)):
+            meta = _read_meta(self.entry_dir(name))
+            if meta is not None:
+                found.append((os.path.join(self.entry_dir(name), "chromedriver"), meta))
+        return found
+
+
+class CachedPatcher(Patcher):
+    """undetected_chromedriver's Patcher with the mmap check, in-place patch and offline resolution"""
+
+    _mirrored = None
+
+    def is_binary_patched(self, executable_path=None):
+        return is_patched(executable_path or self.executable_path)
+
+    def patch_exe(self):
+        return patch_in_place(self.executable_path)
+
+    def parse_exe_version(self):
+        version = driver_mirror.driver_version(self.executable_path)
+        return LooseVersion(driver_mirror.format_version(version)) if version else None
+
+    def fetch_release_number(self):
+        drivers = driver_mirror.mirror_drivers()
+        if self.version_main:
+            candidates = [v for v in drivers if v[0] == int(self.version_main)]
+            match = max(candidates) if candidates else None
+        else:
+            browser = driver_mirror.browser_version() if os.path.exists(driver_mirror.CHROMIUM_BINARY) else None
+            match = driver_mirror.best_match(browser, drivers) if browser else None
+        if match is None:
+            if ALLOW_DOWNLOAD:
+                return super().fetch_release_number()
+            raise FileNotFoundError(f"No chromedriver for Chrome {self.version_main or 'as installed'} "
+                                    f"in {driver_mirror.DEFAULT_MIRROR} (UNDETECTED_DRIVER_DOWNLOAD=1 allows downloading)")
+        self._mirrored = drivers[match]
+        return LooseVersion(driver_mirror.format_version(match))
+
+    def fetch_package(self):
+        return self._mirrored if self._mirrored else super().fetch_package()
+
+    def unzip_package(self, fp):
+        if not isinstance(fp, tuple):
+            return super().unzip_package(fp)
+        # Straight out of the mirror, which is left as it is
+        path, member = fp
+        tmp = f"{self.executable_path}.tmp"
+        if member:
+            driver_mirror.stream_member(path, member, tmp)
+        else:
+            shutil.copyfile(path, tmp)
+        os.chmod(tmp, 0o755)
+        os.replace(tmp, self.executable_path)
+        return self.executable_path
+
+
+def install():
+    """Have undetected_chromedriver.Chrome check and patch drivers through this module"""
+    import undetected_chromedriver
+
+    undetected_chromedriver.Patcher = CachedPatcher
+
+
+def patched_driver(source=None, root=DEFAULT_ROOT):
+    """Cached patched driver for source (resolved offline by default), with undetected_chromedriver set up to trust it"""
+    install()
+    cache = DriverCache(root)
+    return cache.patched(source) if source else cache.resolve()["executable"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache of patched chromedriver binaries")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="Cache directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prepare_cmd = sub.add_parser("prepare", help="Patch a driver into the cache")
+    prepare_cmd.add_argument("source", nargs="?", default=None, help="Driver to patch (default: resolved offline)")
+    verify_cmd = sub.add_parser("verify", help="Check every cached driver against its metadata")
+    verify_cmd.add_argument("--full", action="store_true", help="Also compare the full sha256")
+    args = parser.parse_args(argv)
+
+    cache = DriverCache(args.root)
+    if args.command == "prepare":
+        path = cache.patched(args.source) if args.source else cache.resolve()["executable"]
+        meta = _read_meta(os.path.dirname(path))
+        print(f"✅ {path} ({len(meta['offsets'])} block(s) patched in {meta['seconds'] * 1000:.0f} ms)")
+        return
+
+    failed = 0
+    for path, meta in cache.entries():
+        ok = verify_entry(path, meta, full=args.full)
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} {path} from {meta['source']}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
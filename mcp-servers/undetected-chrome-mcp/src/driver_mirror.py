@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+"""
+Offline chromedriver resolution: installed versions and a local mirror.
+
+undetected_chromedriver asks the chrome-for-testing endpoints for a
+release number on every launch without an explicit driver, downloads the
+zip, extracts it and deletes it, and finds a driver's version by reading
+the binary line by line. None of that works on air-gapped hosts.
+
+Versions are read here without the network. A chromedriver binary is
+mapped and searched with a regex up to SCAN_LIMIT bytes. A browser (often a
+wrapper script) is asked for --version once. Either result is remembered in
+a manifest keyed by the file's device, inode, size and mtime, so later
+launches only stat the file.
+
+Drivers are resolved from the system chromedriver when its major version
+matches the browser's, otherwise from a mirror directory laid out like
+the chrome-for-testing bucket:
+
+    <mirror>/<version>/linux64/chromedriver-linux64.zip
+    <mirror>/<version>/linux64/chromedriver          (already extracted)
+
+An exact version is preferred, then the newest patch of the same build,
+then the newest of the same major. Zipped drivers are streamed straight
+out of the archive; the mirror itself is never modified.
+
+Usage:
+    python3 driver_mirror.py status
+    python3 driver_mirror.py add chromedriver-linux64.zip --version 120.0.6099.109
+"""
+
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+CACHE_ROOT = os.environ.get("UNDETECTED_DRIVER_CACHE", "/tmp/undetected_drivers")
+DEFAULT_MANIFEST = os.path.join(CACHE_ROOT, "versions.json")
+DEFAULT_MIRROR = os.environ.get("UNDETECTED_DRIVER_MIRROR", "/opt/chromedriver-mirror")
+CHROMIUM_BINARY = os.environ.get("UNDETECTED_CHROMIUM", "/usr/bin/chromium")
+SYSTEM_CHROMEDRIVER = os.environ.get("UNDETECTED_CHROMEDRIVER", "/usr/bin/chromedriver")
+PLATFORM = "linux64"
+SCAN_LIMIT = 256 << 20
+DRIVER_VERSION_PATTERN = re.compile(rb"platform_handle\x00content\x00([0-9]+(?:\.[0-9]+){1,3})")
+VERSION_PATTERN = re.compile(r"(\d+)\.(\d+)\.(\d+)\.(\d+)")
+
+
+def parse_version(text):
+    """(major, minor, build, patch) from text, or None"""
+    match = VERSION_PATTERN.search(text or "")
+    return tuple(int(part) for part in match.groups()) if match else None
+
+
+def format_version(version):
+    return ".".join(str(part) for part in version)
+
+
+class VersionManifest:
+    """Versions of binaries on disk, remembered per device, inode, size and mtime"""
+
+    def __init__(self, path=DEFAULT_MANIFEST):
+        self.path = path
+        self._entries = None
+
+    def _key(self, path):
+        stat = os.stat(path)
+        return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def version(self, path, reader):
+        """Version of the binary at path, calling reader(path) only when the file changed"""
+        path = os.path.realpath(path)
+        key = self._key(path)
+        entry = self._load().get(path)
+        if entry and entry["key"] == key:
+            return tuple(entry["version"]) if entry["version"] else None
+        version = reader(path)
+        self._save(path, {"key": key, "version": list(version) if version else None})
+        return version
+
+    def _save(self, path, entry):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, ".versions.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Merge with what other processes wrote since we loaded
+            self._entries = None
+            entries = self._load()
+            entries[path] = entry
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp, self.path)
+
+
+def _version_flag(path):
+    try:
+        result = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return parse_version(result.stdout)
+
+
+def scan_driver_version(path):
+    """chromedriver version from its embedded version string, without reading the file into memory"""
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            match = DRIVER_VERSION_PATTERN.search(mm, 0, min(len(mm), SCAN_LIMIT))
+            version = parse_version(match.group(1).decode()) if match else None
+    except (OSError, ValueError):
+        return None
+    return version or _version_flag(path)
+
+
+def driver_version(path, manifest=None):
+    return (manifest or VersionManifest()).version(path, scan_driver_version)
+
+
+def browser_version(path=CHROMIUM_BINARY, manifest=None):
+    return (manifest or VersionManifest()).version(path, _version_flag)
+
+
+def mirror_drivers(mirror=DEFAULT_MIRROR, platform=PLATFORM):
+    """{version: (path, zip member or None)} for every driver in the mirror"""
+    drivers = {}
+    try:
+        names = os.listdir(mirror)
+    except OSError:
+        return drivers
+    for name in names:
+        version = parse_version(name)
+        if version is None:
+            continue
+        member = f"chromedriver-{platform}/chromedriver"
+        for candidate, inner in (
+            (os.path.join(mirror, name, platform, f"chromedriver-{platform}.zip"), member),
+            (os.path.join(mirror, name, f"chromedriver-{platform}.zip"), member),
+            (os.path.join(mirror, name, platform, "chromedriver"), None),
+            (os.path.join(mirror, name, "chromedriver"), None),
+        ):
+            if os.path.isfile(candidate):
+                drivers[version] = (candidate, inner)
+                break
+    return drivers
+
+
+def best_match(version, available):
+    """The available version that best serves a browser version, or None"""
+    same_major = [v for v in available if v[0] == version[0]]
+    if not same_major:
+        return None
+    if version in same_major:
+        return version
+    same_build = [v for v in same_major if v[:3] == version[:3]]
+    return max(same_build or same_major)
+
+
+def resolve(browser=CHROMIUM_BINARY, mirror=DEFAULT_MIRROR, system=SYSTEM_CHROMEDRIVER, manifest=None):
+    """Where to get a driver for the browser, without the network
+
+    Returns {"browser": version, "driver": version, "path": path, "member":
+    zip member or None, "origin": "system" or "mirror"}. Raises
+    FileNotFoundError when nothing suitable is installed or mirrored.
+    """
+    manifest = manifest or VersionManifest()
+    wanted = browser_version(browser, manifest) if os.path.exists(browser) else None
+    system_version = driver_version(system, manifest) if os.path.exists(system) else None
+    result = {"browser": wanted, "member": None}
+
+    if system_version and (wanted is None or system_version[0] == wanted[0]):
+        return dict(result, driver=system_version, path=system, origin="system")
+    drivers = mirror_drivers(mirror)
+    match = best_match(wanted, drivers) if wanted else None
+    if match:
+        path, member = drivers[match]
+        return dict(result, driver=match, path=path, member=member, origin="mirror")
+    if system_version:
+        # A mismatched major may still start; better than failing outright offline
+        print(f"⚠️ chromedriver {format_version(system_version)} does not match browser "
+              f"{format_version(wanted)} and the mirror has none", file=sys.stderr)
+        return dict(result, driver=system_version, path=system, origin="system")
+    raise FileNotFoundError(
+        f"No chromedriver for browser {format_version(wanted) if wanted else 'unknown'}: "
+        f"none at {system} and none matching in {mirror}")
+
+
+def stream_member(archive, member, destination):
+    """Copy one member of a zip straight to destination, without extracting the rest"""
+    with zipfile.ZipFile(archive) as zf, zf.open(member) as src, open(destination, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    return destination
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline chromedriver resolution")
+    parser.add_argument("--mirror", default=DEFAULT_MIRROR, help="Local driver mirror directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Show installed versions, mirrored drivers and the resolved driver")
+    add_cmd = sub.add_parser("add", help="Copy a chrome-for-testing chromedriver zip into the mirror")
+    add_cmd.add_argument("archive")
+    add_cmd.add_argument("--version", required=True, help="Driver version, e.g. 120.0.6099.109")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        version = parse_version(args.version)
+        if version is None:
+            parser.error(f"not a full version: {args.version}")
+        with zipfile.ZipFile(args.archive) as zf:
+            if f"chromedriver-{PLATFORM}/chromedriver" not in zf.namelist():
+                parser.error(f"{args.archive} has no chromedriver-{PLATFORM}/chromedriver")
+        directory = os.path.join(args.mirror, format_version(version), PLATFORM)
+        os.makedirs(directory, exist_ok=True)
+        shutil.copyfile(args.archive, os.path.join(directory, f"chromedriver-{PLATFORM}.zip"))
+        print(f"✅ Added chromedriver {format_version(version)} to {args.mirror}")
+        return
+
+    manifest = VersionManifest()
+    for label, path, reader in (("Browser", CHROMIUM_BINARY, browser_version),
+                                ("System driver", SYSTEM_CHROMEDRIVER, driver_version)):
+        version = reader(path, manifest) if os.path.exists(path) else None
+        print(f"{label}: {path} {format_version(version) if version else '(not found)'}")
+    drivers = mirror_drivers(args.mirror)
+    print(f"Mirror: {args.mirror} ({len(drivers)} driver(s))")
+    for version in sorted(drivers):
+        print(f"    {format_version(version)}  {drivers[version][0]}")
+    try:
+        resolved = resolve(mirror=args.mirror, manifest=manifest)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Using {resolved['origin']} chromedriver {format_version(resolved['driver'])} from {resolved['path']}")
+
+
+if __name__ == "__main__":
+    main()
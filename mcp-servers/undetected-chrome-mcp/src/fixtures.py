@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+"""
+Local fixture site for load tests and benchmarks.
+
+Serves synthetic car listing pages shaped like the real search results
+pages: a React-style root filled in by client-side script from embedded
+JSON (or rendered on the server with render=server), vehicle cards linking
+to /vehicle/<id>, and detail pages for those links. Page size and response
+latency are set per request, so no test ever needs the network:
+
+    /cars?cards=500&latency=200&seed=3&render=client
+    /vehicle/1000042
+
+Any other path serves the default listing, so recorded sessions from live
+sites can be replayed against it with only the host rewritten.
+
+Usage:
+    python3 fixtures.py --port 8765 --cards 100 --latency 50
+"""
+
+import argparse
+import html
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+MAKES = {
+    "Toyota": ["Camry", "Corolla", "RAV4", "Tacoma", "Highlander"],
+    "Honda": ["Civic", "Accord", "CR-V", "Pilot", "Odyssey"],
+    "Ford": ["F-150", "Escape", "Explorer", "Mustang", "Bronco"],
+    "Chevrolet": ["Silverado", "Equinox", "Malibu", "Tahoe", "Traverse"],
+    "Tesla": ["Model 3", "Model Y", "Model S", "Model X"],
+    "Hyundai": ["Elantra", "Tucson", "Santa Fe", "Sonata"],
+}
+MAX_CARDS = 10000
+
+CLIENT_RENDER_SCRIPT = """
+const data = JSON.parse(document.getElementById('__DATA__').textContent);
+const root = document.getElementById('root');
+const grid = document.createElement('div');
+grid.className = 'result-grid';
+for (const v of data.vehicles) {
+    const card = document.createElement('div');
+    card.className = 'result-tile';
+    card.setAttribute('data-qa', 'vehicle-card');
+    card.innerHTML = `<a href="/vehicle/${v.id}" data-qa="vehicle-link">
+        <img src="data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7" alt="${v.year} ${v.make} ${v.model}" width="320" height="240">
+        <h3 data-qa="make-model">${v.year} ${v.make} ${v.model}</h3>
+        <div data-qa="trim">${v.trim}</div>
+        <span data-qa="price">$${v.price.toLocaleString('en-US')}</span>
+        <span data-qa="mileage">${v.mileage.toLocaleString('en-US')} miles</span></a>`;
+    grid.appendChild(card);
+}
+root.appendChild(grid);
+document.title = `${data.vehicles.length} Used Cars for Sale`;
+"""
+
+
+def vehicle(vehicle_id):
+    """Deterministic vehicle record for an id"""
+    rng = random.Random(vehicle_id)
+    make = rng.choice(sorted(MAKES))
+    return {
+        "id": vehicle_id,
+        "year": rng.randint(2012, 2024),
+        "make": make,
+        "model": rng.choice(MAKES[make]),
+        "trim": rng.choice(["LE", "SE", "XLE", "Sport", "Limited", "Touring", "Base"]),
+        "price": rng.randrange(12000, 65000, 100),
+        "mileage": rng.randrange(3000, 120000, 7),
+    }
+
+
+def listing(cards, seed=0):
+    first = 1000000 + seed * MAX_CARDS
+    return [vehicle(first + i) for i in range(cards)]
+
+
+def _card_html(v):
+    name = f"{v['year']} {v['make']} {v['model']}"
+    return (
+        f'<div class="result-tile" data-qa="vehicle-card"><a href="/vehicle/{v["id"]}" data-qa="vehicle-link">'
+        f'<img src="data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7" alt="{html.escape(name)}" width="320" height="240">'
+        f'<h3 data-qa="make-model">{html.escape(name)}</h3><div data-qa="trim">{v["trim"]}</div>'
+        f'<span data-qa="price">${v["price"]:,}</span><span data-qa="mileage">{v["mileage"]:,} miles</span></a></div>'
+    )
+
+
+def render_listing(cards, seed=0, render="client"):
+    vehicles = listing(cards, seed)
+    head = '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Used Cars for Sale</title>' \
+           '<style>.result-grid{display:grid;grid-template-columns:repeat(4,1fr);gap:16px}' \
+           '.result-tile{border:1px solid #ddd;padding:8px;min-height:360px}</style></head><body>' \
+           '<header><nav><a href="/cars">Shop cars</a></nav></header>'
+    if render == "server":
+        body = f'<main id="root"><div class="result-grid">{"".join(_card_html(v) for v in vehicles)}</div></main>'
+        return f"{head}{body}</body></html>"
+    data = json.dumps({"vehicles": vehicles}).replace("</", "<\\/")
+    return (
+        f'{head}<main id="root"></main><noscript>You need to enable JavaScript to run this app.</noscript>'
+        f'<script id="__DATA__" type="application/json">{data}</script><script>{CLIENT_RENDER_SCRIPT}</script></body></html>'
+    )
+
+
+def render_vehicle(vehicle_id):
+    v = vehicle(vehicle_id)
+    name = html.escape(f"{v['year']} {v['make']} {v['model']} {v['trim']}")
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{name}</title></head><body>'
+        f'<main id="root"><h1 data-qa="vehicle-title">{name}</h1>'
+        f'<div data-qa="vehicle-price">${v["price"]:,}</div><div data-qa="vehicle-mileage">{v["mileage"]:,} miles</div>'
+        f'<ul data-qa="features">{"".join(f"<li>Feature {i}</li>" for i in range(12))}</ul>'
+        f'<a href="/cars">Back to results</a></main></body></html>'
+    )
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        latency = float(query.get("latency", self.server.latency))
+        if latency:
+            time.sleep(latency / 1000)
+        status = 200
+        if parts.path == "/favicon.ico":
+            status, body, content_type = 404, b"", "image/x-icon"
+        elif parts.path.startswith("/vehicle/") and parts.path.rsplit("/", 1)[-1].isdigit():
+            body, content_type = render_vehicle(int(parts.path.rsplit("/", 1)[-1])).encode(), "text/html; charset=utf-8"
+        elif parts.path == "/api/vehicles":
+            cards = min(MAX_CARDS, int(query.get("cards", self.server.cards)))
+            body = json.dumps({"vehicles": listing(cards, int(query.get("seed", 0)))}).encode()
+            content_type = "application/json"
+        else:
+            cards = min(MAX_CARDS, int(query.get("cards", self.server.cards)))
+            body = render_listing(cards, int(query.get("seed", 0)), query.get("render", "client")).encode()
+            content_type = "text/html; charset=utf-8"
+        self.server.requests += 1
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Fixture site on a background thread; port 0 picks a free port"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, cards=48, latency=0):
+        super().__init__((host, port), FixtureHandler)
+        self.cards = cards
+        self.latency = latency
+        self.requests = 0
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="fixture-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local fixture site with synthetic car listings")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cards", type=int, default=48, help="Default cards per listing page")
+    parser.add_argument("--latency", type=float, default=0, help="Default response delay in ms")
+    args = parser.parse_args(argv)
+
+    server = FixtureServer(args.host, args.port, args.cards, args.latency)
+    print(f"Fixture site on {server.url}/cars", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+
+"""
+Fleet mode: one MCP router in front of many browser worker processes.
+
+Workers (server.py --worker HOST:PORT) hold up to --slots browser sessions
+and speak newline-delimited JSON-RPC over TCP. The router (server.py
+--router) speaks MCP on stdio, pins each session to one worker, places new
+sessions on the worker with the most free slots and least memory, and
+heartbeats workers so dead ones are taken out of rotation; a call that
+merely times out is reported as failed and leaves liveness to the
+heartbeat. An AIMD controller adapts how many tool calls are forwarded
+concurrently.
+
+Artifacts (screenshots, captures) stay in the store of the worker that made
+them, often on another host. The router answers resources/list by merging
+the workers' lists. It sends resources/read to the worker an artifact URI
+came from, learned from tool results and lists, or else asks each live
+worker in turn.
+
+The MCP side (tools, call_tool and the JSON-RPC helpers) comes from the
+server module that started the fleet, passed in as api, so server.py run
+as a script is not imported a second time under its module name.
+
+Everything runs fine on localhost:
+    server.py --router --spawn-workers 3 --slots 2
+    python3 fleet_check.py
+"""
+
+import json
+import os
+import re
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from artifact_store import parse_uri
+from concurrency import AIMDController
+from progress import Progress
+import traffic
+
+DEFAULT_SESSION = "default"
+ARTIFACT_URI = re.compile(r"artifact://([0-9a-f]{64})")
+
+
+def process_tree_rss(pid=None):
+    """Resident memory of a process and all of its descendants, in bytes"""
+    pid = pid or os.getpid()
+    children = {}
+    rss = {}
+    page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+    try:
+        entries = [e for e in os.listdir("/proc") if e.isdigit()]
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            fields = stat[stat.rindex(")") + 2:].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+            rss[int(entry)] = int(fields[21]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """TCP server holding a bounded set of browser sessions"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, api, slots=4, idle_timeout=600):
+        super().__init__(parse_address(address), WorkerHandler)
+        self.api = api
+        self.slots = slots
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.lock = threading.Lock()
+        threading.Thread(target=self._reap_idle, name="session-reaper", daemon=True).start()
+
+    def status(self):
+        with self.lock:
+            sessions = len(self.sessions)
+        return {
+            "pid": os.getpid(),
+            "slots": self.slots,
+            "free_slots": self.slots - sessions,
+            "sessions": sessions,
+            "rss": process_tree_rss(),
+        }
+
+    def acquire(self, session_id):
+        """Existing session, a new one if a slot is free, or None"""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                if len(self.sessions) >= self.slots:
+                    return None
+                session = {"mcp": self.api.UndetectedChromeMCP(), "lock": threading.Lock(), "last_used": time.time()}
+                self.sessions[session_id] = session
+            session["last_used"] = time.time()
+            return session
+
+    def release(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session:
+            with session["lock"]:
+                session["mcp"].close_browser()
+        return session is not None
+
+    def _reap_idle(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 30))
+            cutoff = time.time() - self.idle_timeout
+            with self.lock:
+                idle = [sid for sid, s in self.sessions.items() if s["last_used"] < cutoff and not s["lock"].locked()]
+            for session_id in idle:
+                self.release(session_id)
+
+    def handle_request(self, request, notify=None):
+        method = request.get("method")
+        params = request.get("params", {})
+        request_id = request.get("id")
+
+        if method == "fleet/status":
+            return {"jsonrpc": "2.0", "id": request_id, "result": self.status()}
+
+        if method == "fleet/release":
+            released = self.release(params.get("session", DEFAULT_SESSION))
+            return {"jsonrpc": "2.0", "id": request_id, "result": {"released": released}}
+
+        if method == "tools/call":
+            session_id = params.get("session", DEFAULT_SESSION)
+            session = self.acquire(session_id)
+            if session is None:
+                return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32000, "message": "No free browser slots"}}
+            with session["lock"]:
+                progress = Progress.for_request(params, notify)
+                result = self.api.call_tool(session["mcp"], params.get("name"), params.get("arguments", {}), progress)
+                session["last_used"] = time.time()
+            if params.get("name") == "undetected_close":
+                self.release(session_id)
+            return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+        return self.api.handle_request(None, request)
+
+    def shutdown_sessions(self):
+        for session_id in list(self.sessions):
+            self.release(session_id)
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    """One router connection; requests on it are answered in order"""
+
+    def handle(self):
+        # Progress notifications may come from pool threads while a call runs
+        write_lock = threading.Lock()
+
+        def send(message):
+            with write_lock:
+                self.wfile.write((json.dumps(message) + "\n").encode())
+                self.wfile.flush()
+
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            request = None
+            try:
+                request = json.loads(line)
+                response = self.server.handle_request(request, notify=send)
+            except json.JSONDecodeError:
+                continue
+            except Exception as e:
+                response = self.server.api.error_response(request, e)
+            if response is not None:
+                send(response)
+
+
+class WorkerClient:
+    """Router-side handle on one worker, with a small connection pool"""
+
+    def __init__(self, address, timeout=300):
+        self.address = address
+        self.timeout = timeout
+        self.alive = True
+        self.misses = 0
+        self.status = {}
+        self._idle = []
+        self._lock = threading.Lock()
+        self._ids = 0
+
+    def _connect(self, timeout):
+        sock = socket.create_connection(parse_address(self.address), timeout=timeout)
+        return sock, sock.makefile("rb")
+
+    def call(self, method, params=None, timeout=None, on_notification=None):
+        """Send one request and return the raw JSON-RPC response; raises OSError on failure
+
+        Notifications the worker sends before the response go to on_notification.
+        """
+        timeout = timeout or self.timeout
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self._ids += 1
+            request_id = self._ids
+        if conn is None:
+            conn = self._connect(timeout)
+        sock, reader = conn
+        try:
+            sock.settimeout(timeout)
+            sock.sendall((json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}}) + "\n").encode())
+            while True:
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError(f"Worker {self.address} closed the connection")
+                response = json.loads(line)
+                if "id" in response:
+                    break
+                if on_notification:
+                    on_notification(response)
+        except Exception:
+            sock.close()
+            raise
+        with self._lock:
+            self._idle.append(conn)
+        return response
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock, _ in idle:
+            sock.close()
+
+
+class Router:
+    """MCP front end that places sessions on workers and forwards tool calls"""
+
+    def __init__(self, addresses, api, heartbeat=2.0, max_misses=3, concurrency=16, call_timeout=300):
+        self.api = api
+        self.workers = [WorkerClient(address, call_timeout) for address in addresses]
+        self.heartbeat = heartbeat
+        self.max_misses = max_misses
+        self.concurrency = concurrency
+        self.affinity = {}
+        # sha256 -> worker whose store holds the artifact
+        self.artifacts = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.check_workers()
+        # Start at the fleet's slot count; AIMD moves it within 1..concurrency
+        slots = sum(w.status.get("slots", 0) for w in self.workers if w.alive)
+        self.controller = AIMDController(maximum=concurrency, initial=max(1, min(concurrency, slots)))
+        threading.Thread(target=self._heartbeat_loop, name="fleet-heartbeat", daemon=True).start()
+
+    def check_workers(self):
+        for worker in self.workers:
+            try:
+                worker.status = worker.call("fleet/status", timeout=max(self.heartbeat, 1)).get("result", {})
+                worker.misses = 0
+                worker.alive = True
+            except (OSError, ValueError):
+                worker.misses += 1
+                if worker.misses >= self.max_misses or not worker.status:
+                    self._mark_dead(worker)
+
+    def _heartbeat_loop(self):
+        while not self.stopped.wait(self.heartbeat):
+            self.check_workers()
+
+    def _mark_dead(self, worker):
+        worker.alive = False
+        worker.close()
+        with self.lock:
+            for session_id in [s for s, w in self.affinity.items() if w is worker]:
+                del self.affinity[session_id]
+
+    def place(self, session_id, exclude=()):
+        """Worker for a session: its pinned worker, else the least loaded live one"""
+        with self.lock:
+            worker = self.affinity.get(session_id)
+            if worker is not None and worker.alive:
+                return worker, False
+            candidates = [w for w in self.workers if w.alive and w not in exclude and w.status.get("free_slots", 0) > 0]
+            if not candidates:
+                return None, True
+            worker = max(candidates, key=lambda w: (w.status.get("free_slots", 0), -w.status.get("rss", 0)))
+            # Assume the slot is taken until the next heartbeat says otherwise
+            worker.status["free_slots"] = worker.status.get("free_slots", 0) - 1
+            self.affinity[session_id] = worker
+            return worker, True
+
+    def route(self, tool_name, args, meta=None):
+        """Forward a tool call to the session's worker and return the MCP result
+
+        Progress notifications for a call with meta.progressToken are relayed to stdout.
+        """
+        args = dict(args)
+        session_id = str(args.pop("session", DEFAULT_SESSION))
+        tried = []
+        while True:
+            worker, placed = self.place(session_id, exclude=tried)
+            if worker is None:
+                return {"content": [{"type": "text", "text": "❌ No fleet worker has a free browser slot"}]}
+            try:
+                params = {"name": tool_name, "arguments": args, "session": session_id}
+                if meta:
+                    params["_meta"] = meta
+                response = worker.call("tools/call", params, on_notification=self.api.send_response)
+            except socket.timeout:
+                # Slow, not necessarily dead; the heartbeat decides that
+                return {"content": [{"type": "text", "text": f"❌ Worker {worker.address} did not answer within {worker.timeout}s; session '{session_id}' stays on it"}]}
+            except (OSError, ValueError) as e:
+                self._mark_dead(worker)
+                if placed:
+                    # Brand-new session: nothing was lost, try the next worker
+                    tried.append(worker)
+                    continue
+                return {"content": [{"type": "text", "text": f"❌ Worker {worker.address} failed ({e}); session '{session_id}' was lost and will be re-placed on the next call"}]}
+
+            if "error" in response:
+                with self.lock:
+                    if placed and self.affinity.get(session_id) is worker:
+                        del self.affinity[session_id]
+                if placed and response["error"].get("code") == -32000:
+                    worker.status["free_slots"] = 0
+                    tried.append(worker)
+                    continue
+                return {"content": [{"type": "text", "text": f"❌ Worker error: {response['error'].get('message')}"}]}
+
+            if tool_name == "undetected_close":
+                with self.lock:
+                    self.affinity.pop(session_id, None)
+            result = response.get("result")
+            if not isinstance(result, dict) or not result.get("content"):
+                return {"content": [{"type": "text", "text": f"❌ Worker {worker.address} returned no tool result"}]}
+            self._remember_artifacts(worker, result)
+            return result
+
+    def _remember_artifacts(self, worker, payload):
+        with self.lock:
+            for sha256 in ARTIFACT_URI.findall(json.dumps(payload)):
+                self.artifacts[sha256] = worker
+
+    def list_resources(self, cursor=None):
+        """resources/list over every live worker's store, paged like a single server's"""
+        merged, seen = [], set()
+        for worker in [w for w in self.workers if w.alive]:
+            worker_cursor = None
+            while True:
+                try:
+                    response = worker.call("resources/list", {"cursor": worker_cursor} if worker_cursor else {})
+                except (OSError, ValueError):
+                    # An unreachable worker's artifacts are left out; the heartbeat deals with the worker
+                    break
+                result = response.get("result") or {}
+                for resource in result.get("resources", []):
+                    self._remember_artifacts(worker, resource["uri"])
+                    # Workers on one host share a store and list the same objects
+                    if resource["uri"] not in seen:
+                        seen.add(resource["uri"])
+                        merged.append(resource)
+                worker_cursor = result.get("nextCursor")
+                if not worker_cursor:
+                    break
+        start = int(cursor or 0)
+        result = {"resources": merged[start:start + self.api.RESOURCE_PAGE_SIZE]}
+        if start + self.api.RESOURCE_PAGE_SIZE < len(merged):
+            result["nextCursor"] = str(start + self.api.RESOURCE_PAGE_SIZE)
+        return result
+
+    def read_resource(self, request):
+        """Forward resources/read to the worker holding the artifact; returns the JSON-RPC response"""
+        params = request.get("params", {})
+        uri = params.get("uri", "")
+        owner = self.artifacts.get(parse_uri(uri))
+        candidates = [w for w in self.workers if w.alive]
+        if owner in candidates:
+            candidates.remove(owner)
+            candidates.insert(0, owner)
+        for worker in candidates:
+            try:
+                response = worker.call("resources/read", params)
+            except (OSError, ValueError):
+                continue
+            if "result" in response:
+                self._remember_artifacts(worker, uri)
+                return {"jsonrpc": "2.0", "id": request.get("id"), "result": response["result"]}
+            if response.get("error", {}).get("code") != -32002:
+                return {"jsonrpc": "2.0", "id": request.get("id"), "error": response["error"]}
+        return {"jsonrpc": "2.0", "id": request.get("id"),
+                "error": {"code": -32002, "message": "Resource not found", "data": {"uri": uri}}}
+
+    def status(self):
+        lines = [f"🛰️ Fleet: {sum(w.alive for w in self.workers)}/{len(self.workers)} workers alive, {len(self.affinity)} sessions"]
+        lines.extend(self.controller.format())
+        for worker in self.workers:
+            status = worker.status
+            pinned = sum(1 for w in self.affinity.values() if w is worker)
+            state = "✅" if worker.alive else "❌"
+            lines.append(
+                f"   {state} {worker.address}: {status.get('free_slots', '?')}/{status.get('slots', '?')} free, "
+                f"RSS {status.get('rss', 0) / 1048576:.0f} MB, {pinned} pinned sessions"
+            )
+        return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+
+    def tools(self):
+        """Worker tools with a session argument added, plus the fleet status tool"""
+        tools = []
+        for tool in self.api.TOOLS:
+            tool = json.loads(json.dumps(tool))
+            tool["inputSchema"].setdefault("properties", {})["session"] = {
+                "type": "string",
+                "description": "Session id; calls with the same id stay on the same browser",
+            }
+            tools.append(tool)
+        tools.append({
+            "name": "undetected_fleet_status",
+            "description": "Show fleet workers, free slots, memory and session placement",
+            "inputSchema": {"type": "object", "properties": {}},
+        })
+        return tools
+
+    def handle_request(self, request):
+        params = request.get("params", {})
+        if request.get("method") == "tools/call":
+            name = params.get("name")
+            if name == "undetected_fleet_status":
+                result = self.status()
+            else:
+                with self.controller.slot() as slot:
+                    result = self.route(name, params.get("arguments", {}), params.get("_meta"))
+                    first = result["content"][0]
+                    slot["ok"] = not (isinstance(first, dict) and first.get("text", "").startswith("❌"))
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+        if request.get("method") == "resources/list":
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": self.list_resources(params.get("cursor"))}
+        if request.get("method") == "resources/read":
+            return self.read_resource(request)
+        return self.api.handle_request(None, request, tools=self.tools())
+
+    def serve_stdio(self):
+        """MCP over stdio; tool calls run concurrently so sessions don't block each other"""
+        pool = ThreadPoolExecutor(max_workers=self.concurrency)
+
+        def run(request):
+            try:
+                response = self.handle_request(request)
+            except Exception as e:
+                response = self.api.error_response(request, e)
+            if response is not None:
+                self.api.send_response(response)
+
+        try:
+            for line in sys.stdin:
+                line = line.strip()
+                if not line:
+                    continue
+                if traffic.recorder:
+                    traffic.recorder.record("in", line)
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                # Anything forwarded to workers runs off the stdin loop
+                if request.get("method") in ("tools/call", "resources/list", "resources/read"):
+                    pool.submit(run, request)
+                else:
+                    run(request)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.shutdown(wait=True)
+            self.stopped.set()
+            self.controller.stop()
+            for worker in self.workers:
+                worker.close()
+
+
+def spawn_local_workers(count, slots):
+    """Start workers on free localhost ports; returns (addresses, processes)"""
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    addresses, processes = [], []
+    for _ in range(count):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        address = f"127.0.0.1:{port}"
+        processes.append(subprocess.Popen(
+            [sys.executable, server_path, "--worker", address, "--slots", str(slots)],
+            stdin=subprocess.DEVNULL,
+        ))
+        addresses.append(address)
+    for address in addresses:
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            try:
+                socket.create_connection(parse_address(address), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+    return addresses, processes
+
+
+def main(args, api):
+    """Run a worker or a router from parsed server.py arguments; api is the server module"""
+    if args.worker:
+        worker = WorkerServer(args.worker, api, slots=args.slots)
+        print(f"Fleet worker listening on {args.worker} with {args.slots} slots", file=sys.stderr, flush=True)
+        try:
+            worker.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.shutdown_sessions()
+        return
+
+    addresses = [a.strip() for a in args.workers.split(",") if a.strip()]
+    processes = []
+    if args.spawn_workers:
+        spawned, processes = spawn_local_workers(args.spawn_workers, args.slots)
+        addresses.extend(spawned)
+    if not addresses:
+        print("Router needs --workers or --spawn-workers", file=sys.stderr)
+        sys.exit(1)
+    try:
+        Router(addresses, api).serve_stdio()
+    finally:
+        for process in processes:
+            process.terminate()
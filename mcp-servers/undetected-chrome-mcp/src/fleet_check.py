@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+"""
+Exercise the fleet router against local workers, without a browser.
+
+Starts two workers on localhost and drives a Router in this process with
+undetected_status and undetected_close calls, which never launch Chromium.
+The workers get their own artifact directory, standing in for another
+host's store. It checks that an artifact stored there is listed and read
+through the router, that sessions are spread over workers and stay on
+theirs, that a full fleet says so, that a worker too slow to answer one call (stopped with
+SIGSTOP) fails that call but stays in rotation, and that a killed worker is
+taken out by the heartbeat and its session re-placed on a live one.
+
+Usage:
+    python3 fleet_check.py
+    python3 fleet_check.py --slots 2 --timeout 1 --heartbeat 0.5
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+import server
+from artifact_store import ArtifactStore
+from fleet import Router, spawn_local_workers
+
+
+def text(result):
+    return result["content"][0].get("text", "")
+
+
+def first_line(result):
+    return text(result).replace("\\n", "\n").splitlines()[0]
+
+
+def is_stopped(pid):
+    """Whether the process has actually entered the stopped state"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return False
+    return stat[stat.rindex(")") + 2:].split()[0] in ("T", "t")
+
+
+def wait_until(condition, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return condition()
+
+
+def run_checks(router, processes, slots, timeout, worker_artifacts):
+    """Yield (name, ok, detail) for each check, in order"""
+    process_of = dict(zip((w.address for w in router.workers), processes))
+    settle = router.heartbeat * 2 + 1
+
+    data = b'{"fleet_check": true}'
+    uri = ArtifactStore(worker_artifacts).put("fleet-check", data, extension="json", kind="check")["uri"]
+    listed = [r["uri"] for r in router.list_resources()["resources"]]
+    yield "worker artifacts listed once", listed.count(uri) == 1, f"{uri} among {len(listed)}"
+    response = router.handle_request({"jsonrpc": "2.0", "id": 1, "method": "resources/read", "params": {"uri": uri}})
+    contents = response.get("result", {}).get("contents", [{}])
+    yield "worker artifact read through the router", contents[0].get("text") == data.decode(), str(response)[:120]
+
+    for session in ("a", "b"):
+        result = router.route("undetected_status", {"session": session})
+        yield f"session {session} placed", not text(result).startswith("❌"), first_line(result)
+    first, second = router.affinity["a"], router.affinity["b"]
+    yield "sessions spread over workers", first is not second, f"a on {first.address}, b on {second.address}"
+    router.route("undetected_status", {"session": "a"})
+    yield "session stays on its worker", router.affinity.get("a") is first, f"a on {router.affinity['a'].address}"
+
+    fillers = [f"fill{i}" for i in range(2 * (slots - 1))]
+    for session in fillers:
+        router.route("undetected_status", {"session": session})
+    result = router.route("undetected_status", {"session": "overflow"})
+    yield "full fleet is reported", "free browser slot" in text(result), text(result)
+    for session in fillers:
+        router.route("undetected_close", {"session": session})
+    # Freed slots show up at the next heartbeat
+    wait_until(lambda: all(w.status.get("free_slots", 0) >= slots - 1 for w in router.workers), settle)
+
+    stopped = process_of[first.address]
+    stopped.send_signal(signal.SIGSTOP)
+    try:
+        # SIGSTOP lands asynchronously; a call sent before it does would still be answered
+        wait_until(lambda: is_stopped(stopped.pid), 5)
+        result = router.route("undetected_status", {"session": "a"})
+    finally:
+        stopped.send_signal(signal.SIGCONT)
+    yield "slow call fails on its own", "did not answer" in text(result), text(result)
+    yield "slow worker stays in rotation", first.alive and router.affinity.get("a") is first, f"alive={first.alive}"
+    result = router.route("undetected_status", {"session": "a"})
+    yield "slow worker answers again", not text(result).startswith("❌"), first_line(result)
+
+    process_of[second.address].kill()
+    dead = wait_until(lambda: not second.alive, settle + router.heartbeat * router.max_misses + timeout * router.max_misses)
+    yield "killed worker taken out by heartbeat", dead, f"alive={second.alive}"
+    result = router.route("undetected_status", {"session": "b"})
+    moved = router.affinity.get("b")
+    yield ("lost session re-placed on a live worker", not text(result).startswith("❌") and moved is first,
+           f"b on {moved.address if moved else None}: {first_line(result)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exercise the fleet router against local workers")
+    parser.add_argument("--slots", type=int, default=2, help="Browser slots per worker (at least 1)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Per-call timeout in seconds")
+    parser.add_argument("--heartbeat", type=float, default=0.5, help="Heartbeat interval in seconds")
+    args = parser.parse_args(argv)
+    if args.slots < 1:
+        parser.error("--slots must be at least 1")
+
+    # The workers' store is not the router's, as on another host
+    worker_artifacts = tempfile.mkdtemp(prefix="fleet-check-")
+    previous = os.environ.get("UNDETECTED_ARTIFACT_DIR")
+    os.environ["UNDETECTED_ARTIFACT_DIR"] = worker_artifacts
+    try:
+        addresses, processes = spawn_local_workers(2, args.slots)
+    finally:
+        if previous is None:
+            del os.environ["UNDETECTED_ARTIFACT_DIR"]
+        else:
+            os.environ["UNDETECTED_ARTIFACT_DIR"] = previous
+    router = None
+    failed = 0
+    try:
+        router = Router(addresses, server, heartbeat=args.heartbeat, call_timeout=args.timeout)
+        for name, ok, detail in run_checks(router, processes, args.slots, args.timeout, worker_artifacts):
+            failed += not ok
+            print(f"{'✅' if ok else '❌'} {name}: {detail}")
+    finally:
+        if router is not None:
+            router.stopped.set()
+            router.controller.stop()
+            for worker in router.workers:
+                worker.close()
+        for process in processes:
+            process.kill()
+            process.wait()
+        shutil.rmtree(worker_artifacts, ignore_errors=True)
+    if failed:
+        print(f"❌ {failed} check(s) failed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
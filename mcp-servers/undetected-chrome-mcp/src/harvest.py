@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+"""
+Incremental infinite-scroll harvesting.
+
+A MutationObserver marks item elements that were added or changed, so each
+scroll step only extracts the dirty items, and a key (by default the id in
+a /vehicle/<id> href) drops ones already harvested. Recycled nodes in
+virtualized lists show up as changed items with a new key, so those lists
+are harvested too.
+
+Each step is one async script that scrolls and then waits. The last item
+rendered is the sentinel: an IntersectionObserver reports whether it is
+within a viewport of the visible area. If it is not, the scroll only
+uncovered items that were already in the DOM and the step returns at once.
+If it is, the page is expected to load more, and the step waits until the
+DOM has been quiet for a moment. The sentinel alone cannot be the signal
+to stop waiting, since it stays in view while the next batch is fetched.
+That is what the mutation quiet time is for. In a hidden tab, where
+intersection reports may never come, the step also falls back to that wait.
+
+Harvesting stops when the scroller is at the end and neither the number
+of items nor the scroll height has changed for idle_steps steps, or when a
+budget runs out.
+"""
+
+import time
+
+HARVEST_SCRIPT = r"""
+const opts = arguments[0];
+const done = arguments[arguments.length - 1];
+let state = window.__ucHarvest;
+if (!state || opts.reset) {
+    if (state) state.observer.disconnect();
+    if (state) state.sentinelObserver.disconnect();
+    state = window.__ucHarvest = {seen: new Set(), dirty: new Set(), all: true, lastMutation: 0, observer: null,
+                                  sentinelObserver: null, sentinelNear: false, sentinelReported: 0};
+    state.observer = new MutationObserver(records => {
+        state.lastMutation = performance.now();
+        for (const record of records) {
+            const target = record.target.nodeType === 1 ? record.target : record.target.parentElement;
+            if (!target) continue;
+            const owner = target.closest(opts.item);
+            if (owner) state.dirty.add(owner);
+            for (const node of record.addedNodes) {
+                if (node.nodeType !== 1) continue;
+                if (node.matches(opts.item)) state.dirty.add(node);
+                node.querySelectorAll(opts.item).forEach(el => state.dirty.add(el));
+            }
+        }
+    });
+    state.observer.observe(document.body, {childList: true, subtree: true, characterData: true, attributes: true,
+                                           attributeFilter: opts.keyAttribute ? [opts.keyAttribute] : undefined});
+    const root = opts.container ? document.querySelector(opts.container) : null;
+    state.sentinelObserver = new IntersectionObserver(entries => {
+        state.sentinelNear = entries[entries.length - 1].isIntersecting;
+        state.sentinelReported = performance.now();
+    }, {root: root, rootMargin: '0px 0px 100% 0px'});
+}
+
+const container = opts.container ? document.querySelector(opts.container) : null;
+const scroller = container || document.scrollingElement || document.documentElement;
+const pattern = opts.keyPattern ? new RegExp(opts.keyPattern) : null;
+const keyOf = el => {
+    const holder = opts.keySelector ? (el.matches(opts.keySelector) ? el : el.querySelector(opts.keySelector)) : el;
+    if (!holder) return null;
+    const raw = opts.keyAttribute ? holder.getAttribute(opts.keyAttribute) : holder.textContent.trim();
+    if (!raw) return null;
+    if (!pattern) return raw;
+    const match = raw.match(pattern);
+    return match ? (match[1] || match[0]) : null;
+};
+const read = (el, spec) => {
+    if (typeof spec === 'string') spec = {selector: spec};
+    const target = spec.selector ? el.querySelector(spec.selector) : el;
+    if (!target) return null;
+    if (spec.attribute) return target.getAttribute(spec.attribute);
+    return target.textContent.replace(/\s+/g, ' ').trim();
+};
+const collect = () => {
+    const candidates = state.all ? document.querySelectorAll(opts.item) : Array.from(state.dirty);
+    state.all = false;
+    state.dirty = new Set();
+    const fresh = [];
+    for (const el of candidates) {
+        if (!el.isConnected) continue;
+        const key = keyOf(el);
+        if (key === null || state.seen.has(key)) continue;
+        state.seen.add(key);
+        const record = {key: key};
+        for (const [name, spec] of Object.entries(opts.fields || {})) record[name] = read(el, spec);
+        if (!opts.fields || !Object.keys(opts.fields).length) record.text = el.textContent.replace(/\s+/g, ' ').trim().slice(0, 300);
+        fresh.push(record);
+        if (opts.remaining && fresh.length >= opts.remaining) break;
+    }
+    return fresh;
+};
+const metrics = () => ({
+    height: scroller.scrollHeight,
+    atEnd: scroller.scrollTop + scroller.clientHeight >= scroller.scrollHeight - 2,
+    seen: state.seen.size,
+    inDom: document.querySelectorAll(opts.item).length
+});
+
+if (opts.scroll === false) { done(Object.assign({items: collect()}, metrics())); return; }
+
+const before = performance.now();
+const step = opts.step || Math.round(scroller.clientHeight * 0.9) || 800;
+if (container) container.scrollBy(0, step); else window.scrollBy(0, step);
+// Re-observing makes the observer report the sentinel's position after this scroll
+const rendered = document.querySelectorAll(opts.item);
+state.sentinelObserver.disconnect();
+if (rendered.length) state.sentinelObserver.observe(rendered[rendered.length - 1]);
+// Return as soon as the sentinel is reported out of reach with nothing changing;
+// otherwise wait for the lazy load until mutations have been quiet for `quiet` ms, at most `maxWait`
+const poll = () => {
+    const now = performance.now();
+    const quietFor = now - Math.max(state.lastMutation, before);
+    const nothingToLoad = state.sentinelReported > before && !state.sentinelNear
+        && state.lastMutation <= before && !metrics().atEnd;
+    if (nothingToLoad || (state.lastMutation > before && quietFor >= opts.quiet) || now - before >= opts.maxWait) {
+        done(Object.assign({items: collect(), waited: Math.round(now - before)}, metrics()));
+    } else {
+        setTimeout(poll, 50);
+    }
+};
+setTimeout(poll, 50);
+"""
+
+STOP_SCRIPT = r"""
+if (window.__ucHarvest) {
+    window.__ucHarvest.observer.disconnect();
+    window.__ucHarvest.sentinelObserver.disconnect();
+    delete window.__ucHarvest;
+}
+"""
+
+
+def harvest(driver, item, fields=None, key_selector='a[href*="/vehicle/"]', key_attribute="href", key_pattern=r"/vehicle/(\d+)",
+            container=None, step=None, quiet=400, max_wait=3000, max_items=1000, max_steps=100, max_seconds=120,
+            idle_steps=3, on_batch=None):
+    """Scroll and collect items until the end stops growing or a budget runs out
+
+    on_batch(new_items, step_info) is called after every step with new items.
+    Returns (items, stats).
+    """
+    options = {
+        "item": item,
+        "fields": fields or {},
+        "keySelector": key_selector,
+        "keyAttribute": key_attribute,
+        "keyPattern": key_pattern,
+        "container": container,
+        "step": step,
+        "quiet": quiet,
+        "maxWait": max_wait,
+    }
+    previous_timeout = None
+    try:
+        previous_timeout = driver.timeouts.script
+    except Exception:
+        pass
+    driver.set_script_timeout(max_wait / 1000 + 10)
+
+    items, idle, height, stop_reason = [], 0, None, "max_steps"
+    started = time.time()
+    steps = 0
+    try:
+        # Step 0 reads what is already rendered without scrolling
+        result = driver.execute_async_script(HARVEST_SCRIPT, dict(options, reset=True, scroll=False, remaining=max_items))
+        while True:
+            new = result["items"]
+            items.extend(new)
+            if on_batch:
+                on_batch(new, {"step": steps, "total": len(items), "height": result["height"], "in_dom": result["inDom"]})
+            if len(items) >= max_items:
+                stop_reason = "max_items"
+                break
+            # Only a scroller parked at the end with nothing new counts towards stopping
+            unchanged = not new and steps and result["height"] == height
+            idle = idle + 1 if unchanged and result["atEnd"] else 0
+            height = result["height"]
+            if idle >= idle_steps:
+                stop_reason = "no_growth"
+                break
+            if steps >= max_steps:
+                stop_reason = "max_steps"
+                break
+            if time.time() - started > max_seconds:
+                stop_reason = "max_seconds"
+                break
+            steps += 1
+            result = driver.execute_async_script(HARVEST_SCRIPT, dict(options, remaining=max_items - len(items)))
+    finally:
+        try:
+            driver.execute_script(STOP_SCRIPT)
+        except Exception:
+            pass
+        if previous_timeout is not None:
+            driver.set_script_timeout(previous_timeout)
+
+    stats = {
+        "items": len(items),
+        "steps": steps,
+        "seconds": time.time() - started,
+        "stop_reason": stop_reason,
+        "in_dom": result["inDom"],
+        "height": result["height"],
+    }
+    return items, stats
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+"""
+Hybrid fetch: plain pooled HTTP first, the browser only when needed.
+
+Requests go out through a requests.Session that carries the live browser's
+cookies (all of them, httpOnly included, via Network.getAllCookies), user
+agent and language, so an established session is reused without rendering.
+If the response looks like a bot challenge or a JS-only shell, or lacks an
+expected selector or text, the URL is fetched through the browser instead
+and the cookies are synced back so the next HTTP attempt can succeed. The
+browser's cookie jar is compared before every HTTP attempt, since pages the
+agent visits in between set and clear cookies too; the session's jar is only
+rebuilt when it changed.
+
+Outcomes are recorded per URL pattern (host plus path with ids collapsed).
+Patterns where HTTP keeps failing go straight to the browser, with an
+occasional HTTP re-probe in case the block was lifted. The stats file is
+written at most once per FLUSH_DELAY seconds, not on every fetch.
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from dom_snapshot import from_html
+
+DEFAULT_STATS_FILE = os.environ.get("UNDETECTED_FETCH_STATS", "/tmp/undetected_fetch_stats.json")
+FLUSH_DELAY = float(os.environ.get("UNDETECTED_FETCH_STATS_FLUSH", "5"))
+
+# Only markers that appear on block pages themselves; vendor scripts that
+# load on every page (challenge-platform, datadome tags) would misfire
+CHALLENGE_MARKERS = re.compile(
+    r"cf_chl_opt|cf-chl-widget|<title>Just a moment\.\.\.</title>|Attention Required! \| Cloudflare|"
+    r"px-captcha|_Incapsula_Resource|captcha-delivery\.com|/_sec/cp_challenge",
+    re.I,
+)
+JS_ONLY_MARKERS = re.compile(r"(enable|requires?) javascript|javascript is (disabled|required)", re.I)
+ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{8}-[0-9a-f-]{27,}|[0-9a-f]{16,}|[A-Za-z0-9_-]{24,})$", re.I)
+
+BROWSER_FETCH_SCRIPT = r"""
+const [url, method, headers, body] = arguments;
+const done = arguments[arguments.length - 1];
+fetch(url, {method: method, headers: headers || {}, body: body, credentials: 'include'})
+    .then(async r => done({status: r.status, contentType: r.headers.get('content-type') || '', text: await r.text(), url: r.url}))
+    .catch(e => done({error: String(e)}));
+"""
+
+
+def url_pattern(url):
+    """www.carvana.com/vehicle/3703168 -> www.carvana.com/vehicle/{id}"""
+    parts = urlsplit(url)
+    segments = ["{id}" if ID_SEGMENT.match(s) else s for s in parts.path.split("/")]
+    return parts.netloc + "/".join(segments)
+
+
+def detect_block(status, content_type, text, expect_selector=None, expect_text=None):
+    """Reason the HTTP response is unusable, or None if it can be served"""
+    if CHALLENGE_MARKERS.search(text[:20000]):
+        return f"challenge page (HTTP {status})"
+    if status >= 400:
+        return f"HTTP {status}"
+    if expect_text and expect_text not in text:
+        return f"expected text {expect_text!r} missing"
+    if "html" in content_type:
+        if expect_selector:
+            try:
+                if not from_html(text).select(expect_selector, limit=1):
+                    return f"expected selector {expect_selector!r} missing"
+            except Exception as e:
+                return f"unparseable HTML ({e})"
+        # App shells: little visible text and a noscript plea
+        visible = re.sub(r"<script.*?</script>|<style.*?</style>|<[^>]+>", " ", text, flags=re.S | re.I)
+        if len(visible.split()) < 50 and (JS_ONLY_MARKERS.search(text) or "<noscript" in text.lower()):
+            return "JS-only content"
+    return None
+
+
+class HybridFetcher:
+    """HTTP-first fetcher bound to a browser for cookies and fallback"""
+
+    def __init__(self, stats_path=DEFAULT_STATS_FILE, pool_size=16, timeout=20, reprobe_every=20, give_up_after=3,
+                 flush_delay=FLUSH_DELAY):
+        self.stats_path = stats_path
+        self.flush_delay = flush_delay
+        self.timeout = timeout
+        self.reprobe_every = reprobe_every
+        self.give_up_after = give_up_after
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=Retry(total=1, backoff_factor=0.2, status_forcelist=(502, 504)))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.synced_driver = None
+        self.synced_cookies = None
+        self.lock = threading.Lock()
+        self._flush_timer = None
+        try:
+            with open(stats_path) as f:
+                self.patterns = json.load(f)
+        except (OSError, ValueError):
+            self.patterns = {}
+        atexit.register(self.flush)
+
+    def sync_cookies(self, driver):
+        """Rebuild the session's cookie jar if the browser's changed; returns whether it did"""
+        cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+        jar = sorted((c["name"], c.get("domain"), c.get("path", "/"), c["value"], c.get("secure", False)) for c in cookies)
+        if jar == self.synced_cookies:
+            return False
+        # Rebuilt rather than merged so cookies the browser dropped (logouts, rotated tokens) go too
+        self.session.cookies.clear()
+        for name, domain, path, value, secure in jar:
+            self.session.cookies.set(name, value, domain=domain, path=path, secure=secure)
+        self.synced_cookies = jar
+        return True
+
+    def sync_from_browser(self, driver):
+        """Copy cookies, user agent and language from the live browser"""
+        self.sync_cookies(driver)
+        identity = driver.execute_script("return [navigator.userAgent, navigator.languages.join(',')]")
+        self.session.headers.update({
+            "User-Agent": identity[0],
+            "Accept-Language": identity[1] or "en-US,en;q=0.9",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,application/json;q=0.8,*/*;q=0.7",
+        })
+        self.synced_driver = driver
+        return len(self.synced_cookies)
+
+    def _stats(self, pattern):
+        return self.patterns.setdefault(pattern, {
+            "http_ok": 0, "http_blocked": 0, "browser_ok": 0, "browser_failed": 0,
+            "http_ms": 0.0, "browser_ms": 0.0, "streak": 0, "skipped": 0, "last_reason": None,
+        })
+
+    def _record(self, pattern, path, ok, elapsed_ms, reason=None):
+        with self.lock:
+            stats = self._stats(pattern)
+            if path == "http":
+                stats["http_ok" if ok else "http_blocked"] += 1
+                stats["http_ms"] += elapsed_ms
+                # Consecutive HTTP failures decide whether to skip straight to the browser
+                stats["streak"] = 0 if ok else stats["streak"] + 1
+                if reason:
+                    stats["last_reason"] = reason
+            else:
+                stats["browser_ok" if ok else "browser_failed"] += 1
+                stats["browser_ms"] += elapsed_ms
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """Write pending stats to the stats file"""
+        with self.lock:
+            if self._flush_timer is None:
+                return
+            self._flush_timer.cancel()
+            self._flush_timer = None
+            tmp = self.stats_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.patterns, f)
+            os.replace(tmp, self.stats_path)
+
+    def _try_http(self, pattern):
+        with self.lock:
+            stats = self._stats(pattern)
+            if stats["streak"] < self.give_up_after:
+                return True
+            stats["skipped"] += 1
+            return stats["skipped"] % self.reprobe_every == 0
+
+    def fetch(self, url, driver=None, launch=None, method="GET", headers=None, body=None, mode="auto",
+              expect_selector=None, expect_text=None):
+        """Fetch url over HTTP or the browser; returns a result dict with the path taken
+
+        driver is the running browser, if any (cookies come from it); launch()
+        starts one when a fallback needs it.
+        """
+        can_fall_back = driver is not None or launch is not None
+        pattern = url_pattern(url)
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+            headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        reason = None
+
+        if mode in ("auto", "http") and (mode == "http" or self._try_http(pattern)):
+            if driver is not None:
+                if self.synced_driver is not driver:
+                    self.sync_from_browser(driver)
+                else:
+                    self.sync_cookies(driver)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, headers=headers, data=body, timeout=self.timeout)
+                content_type = response.headers.get("Content-Type", "")
+                reason = detect_block(response.status_code, content_type, response.text, expect_selector, expect_text)
+                elapsed = (time.perf_counter() - start) * 1000
+                self._record(pattern, "http", reason is None, elapsed, reason)
+                if reason is None or mode == "http" or not can_fall_back:
+                    return {"url": response.url, "status": response.status_code, "path": "http", "content_type": content_type,
+                            "text": response.text, "elapsed_ms": elapsed, "pattern": pattern, "blocked": reason}
+            except requests.RequestException as e:
+                reason = f"request failed: {e}"
+                self._record(pattern, "http", False, (time.perf_counter() - start) * 1000, reason)
+                if mode == "http" or not can_fall_back:
+                    raise
+        elif mode in ("auto", "http"):
+            reason = "HTTP skipped: pattern keeps getting blocked"
+
+        if driver is None:
+            if launch is None:
+                raise RuntimeError("Browser fallback needed but no browser is running")
+            driver = launch()
+
+        start = time.perf_counter()
+        try:
+            if method == "GET" and not body and not headers:
+                driver.get(url)
+                result = {"url": driver.current_url, "status": None, "content_type": "text/html", "text": driver.page_source}
+            else:
+                # API calls run as fetch() inside the page so the browser's own session and origin apply
+                result = driver.execute_async_script(BROWSER_FETCH_SCRIPT, url, method, headers or {}, body)
+                if result.get("error"):
+                    raise RuntimeError(result["error"])
+                result["content_type"] = result.pop("contentType", "")
+        except Exception:
+            self._record(pattern, "browser", False, (time.perf_counter() - start) * 1000)
+            raise
+        elapsed = (time.perf_counter() - start) * 1000
+        self._record(pattern, "browser", True, elapsed)
+        # A solved challenge usually leaves clearance cookies behind
+        self.sync_from_browser(driver)
+        result.update(path="browser", elapsed_ms=elapsed, pattern=pattern, fallback_reason=reason)
+        return result
+
+    def format_stats(self):
+        if not self.patterns:
+            return "📊 No fetches recorded yet"
+        lines = ["📊 Fetch paths by URL pattern:"]
+        ranked = sorted(self.patterns.items(), key=lambda kv: -(kv[1]["http_ok"] + kv[1]["http_blocked"] + kv[1]["browser_ok"]))
+        for pattern, s in ranked:
+            http_avg = s["http_ms"] / max(1, s["http_ok"] + s["http_blocked"])
+            browser_avg = s["browser_ms"] / max(1, s["browser_ok"] + s["browser_failed"])
+            preferred = "browser" if s["streak"] >= self.give_up_after else "http"
+            lines.append(
+                f"   {pattern}: http {s['http_ok']} ok / {s['http_blocked']} blocked (avg {http_avg:.0f} ms), "
+                f"browser {s['browser_ok']} ok / {s['browser_failed']} failed (avg {browser_avg:.0f} ms), now {preferred}"
+                + (f", last block: {s['last_reason']}" if s["last_reason"] else "")
+            )
+        return "\n".join(lines)
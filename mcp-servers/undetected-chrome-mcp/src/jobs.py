@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+"""
+Scheduled refresh jobs: saved searches (URL + extraction rules + interval)
+re-scraped in the background whenever the browser is idle, so reads
+return the latest result instantly together with how stale it is.
+
+Jobs run in their own tab and only when no tool call holds the browser,
+so an agent's page is never navigated away under it. In the daemon the
+browser is shared, so its one scheduler queues refreshes on the browser
+thread through a runner instead, alongside every client's calls.
+
+Job definitions and their last results are kept in a JSON file and survive
+restarts. Every server process and daemon client sees the same file:
+changes are made under an flock on <file>.lock after re-reading it, and
+reads pick up other processes' writes. Only the scheduler holding the
+lease (an flock on <file>.owner, let go when its process exits) runs due
+jobs, so each saved search is scraped once per interval however many
+servers are up; the others take over when it goes away.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dom_snapshot import from_html
+from pipeline import SERIALIZE_SCRIPT, apply_rules
+from stealth import bootstrap_tab
+
+DEFAULT_JOBS_FILE = os.environ.get("UNDETECTED_JOBS_FILE", "/tmp/undetected_jobs.json")
+
+
+class JobScheduler:
+    """Runs due jobs on an idle browser and caches their latest results"""
+
+    def __init__(self, mcp=None, path=DEFAULT_JOBS_FILE, tick=1.0, runner=None):
+        self.mcp = mcp
+        self.path = path
+        self.tick = tick
+        # runner(job) queues job(driver) on whatever thread owns the browser (driver None: mcp launches one);
+        # None means take mcp.lock here
+        self.runner = runner
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.tab = None
+        self.queued = set()
+        self.stopped = threading.Event()
+        self._stamp = None
+        self._lease = None
+        with self.lock:
+            self._sync()
+        self.thread = threading.Thread(target=self._loop, name="job-scheduler", daemon=True)
+        self.thread.start()
+
+    @contextmanager
+    def _file_lock(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _load(self):
+        self._stamp = self._file_stamp()
+        try:
+            with open(self.path) as f:
+                self.jobs = json.load(f)
+        except (OSError, ValueError):
+            self.jobs = {}
+
+    def _sync(self):
+        """Re-read the file if another scheduler wrote it; the caller holds self.lock"""
+        if self._file_stamp() != self._stamp:
+            with self._file_lock():
+                self._load()
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.jobs, f)
+        os.replace(tmp, self.path)
+        self._stamp = self._file_stamp()
+
+    @contextmanager
+    def _update(self):
+        """Change jobs on top of the file's current contents and write them back"""
+        with self.lock, self._file_lock():
+            self._load()
+            yield self.jobs
+            self._save()
+
+    def _hold_lease(self):
+        """Whether this scheduler is the one that runs due jobs, taking the lease if it is free"""
+        with self.lock:
+            if self.stopped.is_set():
+                return False
+            if self._lease is None:
+                self._lease = open(self.path + ".owner", "a")
+            try:
+                fcntl.flock(self._lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            return True
+
+    def snapshot(self):
+        """All jobs as currently saved, by name"""
+        with self.lock:
+            self._sync()
+            return {name: dict(job) for name, job in self.jobs.items()}
+
+    def add(self, name, url, rules, interval, wait_for=None, settle=0):
+        with self._update() as jobs:
+            previous = jobs.get(name, {})
+            jobs[name] = {
+                "url": url,
+                "rules": rules,
+                "interval": interval,
+                "wait_for": wait_for,
+                "settle": settle,
+                # Keep the cached result if only the schedule changed
+                "result": previous.get("result") if previous.get("url") == url and previous.get("rules") == rules else None,
+                "next_run": time.time(),
+                "runs": previous.get("runs", 0),
+                "errors": previous.get("errors", 0),
+            }
+            return dict(jobs[name])
+
+    def remove(self, name):
+        with self._update() as jobs:
+            return jobs.pop(name, None) is not None
+
+    def read(self, name):
+        """Cached result plus its age in seconds and whether it is overdue"""
+        with self.lock:
+            self._sync()
+            job = self.jobs.get(name)
+            if job is None:
+                return None
+            result = job.get("result")
+            age = time.time() - result["fetched_at"] if result else None
+            return {
+                "job": job,
+                "result": result,
+                "age": age,
+                "stale": age is None or age > job["interval"],
+            }
+
+    def due(self, now=None):
+        now = now or time.time()
+        with self.lock:
+            self._sync()
+            ready = [(job["next_run"], name) for name, job in self.jobs.items() if job["next_run"] <= now]
+        return [name for _, name in sorted(ready)]
+
+    def refresh(self, name, driver=None):
+        """Scrape one job now in driver (else mcp's); the caller must hold the browser"""
+        with self.lock:
+            self._sync()
+            job = dict(self.jobs[name])
+        started = time.time()
+        try:
+            data = self._scrape(job, driver or self.mcp.init_driver(True))
+            outcome = {"data": data, "fetched_at": time.time(), "duration": time.time() - started}
+            error = None
+        except Exception as e:
+            outcome, error = None, str(e)
+        with self._update() as jobs:
+            current = jobs.get(name)
+            if current is None:
+                return None
+            current["runs"] += 1
+            current["next_run"] = time.time() + current["interval"]
+            if error:
+                current["errors"] += 1
+                current["last_error"] = error
+                # Retry sooner than a full interval, but do not hammer a failing site
+                current["next_run"] = time.time() + min(current["interval"], 60)
+            else:
+                current["result"] = outcome
+                current.pop("last_error", None)
+        if error:
+            raise RuntimeError(error)
+        return outcome
+
+    def _scrape(self, job, driver):
+        home = driver.current_window_handle
+        if self.tab not in driver.window_handles:
+            driver.switch_to.new_window("tab")
+            self.tab = driver.current_window_handle
+            bootstrap_tab(driver)
+        else:
+            driver.switch_to.window(self.tab)
+        try:
+            driver.get(job["url"])
+            if job.get("wait_for"):
+                from selenium.webdriver.common.by import By
+                from selenium.webdriver.support import expected_conditions as EC
+                from selenium.webdriver.support.ui import WebDriverWait
+                try:
+                    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, job["wait_for"])))
+                except Exception:
+                    pass
+            if job.get("settle"):
+                time.sleep(job["settle"])
+            markup = driver.execute_script(SERIALIZE_SCRIPT)
+            url = driver.current_url
+        finally:
+            driver.switch_to.window(home)
+        return apply_rules(from_html(markup, url=url), job["rules"])
+
+    def _loop(self):
+        while not self.stopped.wait(self.tick):
+            if not self._hold_lease():
+                continue
+            if self.runner is not None:
+                self._queue_due()
+                continue
+            for name in self.due():
+                # Idle capacity only: skip the round if a tool call holds the browser
+                if not self.mcp.lock.acquire(blocking=False):
+                    break
+                try:
+                    self.refresh(name)
+                except Exception:
+                    pass
+                finally:
+                    self.mcp.lock.release()
+
+    def _queue_due(self):
+        for name in self.due():
+            with self.lock:
+                if name in self.queued:
+                    continue
+                self.queued.add(name)
+            self.runner(lambda driver, name=name: self._run_queued(name, driver))
+
+    def _run_queued(self, name, driver):
+        try:
+            if not self.stopped.is_set():
+                self.refresh(name, driver)
+        except Exception:
+            pass
+        finally:
+            with self.lock:
+                self.queued.discard(name)
+
+    def stop(self):
+        with self.lock:
+            self.stopped.set()
+            self.tab = None
+            if self._lease is not None:
+                # Closing the descriptor hands the lease to the next scheduler
+                self._lease.close()
+                self._lease = None
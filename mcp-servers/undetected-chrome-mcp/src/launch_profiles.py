@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+"""
+Named Chromium launch profiles shared by the server and the scripts.
+
+Every entry point used to carry its own copy of the container flag list.
+They now pick one of these presets by name (the UNDETECTED_LAUNCH_PROFILE
+environment variable or the server's --profile option):
+
+    stealth-full   the server's historical flags: full anti-detection,
+                   headed or headless as asked
+    lean-headless  always headless, background services and images off;
+                   for bulk page loads where stealth matters less
+    low-memory     stealth flags plus a renderer process limit, a small
+                   disk cache and no site-per-process isolation
+
+Chromium only honours the last --disable-features switch, so the features
+a profile disables are merged into one switch when options are built.
+
+Each preset can be measured against the local fixture site: startup
+(launch until the driver answers), resident memory of the browser's
+process tree after the page loads, and page load time.
+
+Usage:
+    python3 launch_profiles.py list
+    python3 launch_profiles.py bench --profiles stealth-full,low-memory --cards 1000 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import driver_cache
+
+CHROMIUM_BINARY = os.environ.get("UNDETECTED_CHROMIUM", "/usr/bin/chromium")
+
+# Needed by every profile to run inside a container
+CONTAINER_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+]
+
+STEALTH_ARGS = [
+    "--disable-web-security",
+    "--disable-extensions",
+    "--disable-plugins",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--hide-scrollbars",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-first-run",
+    "--safebrowsing-disable-auto-update",
+    "--disable-client-side-phishing-detection",
+    "--disable-component-update",
+    "--disable-domain-reliability",
+    "--disable-ipc-flooding-protection",
+    "--disable-renderer-backgrounding",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-breakpad",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-blink-features=AutomationControlled",
+]
+
+PROFILES = {
+    "stealth-full": {
+        "description": "Full anti-detection flag set; headed or headless as requested",
+        "headless": None,
+        "args": STEALTH_ARGS,
+        "disable_features": ["VizDisplayCompositor", "TranslateUI", "BlinkGenPropertyTrees"],
+        "prefs": {
+            "profile.default_content_setting_values.notifications": 2,
+            "profile.default_content_settings.popups": 0,
+        },
+    },
+    "lean-headless": {
+        "description": "Always headless; background services, extensions and images off",
+        "headless": True,
+        "args": [
+            "--disable-extensions",
+            "--disable-default-apps",
+            "--disable-sync",
+            "--no-first-run",
+            "--mute-audio",
+            "--hide-scrollbars",
+            "--disable-background-networking",
+            "--disable-component-update",
+            "--disable-breakpad",
+            "--disable-domain-reliability",
+            "--blink-settings=imagesEnabled=false",
+            "--disable-blink-features=AutomationControlled",
+        ],
+        "disable_features": ["Translate", "OptimizationHints", "MediaRouter", "InterestFeedContentSuggestions"],
+        "prefs": {
+            "profile.default_content_setting_values.notifications": 2,
+            "profile.managed_default_content_settings.images": 2,
+        },
+    },
+    "low-memory": {
+        "description": "Stealth flags with fewer renderer processes and a 32 MB disk cache",
+        "headless": None,
+        "args": STEALTH_ARGS + [
+            "--renderer-process-limit=2",
+            "--disable-site-isolation-trials",
+            "--disk-cache-size=33554432",
+            "--aggressive-cache-discard",
+        ],
+        "disable_features": [
+            "VizDisplayCompositor", "TranslateUI", "BlinkGenPropertyTrees",
+            "site-per-process", "IsolateOrigins", "BackForwardCache",
+        ],
+        "prefs": {
+            "profile.default_content_setting_values.notifications": 2,
+            "profile.default_content_settings.popups": 0,
+        },
+    },
+}
+
+
+def default_profile():
+    """Profile name from UNDETECTED_LAUNCH_PROFILE, else stealth-full"""
+    return os.environ.get("UNDETECTED_LAUNCH_PROFILE") or "stealth-full"
+
+
+def get_profile(name=None):
+    name = name or default_profile()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown launch profile {name!r}; expected one of {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def chrome_args(name=None, headless=True, user_agent=None):
+    """Command-line switches for a profile, in order"""
+    profile = get_profile(name)
+    args = CONTAINER_ARGS + profile["args"]
+    if profile["disable_features"]:
+        args = args + [f"--disable-features={','.join(profile['disable_features'])}"]
+    if profile["headless"] if profile["headless"] is not None else headless:
+        args = args + ["--headless=new"]
+    # Without one the stealth bootstrap reports the browser's own version, minus the headless marker
+    return args + [f"--user-agent={user_agent}"] if user_agent else args
+
+
+def chrome_options(name=None, headless=True, user_agent=None):
+    """uc.ChromeOptions for a profile"""
+    import undetected_chromedriver as uc
+
+    options = uc.ChromeOptions()
+    options.binary_location = CHROMIUM_BINARY
+    for arg in chrome_args(name, headless, user_agent):
+        options.add_argument(arg)
+    options.add_experimental_option("prefs", dict(get_profile(name)["prefs"]))
+    return options
+
+
+def launch(name=None, headless=True, user_agent=None):
+    """Start undetected Chrome with a profile and the stealth bootstrap; returns the driver"""
+    import undetected_chromedriver as uc
+
+    import stealth
+
+    # Resolved offline and patched once per driver build
+    driver_cache.install()
+    resolved = driver_cache.DriverCache().resolve()
+    driver = uc.Chrome(
+        options=chrome_options(name, headless, user_agent),
+        version_main=resolved["driver"][0],
+        driver_executable_path=resolved["executable"],
+    )
+    stealth.install(driver, user_agent)
+    return driver
+
+
+def bench_profile(name, url, repeat=3, timeout=60):
+    """Startup, RSS and page load samples for one profile against url"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    from bench import summary
+    from fleet import process_tree_rss
+
+    startup, page_load, rss = [], [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        driver = launch(name)
+        try:
+            driver.execute_script("return 1")
+            startup.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            driver.get(url)
+            WebDriverWait(driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "[data-qa=vehicle-card]")))
+            page_load.append(time.perf_counter() - started)
+            rss.append(process_tree_rss(driver.browser_pid))
+        finally:
+            driver.quit()
+    return {
+        "startup": summary(startup),
+        "page_load": summary(page_load),
+        "rss": {"bytes": max(rss), "median": sorted(rss)[len(rss) // 2]},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chromium launch profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Show the profiles and their switches")
+    bench_cmd = sub.add_parser("bench", help="Measure startup, RSS and page load per profile on the fixture site")
+    bench_cmd.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profile names")
+    bench_cmd.add_argument("--cards", type=int, default=1000, help="Cards on the fixture listing page")
+    bench_cmd.add_argument("--latency", type=float, default=0, help="Fixture response delay in ms")
+    bench_cmd.add_argument("--repeat", type=int, default=3, help="Launches per profile")
+    bench_cmd.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, profile in PROFILES.items():
+            print(f"{name}: {profile['description']}")
+            for arg in chrome_args(name):
+                print(f"    {arg}")
+        return
+
+    from fixtures import FixtureServer
+
+    names = [n.strip() for n in args.profiles.split(",") if n.strip()]
+    unknown = [n for n in names if n not in PROFILES]
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(unknown)}")
+    fixtures = FixtureServer().start()
+    results = {}
+    try:
+        url = f"{fixtures.url}/cars?cards={args.cards}&latency={args.latency}"
+        for name in names:
+            print(f"🚀 {name}", file=sys.stderr, flush=True)
+            results[name] = bench_profile(name, url, args.repeat)
+    finally:
+        fixtures.stop()
+
+    print(f"{'profile':<16}{'startup':>12}{'page load':>12}{'rss':>10}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['startup']['median'] * 1000:>10.0f}ms{result['page_load']['median'] * 1000:>10.0f}ms"
+              f"{result['rss']['bytes'] / 1024 / 1024:>8.0f}MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parameters": vars(args), "profiles": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+
+"""
+Load generator for the MCP server.
+
+Starts one or more server processes (or any stdio MCP command, such as a
+--connect shim or a --router), then runs virtual users against them at a
+fixed concurrency and an optional global call rate. Each user repeats a
+session: either a synthetic browse of the local fixture site or the
+tools/call sequence of a recording made with server.py --record. URLs in
+recorded sessions are rewritten onto the fixture site, so nothing leaves
+the machine unless --live is given. The report covers throughput, latency
+percentiles per tool and error rates, and can be written as JSON.
+
+Usage:
+    python3 loadgen.py run --servers 2 --concurrency 4 --duration 60 --rate 5
+    python3 loadgen.py run --session /tmp/mcp-traffic.ndjson --iterations 3 --json results.json
+    python3 loadgen.py report /tmp/mcp-traffic.ndjson
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from fixtures import FixtureServer
+from traffic import read_recording, recorded_calls, recorded_latencies, response_error
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+URL_RE = re.compile(r"^https?://", re.I)
+
+
+class ServerProcess:
+    """One stdio MCP server; calls from many threads are matched to responses by id"""
+
+    def __init__(self, command, timeout=120):
+        self.command = command
+        self.timeout = timeout
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        self.write_lock = threading.Lock()
+        self.pending = {}
+        self.ids = 0
+        self.lock = threading.Lock()
+        self.reader = threading.Thread(target=self._read, name="loadgen-reader", daemon=True)
+        self.reader.start()
+        self.request("initialize", {"protocolVersion": "2024-11-05", "capabilities": {},
+                                    "clientInfo": {"name": "loadgen", "version": "1.0.0"}})
+        self._write({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    def _write(self, message):
+        with self.write_lock:
+            self.process.stdin.write((json.dumps(message) + "\n").encode())
+            self.process.stdin.flush()
+
+    def _read(self):
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if "id" not in message:
+                continue
+            with self.lock:
+                waiter = self.pending.pop(message["id"], None)
+            if waiter:
+                waiter[1] = message
+                waiter[0].set()
+        # Server went away: fail everything still waiting
+        with self.lock:
+            waiters, self.pending = list(self.pending.values()), {}
+        for waiter in waiters:
+            waiter[0].set()
+
+    def request(self, method, params=None):
+        with self.lock:
+            self.ids += 1
+            request_id = self.ids
+            waiter = self.pending[request_id] = [threading.Event(), None]
+        self._write({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+        if not waiter[0].wait(self.timeout):
+            with self.lock:
+                self.pending.pop(request_id, None)
+            raise TimeoutError(f"{method} timed out after {self.timeout}s")
+        if waiter[1] is None:
+            raise ConnectionError(f"server exited with {self.process.poll()}")
+        return waiter[1]
+
+    def call(self, name, arguments):
+        return self.request("tools/call", {"name": name, "arguments": arguments})
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(30)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class RateLimiter:
+    """Spaces calls evenly across all users; rate is calls per second, 0 for unlimited"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next)
+            self.next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def synthetic_session(base_url, cards=48):
+    """A browse of the fixture site: listing, extraction, content, a detail page"""
+    listing = f"{base_url}/cars?cards={cards}"
+    return [
+        ("undetected_navigate", {"url": listing, "delay": 1, "wait_for": "[data-qa=vehicle-card]"}),
+        ("undetected_extract", {"selector": "[data-qa=make-model]", "wait_time": 5}),
+        ("undetected_extract", {"selector": "[data-qa=vehicle-link]", "attribute": "href", "wait_time": 5}),
+        ("undetected_snapshot", {"action": "capture", "selector": "[data-qa=price]", "limit": 20}),
+        ("undetected_get_content", {"max_chars": 4000}),
+        ("undetected_navigate", {"url": f"{base_url}/vehicle/1000007", "delay": 1}),
+        ("undetected_extract", {"selector": "[data-qa=vehicle-price]", "multiple": False, "wait_time": 5}),
+    ]
+
+
+def rewrite_urls(value, base_url):
+    """Point every http(s) URL in a value at the fixture site, keeping path and query"""
+    if isinstance(value, str) and URL_RE.match(value):
+        parts = urlsplit(value)
+        return base_url + (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    if isinstance(value, dict):
+        return {k: rewrite_urls(v, base_url) for k, v in value.items()}
+    if isinstance(value, list):
+        return [rewrite_urls(v, base_url) for v in value]
+    return value
+
+
+def recorded_sessions(path, base_url=None):
+    """Sessions from a recording as lists of (name, arguments); URLs rewritten unless base_url is None"""
+    sessions = []
+    for calls in recorded_calls(path).values():
+        steps = [(name, args) for _, name, args in calls if name not in ("undetected_status", "undetected_close")]
+        if base_url:
+            steps = [(name, rewrite_urls(args, base_url)) for name, args in steps]
+        if steps:
+            sessions.append(steps)
+    return sessions
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Report dict from (tool, seconds, error) samples over elapsed seconds"""
+    def stats(group):
+        latencies = sorted(s[1] for s in group)
+        errors = sum(1 for s in group if s[2])
+        return {
+            "calls": len(group),
+            "errors": errors,
+            "error_rate": errors / len(group) if group else 0.0,
+            "throughput": len(group) / elapsed if elapsed else 0.0,
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        }
+
+    tools = {}
+    for sample in samples:
+        tools.setdefault(sample[0], []).append(sample)
+    error_messages = {}
+    for sample in samples:
+        if sample[2]:
+            error_messages[sample[2]] = error_messages.get(sample[2], 0) + 1
+    return {
+        "elapsed": elapsed,
+        "overall": stats(samples),
+        "tools": {name: stats(group) for name, group in sorted(tools.items())},
+        "errors": sorted(error_messages.items(), key=lambda kv: -kv[1])[:10],
+    }
+
+
+def format_report(report):
+    def ms(value):
+        return f"{value * 1000:8.0f}" if value is not None else f"{'-':>8}"
+
+    lines = [f"{'tool':<28}{'calls':>7}{'err%':>7}{'rps':>8}{'p50 ms':>8}{'p90 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'max ms':>8}"]
+    rows = list(report["tools"].items()) + [("TOTAL", report["overall"])]
+    for name, s in rows:
+        lines.append(f"{name:<28}{s['calls']:>7}{s['error_rate'] * 100:>6.1f}%{s['throughput']:>8.2f}"
+                     f"{ms(s['p50'])}{ms(s['p90'])}{ms(s['p95'])}{ms(s['p99'])}{ms(s['max'])}")
+    if report.get("sessions") is not None:
+        lines.append(f"{report['sessions']} sessions in {report['elapsed']:.1f}s")
+    for message, count in report["errors"]:
+        lines.append(f"  {count}x {message}")
+    return "\n".join(lines)
+
+
+def run(command, sessions, servers=1, concurrency=4, rate=0, duration=60, iterations=None, timeout=120):
+    """Drive servers with concurrent virtual users; returns the report dict
+
+    Each user is pinned to one server and loops over the sessions in turn
+    until duration runs out or it has run iterations sessions.
+    """
+    processes = [ServerProcess(command, timeout) for _ in range(servers)]
+    limiter = RateLimiter(rate)
+    samples, lock = [], threading.Lock()
+    completed = [0]
+    started = time.monotonic()
+    deadline = started + duration if duration else None
+
+    def user(index):
+        server = processes[index % len(processes)]
+        count = 0
+        while iterations is None or count < iterations:
+            for name, arguments in sessions[(index + count) % len(sessions)]:
+                if deadline and time.monotonic() >= deadline:
+                    return
+                limiter.wait()
+                call_started = time.perf_counter()
+                try:
+                    error = response_error(server.call(name, arguments))
+                except (TimeoutError, ConnectionError, OSError) as e:
+                    error = f"{type(e).__name__}: {e}"
+                with lock:
+                    samples.append((name, time.perf_counter() - call_started, error))
+            count += 1
+            with lock:
+                completed[0] += 1
+
+    threads = [threading.Thread(target=user, args=(i,), name=f"loadgen-user-{i}", daemon=True) for i in range(concurrency)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for process in processes:
+            process.close()
+    report = summarize(samples, time.monotonic() - started)
+    report.update(sessions=completed[0], servers=servers, concurrency=concurrency, rate=rate, command=command)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator and traffic reports for the MCP server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="Run virtual users against server processes")
+    run_cmd.add_argument("--server-command", default=None,
+                         help=f"stdio MCP command to start per server (default: {sys.executable} {SERVER_PATH})")
+    run_cmd.add_argument("--servers", type=int, default=1, help="Server processes to start")
+    run_cmd.add_argument("--concurrency", type=int, default=4, help="Concurrent virtual users")
+    run_cmd.add_argument("--rate", type=float, default=0, help="Global tool calls per second (0: as fast as possible)")
+    run_cmd.add_argument("--duration", type=float, default=60, help="Seconds to run (0: until iterations are done)")
+    run_cmd.add_argument("--iterations", type=int, default=None, help="Sessions per user")
+    run_cmd.add_argument("--session", help="Replay tools/call sessions from a --record NDJSON file")
+    run_cmd.add_argument("--cards", type=int, default=48, help="Cards per fixture listing page")
+    run_cmd.add_argument("--latency", type=float, default=0, help="Fixture response delay in ms")
+    run_cmd.add_argument("--live", action="store_true", help="Replay recorded URLs as-is instead of against fixtures")
+    run_cmd.add_argument("--timeout", type=float, default=120, help="Per-call timeout in seconds")
+    run_cmd.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    report_cmd = sub.add_parser("report", help="Latency and error report from a --record NDJSON file")
+    report_cmd.add_argument("recording")
+    report_cmd.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        samples = recorded_latencies(args.recording)
+        # Throughput over the recorded span, not the time it takes to read the file
+        times = [entry["t"] for entry in read_recording(args.recording)]
+        report = summarize(samples, (max(times) - min(times)) if times else 0)
+    else:
+        fixtures = FixtureServer(cards=args.cards, latency=args.latency).start()
+        try:
+            if args.session:
+                sessions = recorded_sessions(args.session, None if args.live else fixtures.url)
+                if not sessions:
+                    print(f"No tools/call requests in {args.session}", file=sys.stderr)
+                    sys.exit(1)
+            else:
+                sessions = [synthetic_session(fixtures.url, args.cards)]
+            command = shlex.split(args.server_command) if args.server_command else [sys.executable, SERVER_PATH]
+            print(f"🚀 {args.concurrency} users on {args.servers} servers, fixtures at {fixtures.url}", file=sys.stderr, flush=True)
+            report = run(command, sessions, args.servers, args.concurrency, args.rate,
+                         args.duration, args.iterations, args.timeout)
+            report["fixture_requests"] = fixtures.requests
+        finally:
+            fixtures.stop()
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
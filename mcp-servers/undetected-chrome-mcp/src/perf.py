@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+"""
+Page-side performance collection: CDP Performance.getMetrics, web vitals
+from PerformanceObserver, and optional Chrome traces streamed to disk.
+"""
+
+import os
+import time
+
+# Installed on every new document so LCP, CLS and long tasks are observed
+# from the first byte instead of only after the tool is called.
+PERF_OBSERVER_SCRIPT = """
+(() => {
+    if (window.__ucPerf) return;
+    const perf = window.__ucPerf = {lcp: null, cls: 0, longTasks: 0, longTaskTime: 0, longestTask: 0};
+    const observe = (type, callback) => {
+        try {
+            new PerformanceObserver(list => list.getEntries().forEach(callback))
+                .observe({type: type, buffered: true});
+        } catch (e) {}
+    };
+    observe('largest-contentful-paint', entry => { perf.lcp = entry.startTime; });
+    observe('layout-shift', entry => { if (!entry.hadRecentInput) perf.cls += entry.value; });
+    observe('longtask', entry => {
+        perf.longTasks += 1;
+        perf.longTaskTime += entry.duration;
+        perf.longestTask = Math.max(perf.longestTask, entry.duration);
+    });
+})();
+"""
+
+READ_VITALS_SCRIPT = """
+const perf = window.__ucPerf || {};
+const nav = performance.getEntriesByType('navigation')[0];
+const fcp = performance.getEntriesByName('first-contentful-paint')[0];
+return {
+    lcp: perf.lcp === undefined ? null : perf.lcp,
+    cls: perf.cls === undefined ? null : perf.cls,
+    longTasks: perf.longTasks || 0,
+    longTaskTime: perf.longTaskTime || 0,
+    longestTask: perf.longestTask || 0,
+    fcp: fcp ? fcp.startTime : null,
+    ttfb: nav ? nav.responseStart : null,
+    domContentLoaded: nav ? nav.domContentLoadedEventEnd : null,
+    load: nav ? nav.loadEventEnd : null,
+    transferSize: nav ? nav.transferSize : null,
+    resources: performance.getEntriesByType('resource').length
+};
+"""
+
+# Subset of Performance.getMetrics worth reporting; the rest stays in the raw dict
+KEY_METRICS = [
+    "ScriptDuration",
+    "LayoutDuration",
+    "RecalcStyleDuration",
+    "TaskDuration",
+    "JSHeapUsedSize",
+    "JSHeapTotalSize",
+    "Nodes",
+    "LayoutCount",
+    "RecalcStyleCount",
+    "JSEventListeners",
+]
+
+# Metrics compared against the previous profile of the same page
+TREND_METRICS = ["JSHeapUsedSize", "ScriptDuration", "LayoutDuration", "Nodes", "lcp", "transferSize"]
+
+DEFAULT_TRACE_CATEGORIES = "devtools.timeline,v8.execute,disabled-by-default-devtools.timeline,loading,blink.user_timing"
+
+
+def install_perf_observers(driver):
+    """Register the web-vitals observers for every future document"""
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": PERF_OBSERVER_SCRIPT})
+    driver.execute_cdp_cmd("Performance.enable", {"timeDomain": "timeTicks"})
+    driver.execute_script(PERF_OBSERVER_SCRIPT)
+
+
+def collect_page_perf(driver):
+    """Return CDP metrics plus web vitals for the current document"""
+    raw = driver.execute_cdp_cmd("Performance.getMetrics", {})
+    metrics = {m["name"]: m["value"] for m in raw.get("metrics", [])}
+    vitals = driver.execute_script(READ_VITALS_SCRIPT) or {}
+    return {
+        "url": driver.current_url,
+        "timestamp": time.time(),
+        "metrics": metrics,
+        "vitals": vitals,
+    }
+
+
+def summarize_perf(profile):
+    """Flatten a profile into the values used for reports and trends"""
+    metrics = profile.get("metrics", {})
+    summary = {name: metrics.get(name) for name in KEY_METRICS if name in metrics}
+    summary.update({k: v for k, v in profile.get("vitals", {}).items() if v is not None})
+    return summary
+
+
+def compare_profiles(previous, current):
+    """Describe how the tracked metrics moved since the previous profile"""
+    if not previous:
+        return []
+    before, after = summarize_perf(previous), summarize_perf(current)
+    lines = []
+    for name in TREND_METRICS:
+        old, new = before.get(name), after.get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        arrow = "⬆️" if change > 0 else "⬇️" if change < 0 else "➡️"
+        lines.append(f"{arrow} {name}: {_format_value(name, old)} → {_format_value(name, new)} ({change:+.1f}%)")
+    return lines
+
+
+def format_perf(profile):
+    """Render a profile as human-readable lines"""
+    summary = summarize_perf(profile)
+    lines = [f"📊 Performance profile for {profile.get('url')}"]
+    for name, value in summary.items():
+        lines.append(f"   {name}: {_format_value(name, value)}")
+    return lines
+
+
+def _format_value(name, value):
+    if value is None:
+        return "n/a"
+    if name.endswith("Size"):
+        return f"{value / 1048576:.2f} MB"
+    if name.endswith("Duration"):
+        return f"{value * 1000:.1f} ms"
+    if name in ("lcp", "fcp", "ttfb", "domContentLoaded", "load", "longTaskTime", "longestTask"):
+        return f"{value:.0f} ms"
+    if name == "cls":
+        return f"{value:.3f}"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class TraceRecorder:
+    """Chrome trace capture over a CDP session, streamed straight to disk"""
+
+    def __init__(self, session):
+        self.session = session
+        self.active = False
+
+    def start(self, categories=None):
+        self.session.send("Tracing.start", {
+            "categories": categories or DEFAULT_TRACE_CATEGORIES,
+            "transferMode": "ReturnAsStream",
+            "streamFormat": "json",
+            "streamCompression": "gzip",
+        })
+        self.active = True
+
+    def stop(self, filename, timeout=60):
+        """End tracing and write the gzip-compressed trace; returns bytes written"""
+        if not self.active:
+            return 0
+        self.active = False
+        complete = self.session.wait_for(
+            "Tracing.tracingComplete",
+            timeout=timeout,
+            trigger=lambda: self.session.send("Tracing.end"),
+        )
+        handle = complete.get("stream")
+        if not handle:
+            return 0
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(filename, "wb") as f:
+            return self.session.read_stream(handle, f)
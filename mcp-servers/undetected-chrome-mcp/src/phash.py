@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+Perceptual hashing (dHash) for screenshots and other image artifacts.
+
+Images are reduced to a 9x8 grayscale thumbnail with Pillow; the gradient
+comparison, bit packing and all Hamming-distance work is vectorized with
+NumPy so thousands of hashes can be compared at once.
+
+Usage:
+    python3 phash.py cluster /tmp/screenshots --threshold 6
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+
+HASH_SIZE = 8
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp")
+
+
+def _require():
+    try:
+        import numpy
+        from PIL import Image
+    except ImportError:
+        raise ImportError("Perceptual hashing needs numpy and Pillow: pip3 install --break-system-packages numpy pillow")
+    return numpy, Image
+
+
+def missing():
+    """Why perceptual hashing is unavailable, or None if it can run"""
+    try:
+        _require()
+    except ImportError as e:
+        return str(e)
+    return None
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """64-bit difference hash of an image given as bytes, a path or a PIL image"""
+    np, Image = _require()
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    elif isinstance(image, str):
+        image = Image.open(image)
+    # draft() lets JPEG decode at reduced scale, which is most of the cost
+    image.draft("L", (hash_size * 16, hash_size * 16))
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+def distances(target, hashes):
+    """Hamming distance from one hash to every hash in a sequence, vectorized"""
+    np, _ = _require()
+    array = np.asarray(hashes, dtype=np.uint64)
+    if not array.size:
+        return np.zeros(0, dtype=np.uint8)
+    xor = array ^ np.uint64(target)
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def nearest(target, hashes):
+    """(index, distance) of the closest hash, or (None, None) when empty"""
+    if not len(hashes):
+        return None, None
+    dist = distances(target, hashes)
+    index = int(dist.argmin())
+    return index, int(dist[index])
+
+
+def hash_files(paths, workers=None):
+    """Hash many files in parallel; unreadable files map to None"""
+    from concurrent.futures import ProcessPoolExecutor
+
+    paths = list(paths)
+    if len(paths) < 64:
+        return dict(zip(paths, map(_safe_dhash, paths)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(_safe_dhash, paths, chunksize=32)))
+
+
+def _safe_dhash(path):
+    try:
+        return dhash(path)
+    except Exception:
+        return None
+
+
+def cluster(hashes, threshold=6):
+    """Greedy leader clustering; returns lists of indices, leader first"""
+    np, _ = _require()
+    array = np.asarray(hashes, dtype=np.uint64)
+    unassigned = np.ones(len(array), dtype=bool)
+    clusters = []
+    for leader in range(len(array)):
+        if not unassigned[leader]:
+            continue
+        candidates = np.flatnonzero(unassigned)
+        close = candidates[distances(int(array[leader]), array[candidates]) <= threshold]
+        unassigned[close] = False
+        members = [leader] + [int(i) for i in close if i != leader]
+        clusters.append(members)
+    return clusters
+
+
+def cluster_directory(directory, threshold=6, workers=None):
+    """Hash every image under a directory and group near-duplicates"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(IMAGE_EXTENSIONS))
+    hashed = {path: h for path, h in hash_files(paths, workers).items() if h is not None}
+    names = list(hashed)
+    groups = cluster([hashed[name] for name in names], threshold)
+    return [
+        {"representative": names[group[0]], "hash": f"{hashed[names[group[0]]]:016x}", "members": [names[i] for i in group]}
+        for group in groups
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perceptual-hash tools for screenshot artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    hash_cmd = sub.add_parser("hash", help="Print the dHash of each file")
+    hash_cmd.add_argument("files", nargs="+")
+    cluster_cmd = sub.add_parser("cluster", help="Group near-duplicate images in a directory")
+    cluster_cmd.add_argument("directory")
+    cluster_cmd.add_argument("--threshold", type=int, default=6, help="Maximum Hamming distance within a cluster")
+    cluster_cmd.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "hash":
+        for path, value in hash_files(args.files).items():
+            print(f"{value:016x}  {path}" if value is not None else f"{'?' * 16}  {path}")
+        return
+
+    clusters = cluster_directory(args.directory, args.threshold, args.workers)
+    total = sum(len(c["members"]) for c in clusters)
+    json.dump(clusters, sys.stdout, indent=2)
+    print(f"\n{total} images, {len(clusters)} visually distinct", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+Two-stage scrape pipeline: the browser only navigates and serializes the
+DOM, while a process pool parses the HTML and applies declarative rules.
+
+The stages are joined by a bounded queue, so the browser moves on to the
+next URL as soon as it has handed off the markup and only blocks when the
+parsers fall behind. A page the pool cannot take (a worker died and broke
+it, say) gets an error result like a failed fetch, and the dispatcher keeps
+draining the queue so the browser stage never blocks on it.
+
+Rules map field names to selectors:
+    {"title": "h1", "links": {"selector": "a", "attribute": "href", "all": true}}
+With an "item" selector, fields are evaluated inside each matching element:
+    {"item": "[data-qa=vehicle-card]", "fields": {"title": "h3", "url": {"selector": "a", "attribute": "href"}}}
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dom_snapshot import from_html
+
+SERIALIZE_SCRIPT = "return document.documentElement.outerHTML"
+
+
+def _field_spec(spec):
+    if isinstance(spec, str):
+        return {"selector": spec}
+    return spec
+
+
+def _read_field(dom, scope, spec):
+    spec = _field_spec(spec)
+    matches = dom.select(spec["selector"], within=scope)
+    if spec.get("contains"):
+        matches = dom.contains(matches, spec["contains"])
+    values = [dom.read(n, spec.get("attribute")) for n in matches]
+    if spec.get("all"):
+        return values
+    return values[0] if values else None
+
+
+def apply_rules(dom, rules):
+    """Evaluate declarative extraction rules against a DomSnapshot"""
+    if "item" in rules:
+        fields = rules.get("fields", {})
+        items = []
+        for node in dom.select(rules["item"]):
+            items.append({name: _read_field(dom, node, spec) for name, spec in fields.items()})
+        return items
+    return {name: _read_field(dom, None, spec) for name, spec in rules.items()}
+
+
+def parse_and_extract(url, markup, rules):
+    """Process-pool entry point: parse one page and apply rules to it"""
+    start = time.perf_counter()
+    try:
+        dom = from_html(markup, url=url)
+        data = apply_rules(dom, rules)
+        return {"url": url, "data": data, "parse_ms": (time.perf_counter() - start) * 1000, "bytes": len(markup)}
+    except Exception as e:
+        return {"url": url, "error": str(e), "parse_ms": (time.perf_counter() - start) * 1000}
+
+
+class Pipeline:
+    """Browser stage in the calling thread, extraction stage in a process pool"""
+
+    def __init__(self, workers=None, queue_size=8):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.queue_size = queue_size
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def run(self, fetch, urls, rules, on_result=None):
+        """Run fetch(url) -> html for each URL while parsing overlaps in the pool
+
+        on_result(index, result) is called as each page finishes, in completion
+        order and possibly from another thread. Returns (results in URL order,
+        stats dict).
+        """
+        handoff = queue.Queue(maxsize=self.queue_size)
+        futures = {}
+        in_flight = threading.BoundedSemaphore(self.workers * 2)
+        stats = {"pages": len(urls), "browser_seconds": 0.0, "blocked_seconds": 0.0, "fetch_errors": 0}
+
+        def dispatch():
+            while True:
+                item = handoff.get()
+                if item is None:
+                    return
+                index, url, markup = item
+                in_flight.acquire()
+                try:
+                    future = self.pool.submit(parse_and_extract, url, markup, rules)
+                except Exception as e:
+                    in_flight.release()
+                    self._discard_broken_pool(e)
+                    future = Future()
+                    future.set_exception(e)
+                else:
+                    future.add_done_callback(lambda _: in_flight.release())
+                futures[index] = future
+                if on_result:
+                    future.add_done_callback(lambda f, index=index, url=url: on_result(index, self._outcome(url, f)))
+
+        dispatcher = threading.Thread(target=dispatch, name="pipeline-dispatch", daemon=True)
+        dispatcher.start()
+        started = time.perf_counter()
+        errors = {}
+        try:
+            for index, url in enumerate(urls):
+                fetch_start = time.perf_counter()
+                try:
+                    markup = fetch(url)
+                except Exception as e:
+                    stats["fetch_errors"] += 1
+                    errors[index] = {"url": url, "error": f"fetch failed: {e}"}
+                    if on_result:
+                        on_result(index, errors[index])
+                    continue
+                finally:
+                    stats["browser_seconds"] += time.perf_counter() - fetch_start
+                put_start = time.perf_counter()
+                handoff.put((index, url, markup))
+                stats["blocked_seconds"] += time.perf_counter() - put_start
+        finally:
+            handoff.put(None)
+            dispatcher.join()
+
+        results = []
+        for index in range(len(urls)):
+            if index in errors:
+                results.append(errors[index])
+            else:
+                results.append(self._outcome(urls[index], futures[index]))
+        stats["wall_seconds"] = time.perf_counter() - started
+        stats["parse_seconds"] = sum(r.get("parse_ms", 0) for r in results) / 1000
+        stats["browser_utilization"] = stats["browser_seconds"] / stats["wall_seconds"] if stats["wall_seconds"] else 0
+        return results, stats
+
+    def _outcome(self, url, future):
+        """The future's result, or an error result if parsing never ran"""
+        try:
+            return future.result()
+        except Exception as e:
+            self._discard_broken_pool(e)
+            return {"url": url, "error": f"parse failed: {type(e).__name__}: {e}"}
+
+    def _discard_broken_pool(self, error):
+        # A broken pool refuses all further work; the next page gets a fresh one
+        if isinstance(error, BrokenProcessPool) and self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
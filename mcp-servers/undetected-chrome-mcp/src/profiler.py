@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""
+On-demand sampling profiler for the server process.
+
+A daemon thread snapshots every other thread's stack via
+sys._current_frames() at a fixed interval and aggregates identical stacks.
+Nothing is hooked while the profiler is stopped, so leaving it off costs
+nothing. Output is either collapsed stacks (flamegraph.pl, speedscope,
+inferno) or a native speedscope JSON document.
+"""
+
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    """Wall-clock stack sampler built on sys._current_frames()"""
+
+    def __init__(self, interval=0.005, max_depth=128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        """Begin sampling; resets any previously collected data"""
+        if self.running:
+            return False
+        if interval:
+            self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop sampling and keep the collected stacks for export"""
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.stopped_at = time.time()
+        return True
+
+    def _run(self):
+        own_id = threading.get_ident()
+        code_labels = {}
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    label = code_labels.get(code)
+                    if label is None:
+                        label = code_labels[code] = (code.co_name, code.co_filename, code.co_firstlineno)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[(names.get(thread_id, str(thread_id)), tuple(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Render aggregated stacks in collapsed ("folded") format"""
+        lines = []
+        for (thread_name, stack), count in self.stacks.most_common():
+            frames = [thread_name] + [_frame_name(frame) for frame in stack]
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self):
+        """Render aggregated stacks as a speedscope sampled profile per thread"""
+        frame_index = {}
+        frames = []
+        profiles = {}
+        for (thread_name, stack), count in self.stacks.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({"name": name, "file": filename, "line": line})
+                indices.append(frame_index[frame])
+            profile = profiles.setdefault(thread_name, {
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": 0,
+                "samples": [],
+                "weights": [],
+            })
+            weight = count * self.interval
+            profile["samples"].append(indices)
+            profile["weights"].append(weight)
+            profile["endValue"] += weight
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+            "name": f"undetected-chrome-mcp pid {os.getpid()}",
+            "exporter": "undetected-chrome-mcp sampling profiler",
+        }
+
+    def write(self, filename, fmt="collapsed"):
+        """Write the profile to disk and return the path"""
+        with open(filename, "w") as f:
+            if fmt == "speedscope":
+                json.dump(self.speedscope(), f)
+            else:
+                f.write(self.collapsed())
+        return filename
+
+    def top(self, limit=10):
+        """Return (frame, self-sample count) pairs for the hottest leaf frames"""
+        leaves = collections.Counter()
+        for (_, stack), count in self.stacks.items():
+            if stack:
+                leaves[_frame_name(stack[-1])] += count
+        return leaves.most_common(limit)
+
+
+def _frame_name(frame):
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+"""
+MCP progress reporting. A tools/call whose params carry
+_meta.progressToken gets notifications/progress messages as work
+completes; each may carry a partial result chunk in the same content
+format as the final tool result, so clients can start consuming early.
+Without a token every report is a no-op.
+"""
+
+import threading
+
+
+class Progress:
+    """Progress reporter bound to one tools/call"""
+
+    def __init__(self, token=None, notify=None):
+        self.token = token
+        self.notify = notify
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return self.token is not None and self.notify is not None
+
+    def __call__(self, progress=None, total=None, message=None, text=None):
+        """Send one notification; progress defaults to a running count of reports"""
+        if not self:
+            return
+        with self._lock:
+            self.count += 1
+            params = {"progressToken": self.token, "progress": progress if progress is not None else self.count}
+            if total is not None:
+                params["total"] = total
+            if message:
+                params["message"] = message
+            if text is not None:
+                params["content"] = [{"type": "text", "text": text}]
+            self.notify({"jsonrpc": "2.0", "method": "notifications/progress", "params": params})
+
+    @classmethod
+    def for_request(cls, params, notify):
+        token = (params.get("_meta") or {}).get("progressToken")
+        return cls(token, notify)
+
+
+NO_PROGRESS = Progress()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+"""
+Screencast ring buffer built on CDP Page.startScreencast.
+
+Chrome pushes JPEG frames as the page repaints and waits for an ack
+before sending the next one, so delaying acks is how the frame rate is
+capped. Only the last max_frames frames are kept in memory.
+"""
+
+import base64
+import bisect
+import collections
+import os
+import threading
+import time
+
+
+class Screencast:
+    """Bounded in-memory buffer of screencast frames for one tab"""
+
+    def __init__(self, session, max_frames=100, fps=2):
+        self.session = session
+        self.fps = fps
+        self.frames = collections.deque(maxlen=max_frames)
+        self.sequence = 0
+        self.evicted = 0
+        self.active = False
+        self._lock = threading.Lock()
+        self._ack = threading.Condition()
+        self._pending_ack = None
+        self._last_ack = 0.0
+        self._ack_thread = None
+
+    def start(self, quality=60, max_width=1280, max_height=720):
+        self.session.on("Page.screencastFrame", self._on_frame)
+        self.active = True
+        self._ack_thread = threading.Thread(target=self._ack_loop, name="screencast-ack", daemon=True)
+        self._ack_thread.start()
+        self.session.send("Page.startScreencast", {
+            "format": "jpeg",
+            "quality": quality,
+            "maxWidth": max_width,
+            "maxHeight": max_height,
+        })
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        with self._ack:
+            self._ack.notify_all()
+        try:
+            self.session.send("Page.stopScreencast")
+        except Exception:
+            pass
+        self.session.off("Page.screencastFrame", self._on_frame)
+        if self._ack_thread:
+            self._ack_thread.join(timeout=2)
+            self._ack_thread = None
+
+    def _on_frame(self, params):
+        metadata = params.get("metadata", {})
+        frame = {
+            "index": self.sequence,
+            "timestamp": metadata.get("timestamp") or time.time(),
+            "data": base64.b64decode(params.get("data", "")),
+            "width": metadata.get("deviceWidth"),
+            "height": metadata.get("deviceHeight"),
+            "scroll_y": metadata.get("scrollOffsetY"),
+        }
+        with self._lock:
+            if len(self.frames) == self.frames.maxlen:
+                self.evicted += 1
+            self.frames.append(frame)
+            self.sequence += 1
+        with self._ack:
+            self._pending_ack = params.get("sessionId")
+            self._ack.notify()
+
+    def _ack_loop(self):
+        # Acks run here rather than on the CDP reader thread so throttling
+        # never stalls delivery of other events.
+        while True:
+            with self._ack:
+                while self.active and self._pending_ack is None:
+                    self._ack.wait()
+                if not self.active:
+                    return
+                session_id = self._pending_ack
+                self._pending_ack = None
+            delay = self._last_ack + 1.0 / max(self.fps, 0.01) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if not self.active:
+                return
+            try:
+                self.session.send_nowait("Page.screencastFrameAck", {"sessionId": session_id})
+            except Exception:
+                return
+            self._last_ack = time.monotonic()
+
+    def snapshot(self):
+        """Copy of the buffered frames, oldest first"""
+        with self._lock:
+            return list(self.frames)
+
+    def get(self, index=None, at=None):
+        """Frame by sequence index (negative counts from the newest) or the frame nearest to a timestamp"""
+        frames = self.snapshot()
+        if not frames:
+            return None
+        if at is not None:
+            timestamps = [f["timestamp"] for f in frames]
+            pos = bisect.bisect_left(timestamps, at)
+            candidates = frames[max(pos - 1, 0):pos + 1]
+            return min(candidates, key=lambda f: abs(f["timestamp"] - at))
+        if index is None or index < 0:
+            offset = -1 if index is None else index
+            return frames[offset] if -offset <= len(frames) else None
+        first = frames[0]["index"]
+        if first <= index < first + len(frames):
+            return frames[index - first]
+        return None
+
+    def dump(self, directory, since=None):
+        """Write buffered frames as a numbered JPEG sequence; returns the paths"""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for frame in self.snapshot():
+            if since is not None and frame["timestamp"] < since:
+                continue
+            path = os.path.join(directory, f"frame_{frame['index']:06d}.jpg")
+            with open(path, "wb") as f:
+                f.write(frame["data"])
+            paths.append(path)
+        return paths
+
+    def stats(self):
+        frames = self.snapshot()
+        return {
+            "active": self.active,
+            "buffered": len(frames),
+            "capacity": self.frames.maxlen,
+            "received": self.sequence,
+            "evicted": self.evicted,
+            "bytes": sum(len(f["data"]) for f in frames),
+            "first_index": frames[0]["index"] if frames else None,
+            "last_index": frames[-1]["index"] if frames else None,
+            "span": frames[-1]["timestamp"] - frames[0]["timestamp"] if frames else 0,
+        }
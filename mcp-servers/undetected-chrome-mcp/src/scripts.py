@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+Pinned scripts: large extraction scripts are defined once per document as
+named functions and invoked later by name, so each call sends a short stub
+instead of the full source and Chrome does not re-parse it.
+
+Definitions are installed with Page.addScriptToEvaluateOnNewDocument, which
+re-applies them on every navigation, and evaluated once in the current
+document. A tab the registry has not seen yet, or a document that predates
+the registration, is detected on the first call (the stub reports the
+function missing) and fixed by installing there and retrying, so there is
+no per-call bookkeeping round trip. The namespace is a random,
+non-enumerable window property.
+
+PinnedScripts wraps a driver: execute_script/execute_async_script call
+the scripts it was given to pin by name, and run every other script
+plainly, so module helpers that take a driver accept it unchanged. Only
+those scripts are pinned: each stays registered in every tab it was used
+in for the tab's lifetime, so pinning whatever large script came along
+(a one-off evaluate from an agent, say) would grow that set without bound.
+"""
+
+import hashlib
+import json
+import secrets
+
+CALL_STUB = """
+const ns = window[%s], fn = ns && ns[arguments[0]];
+if (!fn) return {__ucMissing: true};
+return fn.apply(null, arguments[1]);
+"""
+
+ASYNC_CALL_STUB = """
+const done = arguments[arguments.length - 1];
+const ns = window[%s], fn = ns && ns[arguments[0]];
+if (!fn) return done({__ucMissing: true});
+fn.apply(null, arguments[1].concat([done]));
+"""
+
+DEFINE_TEMPLATE = """(function() {
+    if (!Object.prototype.hasOwnProperty.call(window, %(ns)s))
+        Object.defineProperty(window, %(ns)s, {value: {}, enumerable: false});
+    window[%(ns)s][%(name)s] = function() {
+%(body)s
+    };
+})();"""
+
+
+def _missing(result):
+    return isinstance(result, dict) and result.get("__ucMissing") is True
+
+
+class PinnedScripts:
+    """Named-script registry bound to one driver"""
+
+    def __init__(self, driver, pinned=()):
+        self.driver = driver
+        self.namespace = "__" + secrets.token_hex(6)
+        self.sources = {}
+        self.pinned = {}
+        self.installed = {}
+        self.calls = 0
+        self.installs = 0
+        self.bytes_saved = 0
+        quoted = json.dumps(self.namespace)
+        self._stub = CALL_STUB % quoted
+        self._async_stub = ASYNC_CALL_STUB % quoted
+        for source in pinned:
+            self.pin(source)
+
+    def __getattr__(self, name):
+        # Everything not overridden here goes straight to the driver
+        return getattr(self.driver, name)
+
+    def register(self, name, source):
+        """Add a script body (written as for execute_script) under a name"""
+        self.sources[name] = source
+        return name
+
+    def _definition(self, name):
+        return DEFINE_TEMPLATE % {"ns": json.dumps(self.namespace), "name": json.dumps(name), "body": self.sources[name]}
+
+    def install(self, name):
+        """Define the script in the current tab, now and for every future document"""
+        handle = self.driver.current_window_handle
+        done = self.installed.setdefault(handle, set())
+        definition = self._definition(name)
+        if name not in done:
+            self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": definition})
+            done.add(name)
+        self.driver.execute_script(definition)
+        self.installs += 1
+
+    def call(self, name, *args):
+        self.calls += 1
+        result = self.driver.execute_script(self._stub, name, list(args))
+        if _missing(result):
+            self.install(name)
+            result = self.driver.execute_script(self._stub, name, list(args))
+        else:
+            self.bytes_saved += len(self.sources[name]) - len(self._stub)
+        return result
+
+    def call_async(self, name, *args):
+        self.calls += 1
+        result = self.driver.execute_async_script(self._async_stub, name, list(args))
+        if _missing(result):
+            self.install(name)
+            result = self.driver.execute_async_script(self._async_stub, name, list(args))
+        else:
+            self.bytes_saved += len(self.sources[name]) - len(self._async_stub)
+        return result
+
+    def pin(self, source):
+        """Call source by name whenever it is passed to execute_script/execute_async_script"""
+        name = "s" + hashlib.sha1(source.encode()).hexdigest()[:12]
+        self.pinned[source] = self.register(name, source)
+        return name
+
+    def execute_script(self, source, *args):
+        name = self.pinned.get(source)
+        if name is None:
+            return self.driver.execute_script(source, *args)
+        return self.call(name, *args)
+
+    def execute_async_script(self, source, *args):
+        name = self.pinned.get(source)
+        if name is None:
+            return self.driver.execute_async_script(source, *args)
+        return self.call_async(name, *args)
+
+    def stats(self):
+        return {
+            "scripts": len(self.sources),
+            "tabs": len(self.installed),
+            "calls": self.calls,
+            "installs": self.installs,
+            "bytes_saved": self.bytes_saved,
+        }
@@ -12,127 +12,90 @@ import time
 import random
 import tempfile
 import base64
+import os
+import signal
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from artifact_store import TEXT_MIME_TYPES, ArtifactStore
+from capture import capture as capture_page
+from cdp_session import CDPSession
+from content import CONTENT_SCRIPT, get_content
+from dom_snapshot import DomSnapshot
+from dom_watch import POLL_SCRIPT, WATCH_SCRIPT, format_change, poll_watch, start_watch, stop_watch
+from harvest import HARVEST_SCRIPT, harvest
+from hybrid import HybridFetcher
+from jobs import DEFAULT_JOBS_FILE, JobScheduler
+import launch_profiles
+from pipeline import SERIALIZE_SCRIPT, Pipeline
+from perf import READ_VITALS_SCRIPT, TraceRecorder, collect_page_perf, compare_profiles, format_perf, install_perf_observers
+from profiler import SamplingProfiler
+from progress import NO_PROGRESS, Progress
+from screencast import Screencast
+from site_archive import ArchiveRecorder, ArchiveReplayer, SiteArchive
+from scripts import PinnedScripts
+import traffic
+
+# Large scripts the tools run over and over; pinned per tab and called by name
+PINNED_SCRIPTS = (CONTENT_SCRIPT, WATCH_SCRIPT, POLL_SCRIPT, HARVEST_SCRIPT, READ_VITALS_SCRIPT)
+
+DEFAULT_SITE_ARCHIVE = os.environ.get("UNDETECTED_SITE_ARCHIVE", "/tmp/undetected_site_archive.zip")
+
+_output_lock = threading.Lock()
 
 def send_response(response):
     """Send JSON-RPC response"""
-    print(json.dumps(response), flush=True)
+    if traffic.recorder:
+        traffic.recorder.record("out", response)
+    with _output_lock:
+        print(json.dumps(response), flush=True)
 
 class UndetectedChromeMCP:
     def __init__(self):
         self.driver = None
         self.wait = None
+        self.perf_history = {}
+        self.profiler = SamplingProfiler()
+        self.screencast_session = None
+        self.artifacts = None
+        self.dom_snapshot = None
+        self.watch_state = None
+        self.pipeline = None
+        self.progress = NO_PROGRESS
+        self.jobs = None
+        # The daemon's one scheduler, used instead of self.jobs and never stopped by this client
+        self.shared_jobs = None
+        self._scripts = None
+        self.site_archive = None
+        self.fetcher = None
+        self.launch_profile = launch_profiles.default_profile()
+        # Held for the length of each tool call; background jobs only run when it is free
+        self.lock = threading.RLock()
+    
+    @property
+    def scripts(self):
+        """The driver with large scripts pinned per document and called by name"""
+        if self._scripts is None or self._scripts.driver is not self.driver:
+            self._scripts = PinnedScripts(self.driver, PINNED_SCRIPTS)
+        return self._scripts
     
     def init_driver(self, headless=True, user_agent=None):
-        """Initialize undetected Chrome with Chromium binary"""
+        """Initialize undetected Chrome with the configured launch profile"""
         if self.driver:
             return self.driver
             
         try:
-            import undetected_chromedriver as uc
             from selenium.webdriver.support.ui import WebDriverWait
             
-            options = uc.ChromeOptions()
-            
-            # Set Chromium binary path for Linux container
-            options.binary_location = '/usr/bin/chromium'
-            
-            # Container-friendly arguments
-            container_args = [
-                '--no-sandbox',
-                '--disable-setuid-sandbox', 
-                '--disable-dev-shm-usage',
-                '--disable-gpu',
-                '--disable-web-security',
-                '--disable-features=VizDisplayCompositor',
-                '--disable-extensions',
-                '--disable-plugins',
-                '--disable-default-apps',
-                '--disable-sync',
-                '--disable-translate',
-                '--hide-scrollbars',
-                '--metrics-recording-only',
-                '--mute-audio',
-                '--no-first-run',
-                '--safebrowsing-disable-auto-update',
-                '--disable-client-side-phishing-detection',
-                '--disable-component-update',
-                '--disable-domain-reliability',
-                '--disable-features=TranslateUI,BlinkGenPropertyTrees',
-                '--disable-ipc-flooding-protection',
-                '--disable-renderer-backgrounding',
-                '--disable-background-networking',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-breakpad',
-                '--disable-component-extensions-with-background-pages',
-                '--disable-blink-features=AutomationControlled'
-            ]
-            
-            if headless:
-                container_args.append('--headless=new')
-                
-            for arg in container_args:
-                options.add_argument(arg)
-            
-            # Set realistic user agent
-            if user_agent:
-                options.add_argument(f'--user-agent={user_agent}')
-            else:
-                options.add_argument('--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            
-            # Anti-detection preferences (simplified for compatibility)
-            prefs = {
-                "profile.default_content_setting_values.notifications": 2,
-                "profile.default_content_settings.popups": 0,
-            }
-            options.add_experimental_option("prefs", prefs)
-            
-            # Copy chromedriver to writable location for patching
-            import shutil
-            import os
-            if not os.path.exists('/tmp/chromedriver'):
-                shutil.copy('/usr/bin/chromedriver', '/tmp/chromedriver')
-                os.chmod('/tmp/chromedriver', 0o755)
-            
-            # Initialize driver with container-specific settings
-            self.driver = uc.Chrome(
-                options=options,
-                version_main=None,
-                driver_executable_path='/tmp/chromedriver'
-            )
+            self.driver = launch_profiles.launch(self.launch_profile, headless, user_agent)
             
             self.wait = WebDriverWait(self.driver, 10)
             
-            # Execute stealth JavaScript
-            self.driver.execute_script("""
-                // Override webdriver property
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined,
-                });
-                
-                // Override chrome runtime
-                window.chrome = {
-                    runtime: {},
-                };
-                
-                // Override permissions API
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Notification.permission }) :
-                        originalQuery(parameters)
-                );
-                
-                // Override plugins
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5],
-                });
-                
-                // Override languages
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['en-US', 'en'],
-                });
-            """)
+            # Web-vitals observers must be in place before the first navigation
+            try:
+                install_perf_observers(self.driver)
+            except Exception:
+                pass
             
             return self.driver
             
@@ -147,11 +110,13 @@ class UndetectedChromeMCP:
             user_agent = args.get("user_agent")
             delay = args.get("delay", 2)
             wait_for = args.get("wait_for")
+            perf = args.get("perf", False)
             
             driver = self.init_driver(headless, user_agent)
             
-            # Human-like delay
-            time.sleep(random.uniform(1, delay))
+            # Human-like delay; 0 skips it
+            if delay > 0:
+                time.sleep(random.uniform(min(1, delay), delay))
             
             driver.get(url)
             
@@ -167,11 +132,15 @@ class UndetectedChromeMCP:
             title = driver.title
             current_url = driver.current_url
             
+            text = f"✅ Successfully navigated to: {current_url}\\nPage title: {title}"
+            if perf:
+                text += "\\n" + "\\n".join(self._profile_page())
+            
             return {
                 "content": [
                     {
                         "type": "text",
-                        "text": f"✅ Successfully navigated to: {current_url}\\nPage title: {title}"
+                        "text": text
                     }
                 ]
             }
@@ -186,6 +155,78 @@ class UndetectedChromeMCP:
                 ]
             }
     
+    def _profile_page(self):
+        """Collect a perf profile for the current page and compare it with the last one"""
+        profile = collect_page_perf(self.scripts)
+        parts = urlsplit(profile["url"])
+        key = f"{parts.scheme}://{parts.netloc}{parts.path}"
+        lines = format_perf(profile)
+        trend = compare_profiles(self.perf_history.get(key), profile)
+        if trend:
+            lines.append("📈 Change since last profile:")
+            lines.extend(f"   {line}" for line in trend)
+        self.perf_history[key] = profile
+        return lines
+
+    def perf(self, args):
+        """Collect page performance metrics, optionally with a Chrome trace"""
+        url = args.get("url")
+        trace = args.get("trace", False)
+        trace_file = args.get("trace_file")
+        trace_duration = args.get("trace_duration", 3)
+
+        if not url and not self.driver:
+            return {"content": [{"type": "text", "text": "❌ Browser not initialized. Navigate to a page first."}]}
+
+        session = None
+        try:
+            if url:
+                self.init_driver(args.get("headless", True))
+
+            lines = []
+            if trace:
+                stored = not trace_file
+                if stored:
+                    trace_file = tempfile.mkstemp(prefix="undetected_trace_", suffix=".json.gz")[1]
+                session = CDPSession.for_driver(self.driver)
+                recorder = TraceRecorder(session)
+                recorder.start(args.get("trace_categories"))
+                if url:
+                    self.driver.get(url)
+                else:
+                    time.sleep(trace_duration)
+                written = recorder.stop(trace_file)
+                if stored:
+                    entry = artifact_store(self).put_file(url or self.driver.current_url, trace_file, "json.gz", kind="trace")
+                    trace_file = f"{entry['path']}\n🔗 Resource: {entry['uri']}"
+                lines.append(f"🧵 Trace saved to: {trace_file} ({written} bytes, gzip)")
+            elif url:
+                self.driver.get(url)
+
+            lines = self._profile_page() + lines
+
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": "\n".join(lines)
+                    }
+                ]
+            }
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Performance capture failed: {str(e)}"
+                    }
+                ]
+            }
+        finally:
+            if session:
+                session.close()
+
     def extract_data(self, args):
         """Extract data from elements"""
         if not self.driver:
@@ -206,13 +247,20 @@ class UndetectedChromeMCP:
                 element = self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
                 elements = [element]
             
+            # Each read is a round trip; with a progress token, stream values in batches
             results = []
+            batch_start = 0
             for element in elements:
                 if attribute:
                     value = element.get_attribute(attribute)
                 else:
                     value = element.text
                 results.append(value)
+                if self.progress and len(results) - batch_start >= 25:
+                    self.progress(len(results), len(elements), text="\n".join(str(r) for r in results[batch_start:]))
+                    batch_start = len(results)
+            if self.progress and batch_start < len(results):
+                self.progress(len(results), len(elements), text="\n".join(str(r) for r in results[batch_start:]))
             
             return {
                 "content": [
@@ -233,6 +281,475 @@ class UndetectedChromeMCP:
                 ]
             }
     
+    def get_content(self, args):
+        """Readable page content as compact markdown, in one round trip"""
+        try:
+            url = args.get("url")
+            if url:
+                self.init_driver(args.get("headless", True)).get(url)
+            elif not self.driver:
+                return {"content": [{"type": "text", "text": "❌ Browser not initialized. Navigate to a page first."}]}
+
+            result = get_content(
+                self.scripts,
+                selector=args.get("selector"),
+                max_chars=args.get("max_chars", 20000),
+                chunk=args.get("chunk", 0),
+                chunk_size=args.get("chunk_size"),
+                links=args.get("include_links", True),
+                images=args.get("include_images", False),
+            )
+            if result.get("error"):
+                return {"content": [{"type": "text", "text": f"❌ {result['error']}"}]}
+
+            header = f"# {result['title']}\n<{result['url']}>"
+            if result["chunks"] > 1 or result["truncated"]:
+                header += (
+                    f"\n_Chunk {result['chunk'] + 1}/{result['chunks']} of {result['totalChars']} chars"
+                    f"{', truncated to max_chars' if result['truncated'] else ''}_"
+                )
+
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": header + "\n\n" + result["text"]
+                    }
+                ]
+            }
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Content extraction failed: {str(e)}"
+                    }
+                ]
+            }
+
+    def snapshot(self, args):
+        """Capture the DOM once, then answer selector queries from a local index"""
+        action = args.get("action", "query")
+
+        try:
+            if action == "capture" or (action == "query" and self.dom_snapshot is None):
+                if not self.driver:
+                    return {"content": [{"type": "text", "text": "❌ Browser not initialized. Navigate to a page first."}]}
+                start = time.perf_counter()
+                raw = self.driver.execute_cdp_cmd("DOMSnapshot.captureSnapshot", {"computedStyles": []})
+                self.dom_snapshot = DomSnapshot(raw, url=self.driver.current_url)
+                elapsed = (time.perf_counter() - start) * 1000
+                if action == "capture":
+                    text = (f"✅ Captured DOM snapshot of {self.dom_snapshot.url}: "
+                            f"{self.dom_snapshot.element_count} elements indexed in {elapsed:.0f} ms")
+                    if args.get("save"):
+                        entry = artifact_store(self).put(self.dom_snapshot.url, json.dumps(raw).encode(), "json", kind="snapshot")
+                        text += f"\n🔗 Resource: {entry['uri']} ({entry['size']} bytes)"
+                    return {
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": text
+                            }
+                        ]
+                    }
+
+            if action == "clear":
+                self.dom_snapshot = None
+                return {"content": [{"type": "text", "text": "✅ DOM snapshot cleared"}]}
+
+            queries = args.get("queries") or [args]
+            dom = self.dom_snapshot
+            start = time.perf_counter()
+            sections = []
+            for query in queries:
+                selector = query["selector"]
+                attribute = query.get("attribute")
+                limit = query.get("limit")
+                node_ids = dom.select(selector)
+                if query.get("contains"):
+                    node_ids = dom.contains(node_ids, query["contains"])
+                if not query.get("multiple", True):
+                    node_ids = node_ids[:1]
+                if limit:
+                    node_ids = node_ids[:limit]
+                max_length = query.get("max_length")
+                values = []
+                for node_id in node_ids:
+                    value = dom.read(node_id, attribute)
+                    if max_length and value:
+                        value = value[:max_length]
+                    values.append(str(value))
+                sections.append(f"✅ {selector}: {len(values)} elements\n" + "\n".join(values))
+                self.progress(len(sections), len(queries), text=sections[-1])
+            elapsed = (time.perf_counter() - start) * 1e6
+
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": "\n\n".join(sections) + f"\n\n⚡ Answered locally in {elapsed:.0f} µs from snapshot of {dom.url}"
+                    }
+                ]
+            }
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Snapshot query failed: {str(e)}"
+                    }
+                ]
+            }
+
+    def watch(self, args):
+        """DOM change feed: buffer mutations in the page, return only what changed since the cursor"""
+        action = args.get("action", "poll")
+
+        try:
+            if not self.driver:
+                return {"content": [{"type": "text", "text": "❌ Browser not initialized. Navigate to a page first."}]}
+
+            if action == "start":
+                options = {
+                    "roots": args.get("roots"),
+                    "item": args.get("item"),
+                    "key_attribute": args.get("key_attribute"),
+                    "attributes": args.get("attributes"),
+                    "max_text": args.get("max_text", 200),
+                    "max_buffer": args.get("max_buffer", 5000),
+                }
+                result = start_watch(self.scripts, **options)
+                self.watch_state = {"options": options, "cursor": 0, "id": result["id"]}
+                if not result["roots"]:
+                    return {"content": [{"type": "text", "text": f"❌ No watch roots matched: {args.get('roots')}"}]}
+                items = f", {result['items']} items" if result["items"] is not None else ""
+                return {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": f"✅ Watching {result['roots']} roots{items} on {self.driver.current_url}"
+                        }
+                    ]
+                }
+
+            if action == "stop":
+                stopped = stop_watch(self.scripts)
+                self.watch_state = None
+                return {"content": [{"type": "text", "text": "✅ Watch stopped" if stopped else "✅ No watch was active"}]}
+
+            if not self.watch_state:
+                return {"content": [{"type": "text", "text": "❌ No watch active. Start one with action=start."}]}
+
+            cursor = args.get("cursor", self.watch_state["cursor"])
+            result = poll_watch(self.scripts, cursor, args.get("limit", 500))
+            if result.get("lost") or result["id"] != self.watch_state["id"]:
+                # The document was replaced: re-install on the new page and start over
+                restarted = start_watch(self.scripts, **self.watch_state["options"])
+                self.watch_state.update(cursor=0, id=restarted["id"])
+                return {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": f"⚠️ Page changed since the last poll; watch re-installed on {self.driver.current_url}. "
+                                    f"Re-extract once, then poll from cursor 0"
+                        }
+                    ]
+                }
+
+            self.watch_state["cursor"] = result["cursor"]
+            changes = result["changes"]
+            lines = [f"✅ {len(changes)} changes, cursor {result['cursor']}"]
+            if result["overflow"]:
+                lines.append(f"⚠️ {result['overflow']} older changes dropped from the page buffer; re-extract to resync")
+            lines.extend(format_change(change) for change in changes)
+            if result["more"]:
+                lines.append(f"… more changes pending, poll again from cursor {result['cursor']}")
+
+            return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Watch failed: {str(e)}"
+                    }
+                ]
+            }
+
+    def fetch(self, args):
+        """HTTP-first fetch with the browser's cookies, falling back to the browser when blocked"""
+        try:
+            if self.fetcher is None:
+                self.fetcher = HybridFetcher()
+            if args.get("action") == "stats":
+                return {"content": [{"type": "text", "text": self.fetcher.format_stats()}]}
+
+            mode = args.get("mode", "auto")
+            if mode == "browser":
+                self.init_driver(args.get("headless", True))
+            result = self.fetcher.fetch(
+                args["url"],
+                driver=self.driver,
+                launch=lambda: self.init_driver(args.get("headless", True)),
+                method=args.get("method", "GET"),
+                headers=args.get("headers"),
+                body=args.get("body"),
+                mode=mode,
+                expect_selector=args.get("expect_selector"),
+                expect_text=args.get("expect_text"),
+            )
+
+            icon = "⚡" if result["path"] == "http" else "🌐"
+            header = f"{icon} {result['path'].upper()} {result.get('status') or ''} {result['url']} in {result['elapsed_ms']:.0f} ms".replace("  ", " ")
+            if result.get("fallback_reason"):
+                header += f"\n↩️ Browser fallback: {result['fallback_reason']}"
+            if result.get("blocked"):
+                header += f"\n⚠️ Response looks blocked: {result['blocked']}"
+
+            output = args.get("output")
+            if output:
+                with open(output, "w") as f:
+                    f.write(result["text"])
+                text = header + f"\n💾 {len(result['text'])} chars written to: {output}"
+            else:
+                max_chars = args.get("max_chars", 20000)
+                body = result["text"]
+                if len(body) > max_chars:
+                    body = body[:max_chars] + f"\n… truncated, {len(result['text'])} chars total"
+                text = header + f"\n📄 {result.get('content_type') or 'unknown type'}\n" + body
+
+            return {"content": [{"type": "text", "text": text}]}
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Fetch failed: {str(e)}"
+                    }
+                ]
+            }
+
+    def harvest(self, args):
+        """Scroll an infinite list in steps, extracting only new items each time"""
+        try:
+            url = args.get("url")
+            if url:
+                self.init_driver(args.get("headless", True)).get(url)
+            elif not self.driver:
+                return {"content": [{"type": "text", "text": "❌ Browser not initialized. Navigate to a page first."}]}
+
+            max_items = args.get("max_items", 1000)
+
+            def on_batch(new, info):
+                if new:
+                    self.progress(info["total"], max_items, message=f"Step {info['step']}: {len(new)} new items",
+                                  text="\n".join(json.dumps(item) for item in new))
+
+            items, stats = harvest(
+                self.scripts,
+                args["item"],
+                fields=args.get("fields"),
+                key_selector=args.get("key_selector", 'a[href*="/vehicle/"]'),
+                key_attribute=args.get("key_attribute", "href"),
+                key_pattern=args.get("key_pattern", r"/vehicle/(\d+)"),
+                container=args.get("container"),
+                step=args.get("step"),
+                quiet=args.get("quiet_ms", 400),
+                max_wait=args.get("max_wait_ms", 3000),
+                max_items=max_items,
+                max_steps=args.get("max_steps", 100),
+                max_seconds=args.get("max_seconds", 120),
+                idle_steps=args.get("idle_steps", 3),
+                on_batch=on_batch,
+            )
+            summary = (
+                f"✅ Harvested {stats['items']} items in {stats['steps']} scroll steps ({stats['seconds']:.1f}s), "
+                f"stopped: {stats['stop_reason']}\n"
+                f"📜 {stats['in_dom']} items in the DOM at the end, page height {stats['height']}px"
+            )
+
+            output = args.get("output")
+            if output:
+                with open(output, "w") as f:
+                    for item in items:
+                        f.write(json.dumps(item) + "\n")
+                text = summary + f"\n💾 Items written to: {output}"
+            else:
+                text = summary + "\n" + json.dumps(items, indent=2)
+
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": text
+                    }
+                ]
+            }
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Harvest failed: {str(e)}"
+                    }
+                ]
+            }
+
+    def manage_jobs(self, args):
+        """Scheduled refresh jobs: register saved searches, read their cached results instantly"""
+        action = args.get("action", "list")
+
+        try:
+            jobs = self.shared_jobs or self.jobs
+            if jobs is None:
+                jobs = self.jobs = JobScheduler(self)
+
+            if action == "add":
+                job = jobs.add(
+                    args["name"],
+                    args["url"],
+                    args["rules"],
+                    args.get("interval", 300),
+                    wait_for=args.get("wait_for"),
+                    settle=args.get("settle", 0),
+                )
+                kept = " (cached result kept)" if job["result"] else ""
+                return {"content": [{"type": "text", "text": f"✅ Job '{args['name']}' refreshes {args['url']} every {job['interval']}s{kept}"}]}
+
+            if action == "remove":
+                removed = jobs.remove(args["name"])
+                return {"content": [{"type": "text", "text": f"✅ Job '{args['name']}' removed" if removed else f"❌ No job named '{args['name']}'"}]}
+
+            if action == "list":
+                saved = jobs.snapshot()
+                if not saved:
+                    return {"content": [{"type": "text", "text": "📋 No refresh jobs registered"}]}
+                lines = [f"📋 {len(saved)} refresh jobs:"]
+                now = time.time()
+                for name, job in sorted(saved.items()):
+                    result = job.get("result")
+                    age = f"fetched {now - result['fetched_at']:.0f}s ago" if result else "never fetched"
+                    error = f", last error: {job['last_error']}" if job.get("last_error") else ""
+                    lines.append(
+                        f"   {name}: {job['url']} every {job['interval']}s, {age}, "
+                        f"next in {max(0, job['next_run'] - now):.0f}s, {job['runs']} runs{error}"
+                    )
+                return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+
+            name = args["name"]
+            cached = jobs.read(name)
+            if cached is None:
+                return {"content": [{"type": "text", "text": f"❌ No job named '{name}'"}]}
+
+            max_age = args.get("max_age")
+            if action == "run" or (max_age is not None and (cached["age"] is None or cached["age"] > max_age)):
+                with self.lock:
+                    jobs.refresh(name, self.init_driver(True))
+                cached = jobs.read(name)
+            elif cached["result"] is None:
+                return {"content": [{"type": "text", "text": f"⏳ Job '{name}' has no result yet; it is queued for the next idle moment"}]}
+
+            age, interval = cached["age"], cached["job"]["interval"]
+            freshness = "⚠️ stale" if cached["stale"] else "fresh"
+            header = f"🕒 {name}: fetched {age:.0f}s ago (interval {interval}s, {freshness}), scrape took {cached['result']['duration']:.1f}s"
+            if cached["job"].get("last_error"):
+                header += f"\n⚠️ Last refresh failed: {cached['job']['last_error']}"
+
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": header + "\n" + json.dumps(cached["result"]["data"], indent=2)
+                    }
+                ]
+            }
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Job {action} failed: {str(e)}"
+                    }
+                ]
+            }
+
+    def run_pipeline(self, args):
+        """Batch scrape: browser navigates and serializes, a process pool parses and extracts"""
+        try:
+            urls = args["urls"]
+            rules = args["rules"]
+            wait_for = args.get("wait_for")
+            settle = args.get("settle", 0)
+            output = args.get("output")
+
+            driver = self.init_driver(args.get("headless", True))
+            workers = args.get("workers")
+            if self.pipeline is None or (workers and workers != self.pipeline.workers):
+                if self.pipeline:
+                    self.pipeline.close()
+                self.pipeline = Pipeline(workers=workers)
+            self.pipeline.queue_size = args.get("queue_size", 8)
+
+            def fetch(url):
+                driver.get(url)
+                if wait_for:
+                    from selenium.webdriver.common.by import By
+                    from selenium.webdriver.support import expected_conditions as EC
+                    try:
+                        self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, wait_for)))
+                    except Exception:
+                        pass
+                if settle:
+                    time.sleep(settle)
+                return driver.execute_script(SERIALIZE_SCRIPT)
+
+            def on_result(index, result):
+                # Pages finish out of order; progress counts completions
+                self.progress(total=len(urls), message=f"Page {index + 1}: {result['url']}", text=json.dumps(result))
+
+            results, stats = self.pipeline.run(fetch, urls, rules, on_result=on_result if self.progress else None)
+            failed = sum(1 for r in results if "error" in r)
+            summary = (
+                f"✅ Pipeline processed {len(results)} pages ({failed} failed) in {stats['wall_seconds']:.1f}s\n"
+                f"🌐 Browser busy {stats['browser_utilization'] * 100:.0f}% of wall time, "
+                f"blocked on parsers {stats['blocked_seconds']:.1f}s\n"
+                f"🧩 Parsing {stats['parse_seconds']:.1f}s CPU across {self.pipeline.workers} workers"
+            )
+
+            if output:
+                with open(output, "w") as f:
+                    for result in results:
+                        f.write(json.dumps(result) + "\n")
+                text = summary + f"\n💾 Results written to: {output}"
+            else:
+                text = summary + "\n" + json.dumps(results, indent=2)
+
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": text
+                    }
+                ]
+            }
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Pipeline failed: {str(e)}"
+                    }
+                ]
+            }
+
     def screenshot(self, args):
         """Take screenshot"""
         if not self.driver:
@@ -242,10 +759,7 @@ class UndetectedChromeMCP:
             filename = args.get("filename")
             full_page = args.get("full_page", False)
             element_selector = args.get("element_selector")
-            
-            if not filename:
-                timestamp = str(int(time.time()))
-                filename = f"/tmp/undetected_screenshot_{timestamp}.png"
+            dedupe = args.get("dedupe", False)
             
             if element_selector:
                 from selenium.webdriver.common.by import By
@@ -256,8 +770,21 @@ class UndetectedChromeMCP:
                     # Get full page height
                     total_height = self.driver.execute_script("return document.body.scrollHeight")
                     self.driver.set_window_size(1920, total_height)
+                    self.progress(1, 2, message=f"Resized viewport to 1920x{total_height}")
                 
                 screenshot_data = self.driver.get_screenshot_as_base64()
+                self.progress(2, 2, message=f"Captured {len(screenshot_data) * 3 // 4} bytes")
+            
+            if dedupe or not filename:
+                # Stored content-addressed and served as a resource; with dedupe, near-duplicates are not rewritten
+                key = args.get("key") or self.driver.current_url
+                entry = artifact_store(self).put(key, base64.b64decode(screenshot_data), near_duplicates=dedupe)
+                if entry["written"]:
+                    text = f"✅ Screenshot saved to: {entry['path']}"
+                else:
+                    text = f"♻️ Screenshot matches a stored capture (distance {entry['distance']}), not rewritten: {entry['path']}"
+                text += f"\n🔗 Resource: {entry['uri']} ({entry['size']} bytes)"
+                return {"content": [{"type": "text", "text": text}]}
             
             # Save screenshot
             with open(filename, "wb") as f:
@@ -282,8 +809,257 @@ class UndetectedChromeMCP:
                 ]
             }
     
+    def capture(self, args):
+        """Stream the page as HTML, MHTML or PDF to a compressed file without loading it into memory"""
+        fmt = args.get("format", "html")
+        compress = args.get("compress", True)
+        session = None
+        filename = target = None
+
+        try:
+            if args.get("url"):
+                self.init_driver(args.get("headless", True)).get(args["url"])
+            elif not self.driver:
+                return {"content": [{"type": "text", "text": "❌ Browser not initialized. Navigate to a page first."}]}
+
+            filename = args.get("filename")
+            extension = fmt + (".gz" if compress else "")
+            target = filename or tempfile.mkstemp(prefix="undetected_capture_", suffix="." + extension)[1]
+            pdf_options = {"landscape": args["landscape"]} if "landscape" in args else {}
+            session = CDPSession.for_driver(self.driver)
+            stats = capture_page(session, target, fmt, compress, **pdf_options)
+
+            lines = [f"✅ Captured {fmt.upper()} of {self.driver.current_url}: {stats['bytes'] / 1024:.0f} KB "
+                     f"-> {stats['written'] / 1024:.0f} KB on disk in {stats['seconds'] * 1000:.0f} ms"]
+            if filename:
+                lines.append(f"📁 Saved to: {filename}")
+            else:
+                entry = artifact_store(self).put_file(self.driver.current_url, target, extension, kind=fmt)
+                lines.append(f"📁 Saved to: {entry['path']}")
+                lines.append(f"🔗 Resource: {entry['uri']}")
+            return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+
+        except Exception as e:
+            if not filename and target and os.path.exists(target):
+                os.unlink(target)
+            return {"content": [{"type": "text", "text": f"❌ Capture failed: {str(e)}"}]}
+        finally:
+            if session:
+                session.close()
+
+    def profile(self, args):
+        """Start, stop or inspect the in-process sampling profiler"""
+        action = args.get("action", "status")
+        fmt = args.get("format", "collapsed")
+        profiler = self.profiler
+
+        if action == "start":
+            interval_ms = args.get("interval_ms", 5)
+            if not profiler.start(interval_ms / 1000.0):
+                return {"content": [{"type": "text", "text": "⚠️ Profiler already running"}]}
+            text = f"✅ Sampling profiler started ({interval_ms} ms interval)"
+
+        elif action == "stop":
+            if not profiler.stop():
+                return {"content": [{"type": "text", "text": "⚠️ Profiler is not running"}]}
+            extension = "speedscope.json" if fmt == "speedscope" else "folded"
+            filename = args.get("filename") or f"/tmp/undetected_profile_{os.getpid()}_{int(time.time())}.{extension}"
+            profiler.write(filename, fmt)
+            lines = [
+                f"✅ Profile saved to: {filename}",
+                f"📊 {profiler.samples} samples over {profiler.stopped_at - profiler.started_at:.1f}s, "
+                f"{len(profiler.stacks)} unique stacks",
+                "🔥 Hottest frames:",
+            ]
+            lines.extend(f"   {count:>6}  {frame}" for frame, count in profiler.top(args.get("top", 10)))
+            text = "\n".join(lines)
+
+        else:
+            if profiler.running:
+                text = f"🔧 Profiler running: {profiler.samples} samples so far"
+            else:
+                text = "🔧 Profiler stopped (zero overhead)"
+
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": text
+                }
+            ]
+        }
+
+    def toggle_profiler(self, signum=None, frame=None):
+        """SIGUSR2 handler: start the profiler, or stop it and dump collapsed stacks"""
+        if self.profiler.running:
+            self.profiler.stop()
+            filename = f"/tmp/undetected_profile_{os.getpid()}_{int(time.time())}.folded"
+            self.profiler.write(filename)
+            print(f"Profile written to {filename}", file=sys.stderr, flush=True)
+        else:
+            self.profiler.start()
+            print("Sampling profiler started", file=sys.stderr, flush=True)
+
+    def screencast(self, args):
+        """Run a low-overhead screencast into a ring buffer and read frames from it"""
+        action = args.get("action", "status")
+        cast = self.screencast_session
+
+        try:
+            if action == "start":
+                if not self.driver:
+                    return {"content": [{"type": "text", "text": "❌ Browser not initialized. Navigate to a page first."}]}
+                self._stop_screencast()
+                session = CDPSession.for_driver(self.driver)
+                cast = Screencast(session, max_frames=args.get("max_frames", 100), fps=args.get("fps", 2))
+                cast.start(
+                    quality=args.get("quality", 60),
+                    max_width=args.get("max_width", 1280),
+                    max_height=args.get("max_height", 720),
+                )
+                self.screencast_session = cast
+                text = f"✅ Screencast started ({cast.fps} fps, last {cast.frames.maxlen} frames kept)"
+
+            elif cast is None:
+                return {"content": [{"type": "text", "text": "❌ No screencast running. Start one with action=start."}]}
+
+            elif action == "stop":
+                stats = cast.stats()
+                self._stop_screencast()
+                text = f"✅ Screencast stopped after {stats['received']} frames"
+
+            elif action == "get":
+                frame = cast.get(index=args.get("index"), at=args.get("at"))
+                if frame is None:
+                    return {"content": [{"type": "text", "text": "❌ No buffered frame matches that index/time"}]}
+                if args.get("inline"):
+                    return {
+                        "content": [
+                            {"type": "text", "text": f"🎞️ Frame {frame['index']} at {frame['timestamp']:.3f}"},
+                            {"type": "image", "data": base64.b64encode(frame["data"]).decode(), "mimeType": "image/jpeg"}
+                        ]
+                    }
+                filename = args.get("filename")
+                if filename:
+                    with open(filename, "wb") as f:
+                        f.write(frame["data"])
+                    text = f"✅ Frame {frame['index']} ({frame['timestamp']:.3f}) saved to: {filename}"
+                else:
+                    entry = artifact_store(self).put(self.driver.current_url, frame["data"], "jpg", kind="frame", near_duplicates=False)
+                    text = f"✅ Frame {frame['index']} ({frame['timestamp']:.3f}) saved to: {entry['path']}\n🔗 Resource: {entry['uri']}"
+
+            elif action == "dump":
+                directory = args.get("directory") or f"/tmp/undetected_screencast_{int(time.time())}"
+                paths = cast.dump(directory, since=args.get("since"))
+                text = f"✅ Wrote {len(paths)} frames to: {directory}"
+
+            else:
+                stats = cast.stats()
+                text = "\n".join([
+                    f"🎞️ Screencast {'active' if stats['active'] else 'stopped'}",
+                    f"   Buffered: {stats['buffered']}/{stats['capacity']} frames ({stats['bytes'] / 1024:.0f} KB)",
+                    f"   Received: {stats['received']} (evicted {stats['evicted']})",
+                    f"   Index range: {stats['first_index']}..{stats['last_index']} over {stats['span']:.1f}s",
+                ])
+
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": text
+                    }
+                ]
+            }
+
+        except Exception as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"❌ Screencast failed: {str(e)}"
+                    }
+                ]
+            }
+
+    def archive(self, args):
+        """Record the tab's traffic into a site archive, or replay one with no network"""
+        action = args.get("action", "status")
+        path = args.get("path", DEFAULT_SITE_ARCHIVE)
+
+        try:
+            if action in ("record", "replay"):
+                driver = self.init_driver(args.get("headless", True))
+                self._stop_archive()
+                session = CDPSession.for_driver(driver)
+                try:
+                    if action == "record":
+                        worker = ArchiveRecorder(session, SiteArchive(path, "w"))
+                    else:
+                        worker = ArchiveReplayer(session, SiteArchive(path), allow_network=args.get("allow_network", False))
+                    worker.start()
+                except Exception:
+                    session.close()
+                    raise
+                self.site_archive = worker
+                if action == "record":
+                    text = f"⏺️ Recording all responses of this tab into {path}; navigate, then action=stop"
+                else:
+                    stats = worker.archive.stats()
+                    text = (f"▶️ Replaying {stats['requests']} recorded requests from {path}"
+                            f" ({'unknown requests go to the network' if worker.allow_network else 'network blocked'})")
+                if args.get("url"):
+                    driver.get(args["url"])
+                    text += f"\n🌐 Loaded {driver.current_url}"
+
+            elif self.site_archive is None:
+                return {"content": [{"type": "text", "text": "❌ No recording or replay running. Start one with action=record or action=replay."}]}
+
+            else:
+                worker = self.site_archive
+                if action == "stop":
+                    self._stop_archive()
+                stats = worker.stats()
+                if isinstance(worker, ArchiveRecorder):
+                    text = (f"⏺️ {'Recorded' if action == 'stop' else 'Recording'} {stats['responses']} responses for {stats['requests']} requests, "
+                            f"{stats['bodies']} unique bodies ({stats['body_bytes'] / 1024:.0f} KB), {stats['errors']} errors into {worker.archive.path}")
+                else:
+                    text = (f"▶️ {'Replayed' if action == 'stop' else 'Replaying'} {stats['hits']} requests from {worker.archive.path} "
+                            f"({stats['bytes_served'] / 1024:.0f} KB), {stats['misses']} not in the archive")
+                    if stats["first_misses"]:
+                        text += "\n   Missing: " + "\n   Missing: ".join(stats["first_misses"][:5])
+
+            return {"content": [{"type": "text", "text": text}]}
+
+        except Exception as e:
+            return {"content": [{"type": "text", "text": f"❌ Archive {action} failed: {str(e)}"}]}
+
+    def _stop_archive(self):
+        worker = self.site_archive
+        self.site_archive = None
+        if worker:
+            try:
+                worker.stop()
+            finally:
+                worker.session.close()
+
+    def _stop_screencast(self):
+        cast = self.screencast_session
+        self.screencast_session = None
+        if cast:
+            cast.stop()
+            cast.session.close()
+
     def close_browser(self):
         """Close browser session"""
+        self._stop_screencast()
+        self._stop_archive()
+        if self.jobs:
+            # Otherwise the next due job would start Chrome again
+            self.jobs.stop()
+            self.jobs = None
+        if self.pipeline:
+            self.pipeline.close()
+            self.pipeline = None
         if self.driver:
             try:
                 self.driver.quit()
@@ -291,6 +1067,7 @@ class UndetectedChromeMCP:
                 pass
             self.driver = None
             self.wait = None
+            self.watch_state = None
         
         return {
             "content": [
@@ -308,11 +1085,17 @@ class UndetectedChromeMCP:
             
             status_lines = [
                 f"✅ Undetected Chrome v{uc.__version__} available",
-                "✅ Chromium binary found at /usr/bin/chromium",
-                "✅ Container-optimized configuration active",
+                f"✅ Chromium binary: {launch_profiles.CHROMIUM_BINARY}",
+                f"✅ Launch profile: {self.launch_profile} ({launch_profiles.get_profile(self.launch_profile)['description']})",
                 "🛡️ Maximum stealth features enabled",
                 f"🔧 Driver status: {'Active' if self.driver else 'Not initialized'}"
             ]
+            if self._scripts is not None and self._scripts.calls:
+                pinned = self._scripts.stats()
+                status_lines.append(
+                    f"📌 Pinned scripts: {pinned['scripts']} in {pinned['tabs']} tabs, {pinned['calls']} calls, "
+                    f"{pinned['installs']} installs, {pinned['bytes_saved'] / 1024:.0f} KB not re-sent"
+                )
             
             return {
                 "content": [
@@ -332,145 +1115,564 @@ class UndetectedChromeMCP:
                 ]
             }
 
-def main():
-    """Main MCP server loop"""
-    mcp = UndetectedChromeMCP()
+TOOLS = [
+    {
+        "name": "undetected_navigate",
+        "description": "Navigate to URL with maximum stealth using Chromium",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "url": {"type": "string", "description": "URL to navigate to"},
+                "headless": {"type": "boolean", "default": True, "description": "Run in headless mode"},
+                "user_agent": {"type": "string", "description": "Custom user agent"},
+                "delay": {"type": "number", "default": 2, "description": "Random delay before action in seconds (0 for none)"},
+                "wait_for": {"type": "string", "description": "CSS selector to wait for"},
+                "perf": {"type": "boolean", "default": False, "description": "Attach a performance profile to the result"}
+            },
+            "required": ["url"]
+        }
+    },
+    {
+        "name": "undetected_extract",
+        "description": "Extract data from elements with anti-detection",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "selector": {"type": "string", "description": "CSS selector"},
+                "attribute": {"type": "string", "description": "Attribute to extract"},
+                "multiple": {"type": "boolean", "default": True, "description": "Extract multiple elements"},
+                "wait_time": {"type": "number", "default": 10, "description": "Wait time for elements"}
+            },
+            "required": ["selector"]
+        }
+    },
+    {
+        "name": "undetected_get_content",
+        "description": "Readable main content of the page as compact markdown (boilerplate pruned, tables and lists kept), with a character budget and chunking",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "url": {"type": "string", "description": "Navigate here first (otherwise use the current page)"},
+                "selector": {"type": "string", "description": "Content root selector (auto-detected if omitted)"},
+                "max_chars": {"type": "number", "default": 20000, "description": "Character budget for the whole extraction"},
+                "chunk_size": {"type": "number", "description": "Split output into chunks of about this size (default: max_chars)"},
+                "chunk": {"type": "number", "default": 0, "description": "Zero-based chunk to return"},
+                "include_links": {"type": "boolean", "default": True, "description": "Render links as [text](url)"},
+                "include_images": {"type": "boolean", "default": False, "description": "Render images as ![alt](src)"},
+                "headless": {"type": "boolean", "default": True, "description": "Run in headless mode"}
+            }
+        }
+    },
+    {
+        "name": "undetected_snapshot",
+        "description": "Capture the DOM once via DOMSnapshot and answer CSS-subset queries, text and attribute reads locally without browser round trips",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["capture", "query", "clear"], "default": "query", "description": "capture refreshes the snapshot; query captures only if none exists"},
+                "save": {"type": "boolean", "default": False, "description": "On capture, also keep the raw snapshot JSON as a resource"},
+                "selector": {"type": "string", "description": "CSS selector (tag, #id, .class, [attr op value], descendant and > combinators, lists)"},
+                "attribute": {"type": "string", "description": "Attribute to read; outerHTML and textContent are also supported"},
+                "contains": {"type": "string", "description": "Keep only elements whose text contains this (case-insensitive)"},
+                "multiple": {"type": "boolean", "default": True, "description": "Return all matches"},
+                "limit": {"type": "number", "description": "Maximum matches to return"},
+                "max_length": {"type": "number", "description": "Truncate each value to this many characters"},
+                "queries": {
+                    "type": "array",
+                    "description": "Several queries answered from the same snapshot",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "selector": {"type": "string"},
+                            "attribute": {"type": "string"},
+                            "contains": {"type": "string"},
+                            "multiple": {"type": "boolean"},
+                            "limit": {"type": "number"},
+                            "max_length": {"type": "number"}
+                        },
+                        "required": ["selector"]
+                    }
+                }
+            }
+        }
+    },
+    {
+        "name": "undetected_watch",
+        "description": "DOM change feed for cheap repeated polling: a MutationObserver buffers changes in the page and each poll returns only what changed since the cursor",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["start", "poll", "stop"], "default": "poll", "description": "Watch action"},
+                "roots": {"type": "array", "items": {"type": "string"}, "description": "Selectors of subtrees to observe (default: body)"},
+                "item": {"type": "string", "description": "Report changes per matching element, e.g. one listing card"},
+                "key_attribute": {"type": "string", "description": "Attribute identifying an item, e.g. href or data-id"},
+                "attributes": {"type": "array", "items": {"type": "string"}, "description": "Attribute names to watch as well"},
+                "max_text": {"type": "number", "default": 200, "description": "Truncate reported text to this many characters"},
+                "max_buffer": {"type": "number", "default": 5000, "description": "Changes buffered in the page between polls"},
+                "cursor": {"type": "number", "description": "Return changes after this cursor (default: the last poll's cursor)"},
+                "limit": {"type": "number", "default": 500, "description": "Maximum changes per poll"}
+            }
+        }
+    },
+    {
+        "name": "undetected_fetch",
+        "description": "Fetch a page or JSON endpoint over plain pooled HTTP with the browser's cookies and identity, falling back to the browser only on a challenge or JS-only content; paths taken are tracked per URL pattern",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["fetch", "stats"], "default": "fetch", "description": "stats shows which path works per URL pattern"},
+                "url": {"type": "string", "description": "URL to fetch"},
+                "method": {"type": "string", "default": "GET", "description": "HTTP method"},
+                "headers": {"type": "object", "description": "Extra request headers"},
+                "body": {"description": "Request body; objects are sent as JSON"},
+                "mode": {"type": "string", "enum": ["auto", "http", "browser"], "default": "auto", "description": "auto tries HTTP first and falls back to the browser"},
+                "expect_selector": {"type": "string", "description": "Treat HTML without this selector as needing the browser"},
+                "expect_text": {"type": "string", "description": "Treat responses without this text as needing the browser"},
+                "max_chars": {"type": "number", "default": 20000, "description": "Truncate the returned body"},
+                "output": {"type": "string", "description": "Write the body here instead of returning it"},
+                "headless": {"type": "boolean", "default": True, "description": "Run in headless mode if the browser is needed"}
+            }
+        }
+    },
+    {
+        "name": "undetected_harvest",
+        "description": "Harvest an infinite-scroll or virtualized list: scroll in steps, extract only items added or changed since the last step, dedupe by key, stop when the page stops growing or a budget is reached",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "url": {"type": "string", "description": "Navigate here first (otherwise use the current page)"},
+                "item": {"type": "string", "description": "CSS selector of one list item, e.g. a vehicle card"},
+                "fields": {"type": "object", "description": "Field -> selector within the item (or {selector, attribute}); default is the item text"},
+                "key_selector": {"type": "string", "default": "a[href*=\"/vehicle/\"]", "description": "Element inside the item holding its key"},
+                "key_attribute": {"type": "string", "default": "href", "description": "Attribute holding the key (text content if empty)"},
+                "key_pattern": {"type": "string", "default": "/vehicle/(\\d+)", "description": "Regex applied to the key; the first group is used"},
+                "container": {"type": "string", "description": "Scrollable container selector (default: the page)"},
+                "step": {"type": "number", "description": "Pixels per scroll step (default: 90% of the viewport)"},
+                "quiet_ms": {"type": "number", "default": 400, "description": "DOM quiet time that ends a step's wait"},
+                "max_wait_ms": {"type": "number", "default": 3000, "description": "Longest wait for new content per step"},
+                "idle_steps": {"type": "number", "default": 3, "description": "Stop after this many steps at the end without new items or page growth"},
+                "max_items": {"type": "number", "default": 1000, "description": "Item budget"},
+                "max_steps": {"type": "number", "default": 100, "description": "Scroll step budget"},
+                "max_seconds": {"type": "number", "default": 120, "description": "Time budget"},
+                "output": {"type": "string", "description": "Write items as NDJSON here instead of returning them"},
+                "headless": {"type": "boolean", "default": True, "description": "Run in headless mode"}
+            },
+            "required": ["item"]
+        }
+    },
+    {
+        "name": "undetected_jobs",
+        "description": "Scheduled refresh jobs: register a URL + extraction rules + interval, refreshed in the background while the browser is idle; read returns the cached result instantly with its age",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["add", "remove", "list", "read", "run"], "default": "list", "description": "run refreshes now and returns the new result"},
+                "name": {"type": "string", "description": "Job name"},
+                "url": {"type": "string", "description": "Page to scrape (add)"},
+                "rules": {"type": "object", "description": "Extraction rules as for undetected_pipeline (add)"},
+                "interval": {"type": "number", "default": 300, "description": "Seconds between refreshes (add)"},
+                "wait_for": {"type": "string", "description": "CSS selector to wait for before extracting (add)"},
+                "settle": {"type": "number", "default": 0, "description": "Extra seconds to wait before extracting (add)"},
+                "max_age": {"type": "number", "description": "On read, refresh first if the cached result is older than this many seconds"}
+            }
+        }
+    },
+    {
+        "name": "undetected_pipeline",
+        "description": "Batch scrape URLs: the browser only navigates and serializes the DOM while a process pool parses HTML and applies declarative extraction rules",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "urls": {"type": "array", "items": {"type": "string"}, "description": "Pages to scrape in order"},
+                "rules": {"type": "object", "description": "Field -> selector (or {selector, attribute, contains, all}); use {item, fields} to extract one record per matching element"},
+                "wait_for": {"type": "string", "description": "CSS selector to wait for on each page"},
+                "settle": {"type": "number", "default": 0, "description": "Extra seconds to wait before serializing"},
+                "workers": {"type": "number", "description": "Parser processes (default: CPU count - 1)"},
+                "queue_size": {"type": "number", "default": 8, "description": "Pages buffered between browser and parsers"},
+                "output": {"type": "string", "description": "Write results as NDJSON here instead of returning them"},
+                "headless": {"type": "boolean", "default": True, "description": "Run in headless mode"}
+            },
+            "required": ["urls", "rules"]
+        }
+    },
+    {
+        "name": "undetected_screenshot",
+        "description": "Take screenshot with anti-detection",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "filename": {"type": "string", "description": "Save to this file instead of the artifact store (no resource URI)"},
+                "full_page": {"type": "boolean", "default": False, "description": "Full page screenshot"},
+                "element_selector": {"type": "string", "description": "Screenshot specific element"},
+                "dedupe": {"type": "boolean", "default": False, "description": "Skip near-duplicate captures of the same key in the artifact store (filename is ignored)"},
+                "key": {"type": "string", "description": "Dedupe key for comparing with earlier captures (defaults to the page URL)"}
+            }
+        }
+    },
+    {
+        "name": "undetected_perf",
+        "description": "Collect page performance metrics (CDP metrics, LCP, CLS, long tasks) and optionally a Chrome trace",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "url": {"type": "string", "description": "Navigate here first and profile the load"},
+                "headless": {"type": "boolean", "default": True, "description": "Run in headless mode"},
+                "trace": {"type": "boolean", "default": False, "description": "Record a Chrome trace"},
+                "trace_file": {"type": "string", "description": "Where to write the gzip trace (default: the artifact store, readable as a resource)"},
+                "trace_categories": {"type": "string", "description": "Comma-separated trace categories"},
+                "trace_duration": {"type": "number", "default": 3, "description": "Seconds to trace when no url is given"}
+            }
+        }
+    },
+    {
+        "name": "undetected_profile",
+        "description": "Sample the server's own Python stacks and export collapsed-stack or speedscope output",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["start", "stop", "status"], "default": "status", "description": "Profiler action"},
+                "interval_ms": {"type": "number", "default": 5, "description": "Sampling interval in milliseconds"},
+                "format": {"type": "string", "enum": ["collapsed", "speedscope"], "default": "collapsed", "description": "Output format on stop"},
+                "filename": {"type": "string", "description": "Where to write the profile on stop"},
+                "top": {"type": "number", "default": 10, "description": "Number of hottest frames to report"}
+            }
+        }
+    },
+    {
+        "name": "undetected_screencast",
+        "description": "Low-overhead screencast: keep the last N JPEG frames in memory and fetch or dump them on demand",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["start", "stop", "status", "get", "dump"], "default": "status", "description": "Screencast action"},
+                "fps": {"type": "number", "default": 2, "description": "Target frame rate (frame acks are throttled to this)"},
+                "max_frames": {"type": "number", "default": 100, "description": "Ring buffer size"},
+                "quality": {"type": "number", "default": 60, "description": "JPEG quality"},
+                "max_width": {"type": "number", "default": 1280, "description": "Maximum frame width"},
+                "max_height": {"type": "number", "default": 720, "description": "Maximum frame height"},
+                "index": {"type": "number", "description": "Frame index for get (negative counts back from the newest)"},
+                "at": {"type": "number", "description": "Unix timestamp for get; returns the nearest frame"},
+                "inline": {"type": "boolean", "default": False, "description": "Return the frame as image content instead of a file"},
+                "filename": {"type": "string", "description": "Save filename for get (default: the artifact store, readable as a resource)"},
+                "directory": {"type": "string", "description": "Output directory for dump"},
+                "since": {"type": "number", "description": "Only dump frames at or after this Unix timestamp"}
+            }
+        }
+    },
+    {
+        "name": "undetected_capture",
+        "description": "Stream the page as HTML, MHTML or PDF through CDP IO straight to a gzip file, with bounded memory regardless of page size",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "format": {"type": "string", "enum": ["html", "mhtml", "pdf"], "default": "html", "description": "Capture format"},
+                "url": {"type": "string", "description": "Navigate here first (otherwise capture the current page)"},
+                "filename": {"type": "string", "description": "Write here instead of the artifact store (no resource URI)"},
+                "compress": {"type": "boolean", "default": True, "description": "gzip the file as it is written"},
+                "landscape": {"type": "boolean", "description": "PDF page orientation"},
+                "headless": {"type": "boolean", "default": True, "description": "Run in headless mode"}
+            }
+        }
+    },
+    {
+        "name": "undetected_archive",
+        "description": "Record every response of the tab (headers and bodies) into a zip archive, or replay an archive offline through request interception",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "enum": ["record", "replay", "stop", "status"], "default": "status", "description": "Archive action"},
+                "path": {"type": "string", "default": "/tmp/undetected_site_archive.zip", "description": "Archive file (record overwrites it)"},
+                "url": {"type": "string", "description": "Navigate here once recording or replay has started"},
+                "allow_network": {"type": "boolean", "default": False, "description": "On replay, let requests missing from the archive reach the network"},
+                "headless": {"type": "boolean", "default": True, "description": "Run in headless mode"}
+            }
+        }
+    },
+    {
+        "name": "undetected_close",
+        "description": "Close the browser session",
+        "inputSchema": {"type": "object", "properties": {}}
+    },
+    {
+        "name": "undetected_status",
+        "description": "Check undetected Chrome driver status", 
+        "inputSchema": {"type": "object", "properties": {}}
+    }
+]
+
+TOOL_METHODS = {
+    "undetected_navigate": "navigate",
+    "undetected_extract": "extract_data",
+    "undetected_screenshot": "screenshot",
+    "undetected_get_content": "get_content",
+    "undetected_snapshot": "snapshot",
+    "undetected_watch": "watch",
+    "undetected_pipeline": "run_pipeline",
+    "undetected_harvest": "harvest",
+    "undetected_fetch": "fetch",
+    "undetected_perf": "perf",
+    "undetected_profile": "profile",
+    "undetected_screencast": "screencast",
+    "undetected_archive": "archive",
+    "undetected_capture": "capture",
+}
+
+RESOURCE_PAGE_SIZE = 100
+MAX_RESOURCE_READ = 16 * 1024 * 1024
+_artifacts = None
+
+def artifact_store(mcp=None):
+    """The server's artifact store, or a process-wide one for daemon/fleet front ends"""
+    global _artifacts
+    if mcp is not None:
+        if mcp.artifacts is None:
+            mcp.artifacts = ArtifactStore()
+        return mcp.artifacts
+    if _artifacts is None:
+        _artifacts = ArtifactStore()
+    return _artifacts
+
+def list_resources(store, cursor=None):
+    """resources/list result, newest first, paged by an offset cursor"""
+    start = int(cursor or 0)
+    items = store.resources()
+    page = items[start:start + RESOURCE_PAGE_SIZE]
+    result = {
+        "resources": [
+            {
+                "uri": meta["uri"],
+                "name": f"{meta['kind']}: {meta['key']}",
+                "description": f"{meta['kind']} of {meta['key']} captured {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(meta['created']))}",
+                "mimeType": meta["mime"],
+                "size": meta["size"],
+            }
+            for meta in page
+        ]
+    }
+    if start + RESOURCE_PAGE_SIZE < len(items):
+        result["nextCursor"] = str(start + RESOURCE_PAGE_SIZE)
+    return result
+
+def read_resource(store, uri, offset=None, length=None):
+    """resources/read result; ranges come from params or ?offset=&length= on the URI
+
+    Reads past MAX_RESOURCE_READ are cut into chunks, with the next chunk's
+    URI in _meta.
+    """
+    query = parse_qs(urlsplit(uri).query)
+    offset = int(offset if offset is not None else query.get("offset", [0])[0])
+    length = length if length is not None else query.get("length", [None])[0]
+    length = min(int(length), MAX_RESOURCE_READ) if length is not None else MAX_RESOURCE_READ
+    data, meta = store.read(uri, offset, length)
+    end = offset + len(data)
+    content = {"uri": uri, "mimeType": meta["mime"]}
+    if offset == 0 and end == meta["size"] and meta["mime"].startswith(TEXT_MIME_TYPES):
+        content["text"] = data.decode("utf-8", errors="replace")
+    else:
+        content["blob"] = base64.b64encode(data).decode()
+    return {
+        "contents": [content],
+        "_meta": {
+            "size": meta["size"],
+            "offset": offset,
+            "length": len(data),
+            "next": f"{meta['uri']}?offset={end}&length={length}" if end < meta["size"] else None,
+        },
+    }
+
+def call_tool(mcp, tool_name, args, progress=None):
+    """Dispatch a tools/call to the matching UndetectedChromeMCP method"""
+    if tool_name == "undetected_jobs":
+        # Cached reads must not wait behind a background refresh holding the browser
+        return mcp.manage_jobs(args)
+    if tool_name in TOOL_METHODS:
+        with mcp.lock:
+            mcp.progress = progress or NO_PROGRESS
+            try:
+                return getattr(mcp, TOOL_METHODS[tool_name])(args)
+            finally:
+                mcp.progress = NO_PROGRESS
+    elif tool_name == "undetected_close":
+        with mcp.lock:
+            return mcp.close_browser()
+    elif tool_name == "undetected_status":
+        return mcp.get_status()
+    return {"content": [{"type": "text", "text": f"❌ Unknown tool: {tool_name}"}]}
+
+def handle_request(mcp, request, tools=None, notify=send_response):
+    """Build the JSON-RPC response for one request; None for notifications
+
+    Progress notifications for a tools/call with a progressToken go to notify.
+    """
+    method = request.get("method")
+    params = request.get("params", {})
+    request_id = request.get("id")
     
+    if method == "initialize":
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {
+                    "tools": {},
+                    "resources": {}
+                },
+                "serverInfo": {
+                    "name": "undetected-chrome-mcp",
+                    "version": "1.0.0"
+                }
+            }
+        }
+        
+    elif method == "tools/list":
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "tools": tools if tools is not None else TOOLS
+            }
+        }
+        
+    elif method == "tools/call":
+        progress = Progress.for_request(params, notify)
+        result = call_tool(mcp, params.get("name"), params.get("arguments", {}), progress)
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": result
+        }
+        
+    elif method == "resources/list":
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": list_resources(artifact_store(mcp), params.get("cursor"))
+        }
+        
+    elif method == "resources/templates/list":
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "resourceTemplates": [
+                    {
+                        "uriTemplate": "artifact://{sha256}.{extension}{?offset,length}",
+                        "name": "Artifact byte range",
+                        "description": "A byte range of a stored artifact; full reads over 16 MB are chunked the same way"
+                    }
+                ]
+            }
+        }
+        
+    elif method == "resources/read":
+        uri = params.get("uri", "")
+        try:
+            result = read_resource(artifact_store(mcp), uri, params.get("offset"), params.get("length"))
+        except (KeyError, OSError):
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": -32002, "message": "Resource not found", "data": {"uri": uri}}
+            }
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": result
+        }
+        
+    elif request_id is None and method and method.startswith("notifications/"):
+        return None
+        
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": -32601, "message": f"Unknown method: {method}"}
+    }
+
+def error_response(request, e):
+    """JSON-RPC internal error for a request that raised"""
+    return {
+        "jsonrpc": "2.0",
+        "id": request.get("id") if isinstance(request, dict) else None,
+        "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
+    }
+
+def serve_stdio(mcp):
+    """Main MCP server loop over stdin/stdout"""
     try:
         for line in sys.stdin:
             line = line.strip()
             if not line:
                 continue
+            if traffic.recorder:
+                traffic.recorder.record("in", line)
                 
+            request = None
             try:
                 request = json.loads(line)
-                method = request.get("method")
-                params = request.get("params", {})
-                request_id = request.get("id")
-                
-                if method == "initialize":
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": {
-                            "protocolVersion": "2024-11-05",
-                            "capabilities": {
-                                "tools": {}
-                            },
-                            "serverInfo": {
-                                "name": "undetected-chrome-mcp",
-                                "version": "1.0.0"
-                            }
-                        }
-                    }
-                    
-                elif method == "tools/list":
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": {
-                            "tools": [
-                                {
-                                    "name": "undetected_navigate",
-                                    "description": "Navigate to URL with maximum stealth using Chromium",
-                                    "inputSchema": {
-                                        "type": "object",
-                                        "properties": {
-                                            "url": {"type": "string", "description": "URL to navigate to"},
-                                            "headless": {"type": "boolean", "default": True, "description": "Run in headless mode"},
-                                            "user_agent": {"type": "string", "description": "Custom user agent"},
-                                            "delay": {"type": "number", "default": 2, "description": "Random delay before action"},
-                                            "wait_for": {"type": "string", "description": "CSS selector to wait for"}
-                                        },
-                                        "required": ["url"]
-                                    }
-                                },
-                                {
-                                    "name": "undetected_extract",
-                                    "description": "Extract data from elements with anti-detection",
-                                    "inputSchema": {
-                                        "type": "object",
-                                        "properties": {
-                                            "selector": {"type": "string", "description": "CSS selector"},
-                                            "attribute": {"type": "string", "description": "Attribute to extract"},
-                                            "multiple": {"type": "boolean", "default": True, "description": "Extract multiple elements"},
-                                            "wait_time": {"type": "number", "default": 10, "description": "Wait time for elements"}
-                                        },
-                                        "required": ["selector"]
-                                    }
-                                },
-                                {
-                                    "name": "undetected_screenshot",
-                                    "description": "Take screenshot with anti-detection",
-                                    "inputSchema": {
-                                        "type": "object",
-                                        "properties": {
-                                            "filename": {"type": "string", "description": "Save filename"},
-                                            "full_page": {"type": "boolean", "default": False, "description": "Full page screenshot"},
-                                            "element_selector": {"type": "string", "description": "Screenshot specific element"}
-                                        }
-                                    }
-                                },
-                                {
-                                    "name": "undetected_close",
-                                    "description": "Close the browser session",
-                                    "inputSchema": {"type": "object", "properties": {}}
-                                },
-                                {
-                                    "name": "undetected_status",
-                                    "description": "Check undetected Chrome driver status", 
-                                    "inputSchema": {"type": "object", "properties": {}}
-                                }
-                            ]
-                        }
-                    }
-                    
-                elif method == "tools/call":
-                    tool_name = params.get("name")
-                    args = params.get("arguments", {})
-                    
-                    if tool_name == "undetected_navigate":
-                        result = mcp.navigate(args)
-                    elif tool_name == "undetected_extract": 
-                        result = mcp.extract_data(args)
-                    elif tool_name == "undetected_screenshot":
-                        result = mcp.screenshot(args)
-                    elif tool_name == "undetected_close":
-                        result = mcp.close_browser()
-                    elif tool_name == "undetected_status":
-                        result = mcp.get_status()
-                    else:
-                        result = {"content": [{"type": "text", "text": f"❌ Unknown tool: {tool_name}"}]}
-                    
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "result": result
-                    }
-                    
-                else:
-                    response = {
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "error": {"code": -32601, "message": f"Unknown method: {method}"}
-                    }
-                    
-                send_response(response)
+                response = handle_request(mcp, request)
+                if response is not None:
+                    send_response(response)
                 
             except json.JSONDecodeError:
                 continue
             except Exception as e:
-                error_response = {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id") if 'request' in locals() else None,
-                    "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
-                }
-                send_response(error_response)
+                send_response(error_response(request, e))
                 
     except KeyboardInterrupt:
         pass
     finally:
         mcp.close_browser()
 
+def main(argv=None):
+    """Entry point: stdio server by default, a fleet router/worker, or the shared daemon and its shim"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Undetected Chrome MCP server")
+    parser.add_argument("--worker", metavar="HOST:PORT", help="Run as a fleet worker listening on HOST:PORT")
+    parser.add_argument("--slots", type=int, default=4, help="Browser sessions a worker may hold")
+    parser.add_argument("--router", action="store_true", help="Run as a fleet router speaking MCP on stdio")
+    parser.add_argument("--workers", default="", help="Comma-separated HOST:PORT list of workers for --router")
+    parser.add_argument("--spawn-workers", type=int, default=0, help="Start this many local workers for --router")
+    parser.add_argument("--daemon", action="store_true", help="Run as a shared daemon serving MCP on a Unix socket")
+    parser.add_argument("--socket", default=None, help="Unix socket path for --daemon/--connect")
+    parser.add_argument("--tcp", metavar="HOST:PORT", help="Also serve the daemon on this loopback TCP address")
+    parser.add_argument("--browsers", type=int, default=1, help="Shared browsers in the daemon pool")
+    parser.add_argument("--connect", nargs="?", const="", default=None, metavar="ADDRESS",
+                        help="stdio shim to a daemon at a socket path or HOST:PORT, starting it if needed")
+    parser.add_argument("--record", metavar="PATH", help="Append every JSON-RPC message in and out to PATH as NDJSON")
+    parser.add_argument("--profile", choices=sorted(launch_profiles.PROFILES), default=None,
+                        help="Chromium launch profile (default: $UNDETECTED_LAUNCH_PROFILE or stealth-full)")
+    args = parser.parse_args(argv)
+    
+    if args.profile:
+        # Through the environment so fleet workers and daemon browsers pick it up too
+        os.environ["UNDETECTED_LAUNCH_PROFILE"] = args.profile
+    
+    if args.record:
+        traffic.start_recording(args.record)
+    
+    if args.worker or args.router:
+        import fleet
+        return fleet.main(args, sys.modules[__name__])
+    
+    if args.daemon or args.connect is not None:
+        import daemon
+        args.socket = args.socket or daemon.DEFAULT_SOCKET
+        return daemon.main(args, sys.modules[__name__])
+    
+    mcp = UndetectedChromeMCP()
+    
+    # Jobs registered by an earlier run resume refreshing right away
+    if os.path.exists(DEFAULT_JOBS_FILE):
+        mcp.jobs = JobScheduler(mcp)
+    
+    # kill -USR2 <pid> toggles profiling without going through MCP
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, mcp.toggle_profiler)
+    
+    serve_stdio(mcp)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+"""
+Offline record/replay of site traffic through CDP Fetch interception.
+
+Recording pauses every response of a tab at the response stage, copies
+status, headers and body into an archive, and lets it continue. The
+archive is a single zip holding an index and content-addressed, deflated
+bodies, so repeated assets are stored once. Replay intercepts every request
+at the request stage and fulfills it from the archive without touching
+the network. Unknown requests fail as if offline, or pass through when
+allow_network is set, and nothing is delayed, so a replayed run is bound
+only by the CPU.
+
+Requests are matched on method, URL with its query parameters sorted, and
+a hash of the POST body. A URL that only differs in its query (cache
+busters, timestamps) falls back to a recording of the same path. Several
+responses recorded for one key are served in recorded order, and the last
+one repeats.
+"""
+
+import base64
+import functools
+import hashlib
+import json
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from cdp_session import CDPError
+
+# Bodies are stored decoded, so these no longer describe them
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def request_key(method, url, post_data=None):
+    """(exact, loose) lookup keys for a request"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    body = f" {hashlib.sha1(post_data.encode()).hexdigest()[:16]}" if post_data else ""
+    exact = f"{method} {urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))}{body}"
+    loose = f"{method} {urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))}"
+    return exact, loose
+
+
+class SiteArchive:
+    """Zip of recorded responses: index.json plus bodies/<sha256>"""
+
+    def __init__(self, path, mode="r"):
+        if mode not in ("r", "w"):
+            raise ValueError("mode must be 'r' or 'w'")
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.zip = zipfile.ZipFile(path, mode, compression=zipfile.ZIP_DEFLATED)
+        self.entries = {}
+        self.loose = {}
+        self.served = {}
+        self.bodies = set()
+        self.bytes = 0
+        if mode == "r":
+            index = json.loads(self.zip.read("index.json"))
+            self.entries = index["entries"]
+            self.created = index.get("created")
+            for key, responses in self.entries.items():
+                self.loose.setdefault(responses[0]["loose"], key)
+            for info in self.zip.infolist():
+                if info.filename.startswith("bodies/"):
+                    self.bodies.add(info.filename[len("bodies/"):])
+                    self.bytes += info.file_size
+        else:
+            self.created = time.time()
+        self._body = functools.lru_cache(maxsize=1024)(self._read_body)
+
+    def add(self, method, url, post_data, status, headers, body):
+        exact, loose = request_key(method, url, post_data)
+        sha256 = hashlib.sha256(body).hexdigest() if body else None
+        headers = [h for h in headers if h["name"].lower() not in DROPPED_HEADERS]
+        with self.lock:
+            if sha256 and sha256 not in self.bodies:
+                self.zip.writestr(f"bodies/{sha256}", body)
+                self.bodies.add(sha256)
+                self.bytes += len(body)
+            self.entries.setdefault(exact, []).append(
+                {"url": url, "loose": loose, "status": status, "headers": headers, "body": sha256})
+
+    def _read_body(self, sha256):
+        with self.lock:
+            return self.zip.read(f"bodies/{sha256}")
+
+    def lookup(self, method, url, post_data=None):
+        """Recorded response for a request as (status, headers, body), or None"""
+        exact, loose = request_key(method, url, post_data)
+        key = exact if exact in self.entries else self.loose.get(loose)
+        if key is None:
+            return None
+        responses = self.entries[key]
+        with self.lock:
+            index = self.served.get(key, 0)
+            self.served[key] = index + 1
+        response = responses[min(index, len(responses) - 1)]
+        body = self._body(response["body"]) if response["body"] else b""
+        return response["status"], response["headers"], body
+
+    def close(self):
+        with self.lock:
+            if self.mode == "w":
+                index = {"version": 1, "created": self.created, "entries": self.entries}
+                self.zip.writestr("index.json", json.dumps(index))
+            self.zip.close()
+
+    def stats(self):
+        return {
+            "requests": len(self.entries),
+            "responses": sum(len(r) for r in self.entries.values()),
+            "bodies": len(self.bodies),
+            "body_bytes": self.bytes,
+        }
+
+
+class ArchiveRecorder:
+    """Copies every response of a tab into a SiteArchive while the page loads normally"""
+
+    def __init__(self, session, archive, workers=4):
+        self.session = session
+        self.archive = archive
+        # Bodies are fetched with blocking sends, which must stay off the CDP reader thread
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archive-recorder")
+        self.recorded = 0
+        self.errors = 0
+
+    def start(self):
+        self.session.on("Fetch.requestPaused", self._on_paused)
+        self.session.send("Fetch.enable", {"patterns": [{"urlPattern": "*", "requestStage": "Response"}]})
+
+    def _on_paused(self, params):
+        self.executor.submit(self._capture, params)
+
+    def _capture(self, params):
+        request_id = params["requestId"]
+        try:
+            status = params.get("responseStatusCode")
+            if status is None or params.get("responseErrorReason"):
+                return
+            body = b""
+            if not (300 <= status < 400 or status == 204):
+                result = self.session.send("Fetch.getResponseBody", {"requestId": request_id})
+                data = result.get("body", "")
+                body = base64.b64decode(data) if result.get("base64Encoded") else data.encode("utf-8")
+            request = params["request"]
+            self.archive.add(request["method"], request["url"], request.get("postData"),
+                             status, params.get("responseHeaders", []), body)
+            self.recorded += 1
+        except CDPError:
+            self.errors += 1
+        finally:
+            self.session.send_nowait("Fetch.continueRequest", {"requestId": request_id})
+
+    def stop(self):
+        self.session.off("Fetch.requestPaused", self._on_paused)
+        self.executor.shutdown(wait=True)
+        try:
+            self.session.send("Fetch.disable")
+        except CDPError:
+            pass
+        self.archive.close()
+
+    def stats(self):
+        return dict(self.archive.stats(), recorded=self.recorded, errors=self.errors)
+
+
+class ArchiveReplayer:
+    """Serves a tab's requests from a SiteArchive instead of the network"""
+
+    def __init__(self, session, archive, allow_network=False):
+        self.session = session
+        self.archive = archive
+        self.allow_network = allow_network
+        self.hits = 0
+        self.misses = []
+        self.missed = 0
+        self.bytes_served = 0
+
+    def start(self):
+        self.session.on("Fetch.requestPaused", self._on_paused)
+        self.session.send("Fetch.enable", {"patterns": [{"urlPattern": "*", "requestStage": "Request"}]})
+
+    def _on_paused(self, params):
+        # Runs on the reader thread; only send_nowait is safe here
+        request = params["request"]
+        response = self.archive.lookup(request["method"], request["url"], request.get("postData"))
+        if response is not None:
+            status, headers, body = response
+            self.hits += 1
+            self.bytes_served += len(body)
+            self.session.send_nowait("Fetch.fulfillRequest", {
+                "requestId": params["requestId"],
+                "responseCode": status,
+                "responseHeaders": headers,
+                "body": base64.b64encode(body).decode(),
+            })
+            return
+        self.missed += 1
+        if len(self.misses) < 20:
+            self.misses.append(f"{request['method']} {request['url']}")
+        if self.allow_network:
+            self.session.send_nowait("Fetch.continueRequest", {"requestId": params["requestId"]})
+        else:
+            self.session.send_nowait("Fetch.failRequest", {"requestId": params["requestId"], "errorReason": "InternetDisconnected"})
+
+    def stop(self):
+        self.session.off("Fetch.requestPaused", self._on_paused)
+        try:
+            self.session.send("Fetch.disable")
+        except CDPError:
+            pass
+        self.archive.close()
+
+    def stats(self):
+        return dict(self.archive.stats(), hits=self.hits, misses=self.missed, bytes_served=self.bytes_served,
+                    first_misses=list(self.misses))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+Stealth evasions registered once per tab instead of once per navigation.
+
+The evasions used to be run with execute_script right after launch, which
+only patched the blank first document and was gone after the next get().
+undetected_chromedriver's headless mode wraps get() instead, and every
+navigation then pays an execute_script round trip for navigator.webdriver
+plus, whenever that is truthy, a user-agent lookup and three CDP commands.
+
+Here the evasions are registered with Page.addScriptToEvaluateOnNewDocument
+and evaluated once in the current document with Runtime.evaluate. The
+command's runImmediately flag is not used: older Chrome ignores it, and
+where it works the script would run twice and stack its wrappers. The user
+agent is overridden with Network.setUserAgentOverride, once for each tab.
+It is worked out once per browser, from the one asked for or from
+Browser.getVersion with the headless marker removed, and reused for every
+later tab. get() is then a plain WebDriver navigation again.
+"""
+
+STEALTH_SCRIPT = """(() => {
+    const disguised = new WeakMap();
+    const disguise = (fn, name) => (disguised.set(fn, `function ${name}() { [native code] }`), fn);
+    const nativeToString = Function.prototype.toString;
+    Function.prototype.toString = disguise(function toString() {
+        return disguised.has(this) ? disguised.get(this) : nativeToString.call(this);
+    }, 'toString');
+
+    const getter = (proto, key, value) => Object.defineProperty(proto, key, {
+        get: disguise(function () { return value; }, `get ${key}`),
+        configurable: true,
+        enumerable: true,
+    });
+    getter(Navigator.prototype, 'webdriver', false);
+    getter(Navigator.prototype, 'languages', Object.freeze(['en-US', 'en']));
+    if (!navigator.plugins || !navigator.plugins.length) {
+        getter(Navigator.prototype, 'plugins', [1, 2, 3, 4, 5]);
+    }
+
+    window.chrome = window.chrome || {};
+    window.chrome.runtime = window.chrome.runtime || {};
+
+    if (window.Permissions && window.Notification) {
+        const nativeQuery = Permissions.prototype.query;
+        Permissions.prototype.query = disguise(function query(parameters) {
+            return parameters && parameters.name === 'notifications'
+                ? Promise.resolve({ state: Notification.permission })
+                : nativeQuery.call(this, parameters);
+        }, 'query');
+    }
+})();"""
+
+ACCEPT_LANGUAGE = "en-US,en"
+
+
+class StealthBootstrap:
+    """Registers the evasions and user agent in each tab of one browser, once"""
+
+    def __init__(self, driver, user_agent=None):
+        self.driver = driver
+        self._user_agent = user_agent
+        self.tabs = set()
+
+    @property
+    def user_agent(self):
+        """The user agent every tab reports; looked up once per browser"""
+        if self._user_agent is None:
+            version = self.driver.execute_cdp_cmd("Browser.getVersion", {})
+            self._user_agent = version["userAgent"].replace("HeadlessChrome", "Chrome")
+        return self._user_agent
+
+    def apply(self):
+        """Bootstrap the current tab unless it already is; returns whether anything was sent"""
+        handle = self.driver.current_window_handle
+        if handle in self.tabs:
+            return False
+        self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": STEALTH_SCRIPT})
+        self.driver.execute_cdp_cmd("Runtime.evaluate", {"expression": STEALTH_SCRIPT})
+        self.driver.execute_cdp_cmd("Network.setUserAgentOverride",
+                                    {"userAgent": self.user_agent, "acceptLanguage": ACCEPT_LANGUAGE})
+        self.tabs.add(handle)
+        return True
+
+
+def install(driver, user_agent=None):
+    """Bootstrap a freshly launched driver and drop undetected_chromedriver's per-get() patching"""
+    # uc's headless mode replaces get() on the instance; the class method is the plain navigation
+    driver.__dict__.pop("get", None)
+    driver.stealth = StealthBootstrap(driver, user_agent)
+    driver.stealth.apply()
+    return driver.stealth
+
+
+def bootstrap_tab(driver):
+    """Bootstrap the driver's current tab, e.g. right after switch_to.new_window()"""
+    stealth = getattr(driver, "stealth", None)
+    if stealth is not None:
+        stealth.apply()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+JSON-RPC traffic recording.
+
+With server.py --record PATH every inbound request and outbound message
+(responses and progress notifications) is appended to PATH as one JSON
+object per line: wall-clock time, direction, process id, the daemon client
+when there is one, and the message itself. Recordings are replayed by
+loadgen.py and summarized with `loadgen.py report`.
+"""
+
+import json
+import os
+import threading
+import time
+
+# The active recorder, set once at startup; None when not recording
+recorder = None
+
+
+class TrafficRecorder:
+    """Thread-safe NDJSON writer for MCP traffic"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", buffering=1)
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def record(self, direction, message, client=None):
+        """Append one message; inbound lines that are not valid JSON are kept raw"""
+        if isinstance(message, (str, bytes)):
+            try:
+                message = json.loads(message)
+            except ValueError:
+                message = {"raw": message.decode(errors="replace") if isinstance(message, bytes) else message}
+        entry = {"t": time.time(), "dir": direction, "pid": self.pid, "message": message}
+        if client is not None:
+            entry["client"] = client
+        line = json.dumps(entry)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def start_recording(path):
+    global recorder
+    recorder = TrafficRecorder(path)
+    return recorder
+
+
+def read_recording(path):
+    """Entries of an NDJSON recording, skipping torn lines"""
+    entries = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def recorded_calls(path):
+    """Inbound tools/call requests per session, in order, with offsets in seconds
+
+    A session is one process and daemon client; returns {session: [(offset, name, arguments), ...]}.
+    """
+    sessions, starts = {}, {}
+    for entry in read_recording(path):
+        message = entry.get("message", {})
+        if entry.get("dir") != "in" or message.get("method") != "tools/call":
+            continue
+        params = message.get("params", {})
+        session = f"{entry.get('pid')}/{entry.get('client', 0)}"
+        start = starts.setdefault(session, entry["t"])
+        sessions.setdefault(session, []).append((entry["t"] - start, params.get("name"), params.get("arguments", {})))
+    return sessions
+
+
+def recorded_latencies(path):
+    """(tool name, seconds, error) for each recorded tools/call that got a response"""
+    pending, results = {}, []
+    for entry in read_recording(path):
+        message = entry.get("message", {})
+        key = (entry.get("pid"), entry.get("client"), json.dumps(message.get("id")))
+        if entry.get("dir") == "in" and message.get("method") == "tools/call":
+            pending[key] = (entry["t"], message.get("params", {}).get("name"))
+        elif entry.get("dir") == "out" and "id" in message and key in pending:
+            started, name = pending.pop(key)
+            results.append((name, entry["t"] - started, response_error(message)))
+    return results
+
+
+def response_error(response):
+    """Error text of a JSON-RPC response or failed tool result, or None"""
+    if "error" in response:
+        return response["error"].get("message", "error")
+    for item in response.get("result", {}).get("content", []):
+        text = item.get("text", "")
+        if item.get("type") == "text" and text.startswith("❌"):
+            # Some messages join lines with a literal backslash-n
+            return text.split("\n", 1)[0].split("\\n", 1)[0]
+    return None
@@ -4,13 +4,15 @@
 Test Carvana scraping with undetected chromedriver
 """
 
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
-import shutil
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcp-servers', 'undetected-chrome-mcp', 'src'))
+from launch_profiles import launch
 
 def test_carvana_scraping():
     print("🚗 Testing Carvana Scraping")
@@ -21,46 +23,7 @@ def test_carvana_scraping():
     try:
         print("1️⃣ Setting up undetected Chrome...")
         
-        # Copy chromedriver to writable location
-        if not os.path.exists('/tmp/chromedriver'):
-            shutil.copy('/usr/bin/chromedriver', '/tmp/chromedriver')
-            os.chmod('/tmp/chromedriver', 0o755)
-        
-        options = uc.ChromeOptions()
-        options.binary_location = '/usr/bin/chromium'
-        
-        # Container-friendly arguments
-        container_args = [
-            '--no-sandbox',
-            '--disable-setuid-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-gpu',
-            '--headless=new',
-            '--disable-web-security',
-            '--disable-features=VizDisplayCompositor',
-            '--disable-extensions',
-            '--disable-plugins',
-            '--disable-default-apps',
-            '--disable-sync',
-            '--disable-translate',
-            '--hide-scrollbars',
-            '--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        ]
-        
-        for arg in container_args:
-            options.add_argument(arg)
-        
-        prefs = {
-            "profile.default_content_setting_values.notifications": 2,
-            "profile.default_content_settings.popups": 0,
-        }
-        options.add_experimental_option("prefs", prefs)
-        
-        driver = uc.Chrome(
-            options=options,
-            version_main=None,
-            driver_executable_path='/tmp/chromedriver'
-        )
+        driver = launch()
         
         wait = WebDriverWait(driver, 15)
         
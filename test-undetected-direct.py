@@ -4,11 +4,15 @@
 Direct test of undetected chromedriver without MCP wrapper
 """
 
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcp-servers', 'undetected-chrome-mcp', 'src'))
+from launch_profiles import launch
 
 def test_undetected_chrome():
     print("🧪 Testing Undetected Chrome Direct")
@@ -17,31 +21,11 @@ def test_undetected_chrome():
     driver = None
     
     try:
-        print("1️⃣ Setting up Chrome options...")
-        options = uc.ChromeOptions()
-        
-        # Set Chromium binary path
-        options.binary_location = '/usr/bin/chromium'
-        
-        # Container-friendly arguments
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-setuid-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--headless=new')
-        options.add_argument('--disable-web-security')
-        options.add_argument('--disable-features=VizDisplayCompositor')
-        options.add_argument('--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-        
-        print("2️⃣ Initializing undetected Chrome driver...")
-        driver = uc.Chrome(
-            options=options, 
-            version_main=None,
-            driver_executable_path='/tmp/chromedriver'
-        )
+        print("1️⃣ Initializing undetected Chrome driver...")
+        driver = launch()
         print("✅ Driver initialized successfully")
         
-        print("3️⃣ Testing basic navigation...")
+        print("2️⃣ Testing basic navigation...")
         driver.get('data:text/html,<h1>Test Page</h1><p id="test">Hello World</p>')
         
         title = driver.title
@@ -52,7 +36,7 @@ def test_undetected_chrome():
         text = element.text
         print(f"✅ Element text: {text}")
         
-        print("4️⃣ Testing real website...")
+        print("3️⃣ Testing real website...")
         driver.get('https://httpbin.org/headers')
         time.sleep(3)
         
@@ -6,9 +6,13 @@ Simplified implementation that follows MCP protocol exactly
 """
 
 import json
+import os
 import sys
 import logging
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcp-servers', 'undetected-chrome-mcp', 'src'))
+import launch_profiles
+
 # Disable logging to avoid interference with MCP protocol
 logging.basicConfig(level=logging.CRITICAL)
 
@@ -221,7 +225,9 @@ class UndetectedChromeMCP:
                 if tool_name == "undetected_status":
                     try:
                         import undetected_chromedriver as uc
-                        status_text = f"✅ Undetected Chrome v{uc.__version__} available\n✅ Chromium binary: /usr/bin/chromium\n🛡️ Maximum stealth features enabled"
+                        status_text = (f"✅ Undetected Chrome v{uc.__version__} available\n"
+                                       f"✅ Chromium binary: {launch_profiles.CHROMIUM_BINARY}\n"
+                                       f"🚀 Launch profile: {launch_profiles.default_profile()}")
                     except ImportError:
                         status_text = "❌ Undetected Chrome not available"
                         
@@ -249,6 +255,7 @@ class UndetectedChromeMCP:
                         result_lines = [
                             f"✅ Would navigate to: {url}",
                             f"🔧 Mode: {'Headless' if headless else 'Visible'}",
+                            f"🚀 Launch profile: {launch_profiles.default_profile()}",
                         ]
                         if wait_for:
                             result_lines.append(f"⏳ Would wait for: {wait_for}")
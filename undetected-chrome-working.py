@@ -12,6 +12,9 @@ import time
 import random
 import tempfile
 import base64
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcp-servers', 'undetected-chrome-mcp', 'src'))
 
 def send_response(response):
     """Send JSON-RPC response"""
@@ -87,18 +90,14 @@ class UndetectedChromeMCP:
             }
             options.add_experimental_option("prefs", prefs)
             
-            # Copy chromedriver to writable location for patching
-            import shutil
-            import os
-            if not os.path.exists('/tmp/chromedriver'):
-                shutil.copy('/usr/bin/chromedriver', '/tmp/chromedriver')
-                os.chmod('/tmp/chromedriver', 0o755)
+            # Patched once per chromedriver build and shared between processes
+            from driver_cache import patched_driver
             
             # Initialize driver with container-specific settings
             self.driver = uc.Chrome(
                 options=options,
                 version_main=None,
-                driver_executable_path='/tmp/chromedriver'
+                driver_executable_path=patched_driver()
             )
             
             self.wait = WebDriverWait(self.driver, 10)